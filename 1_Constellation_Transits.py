@@ -4,6 +4,9 @@ import location_utils as loc_utils
 import pandas as pd
 from datetime import (datetime as dt, timedelta)
 from pytz import timezone
+from core.jobs import DONE, FAILED
+
+POLL_INTERVAL = 0.25 # seconds between progress bar updates while the transit job runs
 
 # Meta Info
 st.set_page_config(page_title='Constellation Transit Finder', page_icon="🔭", initial_sidebar_state='expanded')
@@ -15,17 +18,44 @@ satellites launched per year, inclination and altitude distributions!
 st.write('Constellation Transit Summary')
 
 # After main page title
+def compute_transits(job, constObj, usrLoc, long_horizon):
+    # runs on a worker thread, no st.* calls: progress and cancellation go through job.report
+    if long_horizon:
+        constObj.generateLongHorizonPasses(usrLoc, progress=job.report)
+    else:
+        constObj.generatePasses(usrLoc, progress=job.report)
+    return constObj
+
 def get_results(constObj):
-    # After constellation data is retrieved, compute transits
+    # After constellation data is retrieved, compute transits in a background job, reruns with the same inputs pick up
+    # the running / finished job and new inputs cancel it, the finished constellation is swapped in for display
     if constObj.initialized and usrLoc.initialized:
-        constObj.generatePasses(usrLoc)
-        constObj.showStats(usrLoc)
+        key = (constObj.source, constObj.min_elevation, maxPoints, usrLoc.selected_loc, usrLoc.selected_position,
+               usrLoc.date_range, longHorizon)
+        job = const_utils.transit_job(key, compute_transits, constObj, usrLoc, longHorizon)
+        if not job.done():
+            # every progress update lets Streamlit stop this run as soon as a widget changes
+            bar = st.progress(job.progress, text=job.message)
+            while not job.wait(POLL_INTERVAL):
+                bar.progress(job.progress, text=job.message)
+            bar.empty()
+        if job.status == DONE:
+            result = job.result()
+            result.radius_size = radiusSize
+            result.showStats(usrLoc)
+        elif job.status == FAILED:
+            st.error(f"Something went horribly wrong, sorry. {job.error}")
+        else:
+            st.info('Transit computation was cancelled, change an input to start it again.', icon="ℹ️")
+    elif constObj.constellation == const_utils.CUSTOM and constObj.query_sat_count == 0:
+        pass # waiting for an upload
     else:
         st.error('Will need to fix issues before we can proceed.')
 
 def update_events(const_to_change):
-    # Used a callback to drop events for stale loc, timerange
+    # Used a callback to drop events and stop the transit job for stale loc, timerange
     const_to_change.dropEvents()
+    const_utils.cancel_transit_job()
 
 # UI Elements
 # ------------------------- Sidebar panel
@@ -33,10 +63,14 @@ def update_events(const_to_change):
 st.sidebar.write('Begin here 👇')
 
 # 1. Get Constellation
-constellationChoice = st.sidebar.selectbox('Select a Constellation', const_utils.CONSTELLATIONS)
+constellationChoice = st.sidebar.selectbox('Select a Constellation', const_utils.TRANSIT_CONSTELLATIONS)
+help_str = "The angle of a satellite measured upwards from the observer's horizon. Thus, an object on the horizon has an elevation of 0° and one directly overhead has an elevation of 90°."
+minElevation = st.sidebar.slider("Restrict transits above horizon (degrees):", min_value=0, max_value=80, value=70, step=10, help=help_str)
+radiusSize = st.sidebar.slider("Point radius size:", min_value=500, max_value=6000, value=1000, step=300)
+maxPoints = st.sidebar.slider("Max number of points on plot:", min_value=1000, max_value=10000, value=6000, step=1000)
 # @st.experimental_singleton(ttl=1200) # this will cache satellite data so we do not keep making requests to Celestrak
 def getCachedConstellation(constellationName):
-    constellation = const_utils.SatConstellation(constellationName)
+    constellation = const_utils.SatConstellation(constellationName, min_elevation=minElevation, radius_size=radiusSize, max_points=maxPoints)
     return constellation
 constellation = getCachedConstellation(constellationChoice)
 if constellation.initialized:
@@ -56,19 +90,20 @@ usrLoc.selected_position = (lat, lon)
 usrLoc.update_timezone()
 
 # 3. Get Date Range
+help_str = "Computes the schedule one day at a time for windows of up to 4 weeks. Ground tracks are not shown in this mode."
+longHorizon = st.sidebar.checkbox("Long-horizon mode", value=False, help=help_str, on_change=update_events, args=(constellation,))
 currentDate = dt.now(timezone(usrLoc.selected_tz))
 dateOptStart = dt(currentDate.year, currentDate.month, currentDate.day, currentDate.hour, 0, 0, 0, timezone(usrLoc.selected_tz))
 dateChoice = st.sidebar.slider(
     f"Select time range ({usrLoc.selected_tz}):",
     min_value = dateOptStart,
-    max_value = dateOptStart + timedelta(days=3),
-    value=(dateOptStart, dateOptStart + timedelta(days=1, hours=12)),
-    step = (timedelta(hours=6)),
+    max_value = dateOptStart + (timedelta(days=28) if longHorizon else timedelta(days=3)),
+    value=(dateOptStart, dateOptStart + (timedelta(days=14) if longHorizon else timedelta(days=1, hours=12))),
+    step = (timedelta(days=1) if longHorizon else timedelta(hours=6)),
     format = "MM/DD/YY HH:mm", on_change=update_events, args=(constellation,))
 usrLoc.initialize_time_services(dateChoice)
 if usrLoc.timerangeset:
-    with st.spinner("Computing transit schedule..."):
-        get_results(constellation) # display on main page
+    get_results(constellation) # display on main page
 else:
     st.error('Please select a different time range!')
 
@@ -0,0 +1,443 @@
+'''
+Headless batch computation of transit schedules, runs without a Streamlit session.
+
+Example (nightly cron job):
+    python batch_transits.py --constellations SPIRE ONEWEB --sites BOULDER TOKYO --days 3 --min-elevation 30 60 --out schedules.parquet
+
+Pass matrix (pass counts, visible minutes and max coverage gap for every constellation x site) for the heatmap page:
+    python batch_transits.py --pass-matrix --constellations SPIRE ONEWEB STARLINK --days 1 --out .element_store/pass_matrix.parquet
+
+Coverage statistics (coverage %, revisit and gap percentiles per constellation x site) of the schedules as well:
+    python batch_transits.py --constellations SPIRE --sites BOULDER TOKYO --days 1 --coverage coverage.csv --out schedules.parquet
+
+Contact plan (which passes to track with one antenna per site and 2 min setup between contacts):
+    python batch_transits.py --constellations SPIRE --sites BOULDER TOKYO --contact-plan --antennas BOULDER=2 --out contacts.csv
+
+Hindcast from an element history (every pass and coverage sample uses the element set with the nearest epoch, QA
+runs as of each window start), and growing that history nightly:
+    python batch_transits.py --constellations SPIRE --update-history spire_history.npz --out schedules.parquet
+    python batch_transits.py --history SPIRE=spire_history.npz --start 2023-01-01T00:00:00 --out hindcast.parquet
+
+Manoeuvre / decay screening of every member over the last week of a history, ranked:
+    python batch_transits.py --anomalies --history SPIRE=spire_history.npz --out anomalies.csv
+
+Synthetic Walker constellations from constellation_configs (no credentials needed) for load testing, or as a 3LE file:
+    python batch_transits.py --constellations "MULTI-SHELL 100K (SYNTHETIC)" --sites BOULDER --workers 8 --out load.parquet
+    python batch_transits.py --constellations "WALKER 30K (SYNTHETIC)" --write-3le walker_30k.txt
+
+Spacetrack credentials are read from the SPACETRACK_USERNAME / SPACETRACK_PASSWORD environment variables,
+use --tle-file to run against a local 3LE or OMM (JSON, CSV, KVN) file instead.
+'''
+import argparse
+import os
+import sys
+import tempfile
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from datetime import (datetime as dt, timedelta, timezone as dt_timezone)
+import pandas as pd
+from skyfield.api import wgs84
+import constellation_configs as cc
+from location_configs import LOCATIONS
+from core.propagation import get_timescale, utc_datetime_index, utc_julian_date
+from core.elements import passed_qa
+from core.tle_history import TLEHistory
+from core.element_store import ElementStore, open_element_store
+from core.ingest import ingest_elements, history_records, fetch_spacetrack_elements
+from core.walker import walker_store, write_3le
+from core.anomalies import screen_history, RECENT_DAYS
+from core.events import find_chunk_passes, find_history_passes, time_chunks
+from core.coverage import pass_matrix, schedule_coverage, COVERAGE_STEP
+from core.contacts import schedule_contacts, SETUP_SECONDS
+
+DEBUG = False
+
+BATCH_SIZE = 100 # satellites per job handed to a worker
+SCHEDULE_COLUMNS = ['CONSTELLATION', 'LOCATION', 'WINDOW_DAYS', 'MIN_ELEVATION', 'ASSET', 'NORAD_ID',
+                    'RISE', 'CULMINATE', 'SET', 'DURATION (sec)', 'MAX_ELEVATION']
+
+def spacetrack_credentials_from_env():
+    '''
+    @return Spacetrack login dict from environment variables, or None if they are not set
+    '''
+    username, password = os.environ.get('SPACETRACK_USERNAME'), os.environ.get('SPACETRACK_PASSWORD')
+    if username and password:
+        return {'identity': username, 'password': password}
+    return None
+
+def load_sites(names=None, csv_path=None):
+    '''
+    @brief Collect sites from location_configs.LOCATIONS and / or a CSV file with NAME, LAT, LON columns
+
+    @return dict of site name -> (latitude, longitude)
+    '''
+    sites = {}
+    if names:
+        unknown = [name for name in names if name not in LOCATIONS]
+        if unknown:
+            raise ValueError(f"Unknown locations: {unknown}, pick from {list(LOCATIONS)} or use a CSV.")
+        sites.update({name: LOCATIONS[name] for name in names})
+    if csv_path:
+        df_sites = pd.read_csv(csv_path)
+        df_sites.columns = [col.strip().upper() for col in df_sites.columns]
+        sites.update({row.NAME: (float(row.LAT), float(row.LON)) for row in df_sites.itertuples(index=False)})
+    if not names and not csv_path:
+        sites = dict(LOCATIONS)
+    return sites
+
+def is_synthetic(constellation):
+    return constellation in cc.SYNTHETIC
+
+def constellation_store(constellation, credentials=None, tle_file=None, query_limit=10000):
+    '''
+    @return ElementStore of a constellation read from a local file, generated from its synthetic Walker shells or
+            queried from Spacetrack, newest element set per NORAD ID
+    '''
+    if tle_file is not None:
+        # 3LE or OMM (JSON / CSV / KVN)
+        with open(tle_file, 'rb') as f:
+            store, _ = ingest_elements(f, tle_file)
+        return store
+    if is_synthetic(constellation):
+        return walker_store(cc.CONFIGS[constellation]["_SHELLS"])
+    store, _ = fetch_spacetrack_elements(constellation, credentials, query_limit)
+    return store
+
+def load_constellation(constellation, credentials=None, tle_file=None, query_limit=10000, history=None, at=None):
+    '''
+    @brief Fetch (or read) a constellation and drop satellites that fail QA checks
+
+    @param history      optional TLEHistory, the element sets nearest to at (timezone aware datetime) are used and
+                        QA checks run as of that time
+    @return list of skyfield EarthSatellite objects
+    '''
+    t_qa = None
+    if history is not None:
+        t_qa = get_timescale().from_datetime(at)
+        satellites = history.satellites_at(t_qa)
+    else:
+        satellites = constellation_store(constellation, credentials, tle_file, query_limit).satellites()
+    passed, _ = passed_qa(satellites, t_qa)
+    if DEBUG:
+        print(f"{constellation}: {len(passed)} of {len(satellites)} satellites passed QA checks.")
+    return passed
+
+@lru_cache(maxsize=None)
+def _open_history(path):
+    # loaded once per worker process, jobs only carry the path
+    return TLEHistory.load(path)
+
+def _transit_job(job):
+    '''
+    Worker entry point, finds all passes of a batch of satellites over all sites for one window / elevation
+    '''
+    constellation, store_path, history_path, members, sites, window, window_days, min_elevation = job
+    # the element store is memory-mapped, workers share it through the page cache instead of pickled TLEs
+    store = open_element_store(store_path)
+    history = _open_history(history_path) if history_path else None
+    # window is (chunk start, chunk stop, window stop), passes rising in the chunk are searched up to window stop
+    chunk_start, chunk_stop, window_stop = window
+    positions = {name: wgs84.latlon(lat, lon) for name, (lat, lon) in sites.items()}
+    columns = {col: [] for col in SCHEDULE_COLUMNS}
+    for sat in store.satellites(slice(*members)):
+        name = sat.name
+        for site_name, position in positions.items():
+            if history is None:
+                found = [(sat, *find_chunk_passes(sat, position, chunk_start, chunk_stop, window_stop, min_elevation))]
+            else:
+                # hindcast, every pass is searched with the element set nearest to its rise
+                found = find_history_passes(history, sat.model.satnum, position, chunk_start, chunk_stop, window_stop,
+                                            min_elevation)
+            for elements, times, starts in found:
+                if len(starts) == 0:
+                    continue
+                rise, culminate, set_ = times[starts], times[starts + 1], times[starts + 2]
+                max_elevation, _, _ = (elements - position).at(culminate).altaz()
+                columns['CONSTELLATION'] += [constellation] * len(starts)
+                columns['LOCATION'] += [site_name] * len(starts)
+                columns['WINDOW_DAYS'] += [window_days] * len(starts)
+                columns['MIN_ELEVATION'] += [min_elevation] * len(starts)
+                columns['ASSET'] += [name] * len(starts)
+                columns['NORAD_ID'] += [sat.model.satnum] * len(starts)
+                columns['RISE'] += list(utc_datetime_index(rise))
+                columns['CULMINATE'] += list(utc_datetime_index(culminate))
+                columns['SET'] += list(utc_datetime_index(set_))
+                columns['DURATION (sec)'] += list((set_.tt - rise.tt) * 86400)
+                columns['MAX_ELEVATION'] += list(max_elevation.degrees)
+    return columns
+
+def compute_schedules(constellations, sites, windows, min_elevations, credentials=None, tle_files=None,
+                      workers=1, batch_size=BATCH_SIZE, chunk=None, histories=None):
+    '''
+    @brief Python API for headless transit schedules
+
+    @param constellations   list of names from constellation_configs.CONFIGS (or labels for tle_files)
+    @param sites            dict of site name -> (latitude, longitude), see load_sites
+    @param windows          list of (start, stop) timezone aware datetimes
+    @param min_elevations   list of elevation thresholds (degrees)
+    @param tle_files        optional dict of constellation label -> local 3LE or OMM file path
+    @param workers          number of worker processes, 1 runs everything in this process
+    @param chunk            optional timedelta, long windows are split into chunks of this length (bounded memory per job)
+    @param histories        optional dict of constellation label -> TLEHistory, members are those passing QA at each
+                            window start and every pass is searched with the element set nearest to its rise
+
+    @return pandas df with one row per pass and window (WINDOW_DAYS, overlapping windows repeat a pass), see
+            SCHEDULE_COLUMNS
+    '''
+    tle_files = tle_files or {}
+    histories = histories or {}
+    with tempfile.TemporaryDirectory() as store_dir:
+        jobs = []
+        for constellation in constellations:
+            history_path = None
+            if constellation in histories:
+                history_path = os.path.join(store_dir, f"{constellation}_history.npz")
+                histories[constellation].save(history_path)
+            else:
+                store_path = os.path.join(store_dir, constellation)
+                ElementStore.from_satellites(load_constellation(constellation, credentials=credentials,
+                                                                tle_file=tle_files.get(constellation))).save(store_path)
+            # batch satellites so every job covers all sites / elevations for a slice of the constellation and one window
+            for window_idx, (start, stop) in enumerate(windows):
+                window_days = (stop - start).total_seconds() / 86400
+                if constellation in histories:
+                    store_path = os.path.join(store_dir, f"{constellation}_{window_idx}")
+                    ElementStore.from_satellites(load_constellation(constellation, history=histories[constellation],
+                                                                    at=start)).save(store_path)
+                count = len(open_element_store(store_path))
+                for idx in range(0, count, batch_size):
+                    chunks = time_chunks(start, stop, chunk) if chunk else [(start, stop)]
+                    for chunk_start, chunk_stop in chunks:
+                        for min_elevation in min_elevations:
+                            jobs.append((constellation, store_path, history_path, (idx, min(idx + batch_size, count)),
+                                         sites, (chunk_start, chunk_stop, stop), window_days, min_elevation))
+        if DEBUG:
+            print(f"Running {len(jobs)} transit jobs on {workers} worker(s).")
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_transit_job, jobs))
+        else:
+            results = [_transit_job(job) for job in jobs]
+
+    df = pd.DataFrame({col: [value for res in results for value in res[col]] for col in SCHEDULE_COLUMNS})
+    if not df.empty:
+        df.sort_values(by=['CONSTELLATION', 'LOCATION', 'WINDOW_DAYS', 'RISE'], inplace=True, ignore_index=True)
+    return df
+
+def compute_pass_matrix(constellations, sites, windows, min_elevations, credentials=None, tle_files=None,
+                        step_seconds=COVERAGE_STEP, histories=None):
+    '''
+    @brief Python API for the constellation x site pass matrix, see core.coverage.pass_matrix
+
+    @return pandas df with one row per constellation / site / window / elevation
+    '''
+    tle_files = tle_files or {}
+    histories = histories or {}
+    satellites = {}
+    for constellation in constellations:
+        if constellation not in histories:
+            satellites[constellation] = load_constellation(constellation, credentials=credentials, tle_file=tle_files.get(constellation))
+    frames = []
+    for window in windows:
+        for constellation, history in histories.items():
+            satellites[constellation] = load_constellation(constellation, history=history, at=window[0])
+        for min_elevation in min_elevations:
+            # history constellations are propagated with the element set nearest to every grid sample
+            df = pass_matrix(satellites, sites, window[0], window[1], min_elevation, step_seconds, histories=histories)
+            df.insert(2, 'MIN_ELEVATION', min_elevation)
+            df.insert(3, 'START', window[0])
+            df.insert(4, 'STOP', window[1])
+            frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+def compute_coverage(schedule, constellations, sites, windows, min_elevations):
+    '''
+    @brief Python API for coverage statistics of a schedule from compute_schedules, see core.coverage.schedule_coverage
+
+    @return pandas df with CONSTELLATION, LOCATION, WINDOW_DAYS, MIN_ELEVATION, START, STOP and the
+            coverage_statistics columns, one row per constellation / site / window / elevation
+    '''
+    frames = []
+    for start, stop in windows:
+        window_days = (stop - start).total_seconds() / 86400
+        for constellation in constellations:
+            for min_elevation in min_elevations:
+                passes = schedule[(schedule['CONSTELLATION'] == constellation) & (schedule['WINDOW_DAYS'] == window_days) &
+                                  (schedule['MIN_ELEVATION'] == min_elevation)]
+                df = schedule_coverage(passes, start, stop, locations=list(sites)).reset_index()
+                df.insert(0, 'CONSTELLATION', constellation)
+                df.insert(2, 'WINDOW_DAYS', window_days)
+                df.insert(3, 'MIN_ELEVATION', min_elevation)
+                df.insert(4, 'START', start)
+                df.insert(5, 'STOP', stop)
+                frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def compute_contact_plan(schedule, antennas=None, setup_seconds=SETUP_SECONDS, priorities=None):
+    '''
+    @brief Python API for contact plans over a schedule from compute_schedules, see core.contacts.schedule_contacts
+
+    Every window and elevation threshold is planned on its own, so a pass repeated by overlapping windows never
+    competes with itself, all constellations share the antennas of a site.
+
+    @return schedule with SCHEDULED, ANTENNA and WEIGHT columns
+    '''
+    frames = [schedule_contacts(passes, antennas, setup_seconds, priorities)
+              for _, passes in schedule.groupby(['WINDOW_DAYS', 'MIN_ELEVATION'])]
+    if not frames:
+        return schedule.assign(SCHEDULED=pd.Series(dtype=bool), ANTENNA=pd.Series(dtype=object), WEIGHT=pd.Series(dtype=float))
+    df = pd.concat(frames, ignore_index=True)
+    df.sort_values(by=['CONSTELLATION', 'LOCATION', 'WINDOW_DAYS', 'RISE'], inplace=True, ignore_index=True)
+    return df
+
+def update_history(path, constellations, credentials=None, tle_files=None):
+    '''
+    @brief Adds the current element sets of constellations to the history file at path (created if missing), all
+           element sets are kept, QA only applies when a history is used
+
+    @return number of element sets added
+    '''
+    tle_files = tle_files or {}
+    history = TLEHistory.load(path) if os.path.exists(path) else TLEHistory()
+    added = 0
+    for constellation in constellations:
+        if constellation in tle_files:
+            # local 3LE or OMM (JSON / CSV / KVN) file, every valid epoch is kept, not only the newest per NORAD ID
+            with open(tle_files[constellation], 'rb') as f:
+                added += history.extend_records(*history_records(f, tle_files[constellation]))
+        else:
+            added += history.extend(constellation_store(constellation, credentials).satellites())
+    history.save(path)
+    if DEBUG:
+        print(f"Added {added} element sets to {path}, {len(history)} in total.")
+    return added
+
+def compute_anomalies(histories, now, recent_days=RECENT_DAYS):
+    '''
+    @brief Python API for manoeuvre / decay screening, see core.anomalies.screen_history
+
+    @param histories    dict of constellation label -> TLEHistory
+    @param now          timezone aware datetime the screened window ends at
+    @return pandas df with a CONSTELLATION column and one row per screened satellite, ranked by SCORE
+    '''
+    now_jd = utc_julian_date(get_timescale().from_datetime(now))
+    frames = [screen_history(history, now_jd, recent_days).assign(CONSTELLATION=label) for label, history in histories.items()]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not df.empty:
+        df = df[['CONSTELLATION'] + [col for col in df.columns if col != 'CONSTELLATION']]
+        df.sort_values(by='SCORE', ascending=False, inplace=True, ignore_index=True)
+    return df
+
+def write_schedule(df, out_path):
+    '''
+    Writes a schedule to Parquet or CSV based on file extension
+    '''
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    if out_path.endswith('.parquet'):
+        df.to_parquet(out_path, index=False)
+    else:
+        df.to_csv(out_path, index=False)
+    return None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compute constellation transit schedules without the Streamlit app.')
+    parser.add_argument('--constellations', nargs='+', default=[], help=f'Constellations from: {list(cc.CONFIGS)}')
+    parser.add_argument('--tle-file', action='append', default=[], metavar='LABEL=PATH',
+                        help='Local 3LE or OMM (JSON, CSV, KVN) file to use as a constellation, may be repeated.')
+    parser.add_argument('--history', action='append', default=[], metavar='LABEL=PATH',
+                        help='Element history (.npz) to hindcast a constellation from, may be repeated.')
+    parser.add_argument('--update-history', default=None, metavar='PATH',
+                        help='Add the loaded element sets of all constellations to this history file.')
+    parser.add_argument('--anomalies', action='store_true', help='Write a ranked manoeuvre / decay table of the --history files instead of schedules.')
+    parser.add_argument('--recent-days', type=float, default=RECENT_DAYS, help='Days before --start (default: now) screened for anomalies.')
+    parser.add_argument('--sites', nargs='+', default=None, help='Site names from location_configs.LOCATIONS (default: all).')
+    parser.add_argument('--sites-csv', default=None, help='CSV file with NAME, LAT, LON columns.')
+    parser.add_argument('--start', default=None, help='Window start, ISO format in UTC (default: now).')
+    parser.add_argument('--days', type=float, nargs='+', default=[1.0], help='Window length(s) in days, one window per value.')
+    parser.add_argument('--min-elevation', type=float, nargs='+', default=[30.0], help='Elevation threshold(s) in degrees.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Satellites per worker job.')
+    parser.add_argument('--chunk-days', type=float, default=None, help='Split long windows into chunks of this many days.')
+    parser.add_argument('--pass-matrix', action='store_true', help='Write the constellation x site pass matrix instead of schedules.')
+    parser.add_argument('--step', type=float, default=COVERAGE_STEP, help='Pass matrix sampling step in seconds.')
+    parser.add_argument('--coverage', default=None, metavar='PATH',
+                        help='Also write coverage statistics of the schedules (.parquet or .csv).')
+    parser.add_argument('--contact-plan', action='store_true', help='Add SCHEDULED / ANTENNA columns from the contact planner.')
+    parser.add_argument('--antennas', nargs='+', default=[], metavar='SITE=N', help='Antennas per site for the contact plan (default: 1).')
+    parser.add_argument('--setup-seconds', type=float, default=SETUP_SECONDS, help='Antenna setup time between contacts in seconds.')
+    parser.add_argument('--write-3le', default=None, metavar='PATH',
+                        help='Only write the element sets of the constellations to a 3LE file (e.g. a synthetic one).')
+    parser.add_argument('--out', default=None, help='Output file, .parquet or .csv')
+    args = parser.parse_args(argv)
+    if args.out is None and args.write_3le is None:
+        parser.error('the following arguments are required: --out')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tle_files = dict(item.split('=', 1) for item in args.tle_file)
+    histories = {label: TLEHistory.load(path) for label, path in (item.split('=', 1) for item in args.history)}
+    constellations = list(args.constellations) + [label for label in list(tle_files) + list(histories)
+                                                  if label not in args.constellations]
+    if not constellations:
+        print('Need at least one constellation (--constellations or --tle-file) to begin!', file=sys.stderr)
+        return 1
+
+    start = dt.fromisoformat(args.start) if args.start else dt.now(dt_timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=dt_timezone.utc)
+    windows = [(start, start + timedelta(days=days)) for days in args.days]
+
+    if args.anomalies:
+        if not histories:
+            print('Need at least one --history file to screen for anomalies!', file=sys.stderr)
+            return 1
+        df = compute_anomalies(histories, start, args.recent_days)
+        write_schedule(df, args.out)
+        print(f"Wrote {len(df)} screened satellites ({(df['FLAG'] != '').sum() if len(df) else 0} flagged) to {args.out}")
+        return 0
+
+    sites = load_sites(args.sites, args.sites_csv)
+    credentials = spacetrack_credentials_from_env()
+    if credentials is None and any(label not in tle_files and label not in histories and not is_synthetic(label)
+                                   for label in constellations):
+        print('Set SPACETRACK_USERNAME / SPACETRACK_PASSWORD to query Spacetrack.', file=sys.stderr)
+        return 1
+
+    if args.write_3le:
+        with open(args.write_3le, 'w') as f:
+            for constellation in constellations:
+                if constellation not in histories:
+                    write_3le(constellation_store(constellation, credentials, tle_files.get(constellation)), f)
+        print(f"Wrote element sets of {len(constellations)} constellation(s) to {args.write_3le}")
+        return 0
+
+    if args.update_history:
+        update_history(args.update_history, [label for label in constellations if label not in histories],
+                       credentials=credentials, tle_files=tle_files)
+
+    if args.pass_matrix:
+        df = compute_pass_matrix(constellations, sites, windows, args.min_elevation, credentials=credentials,
+                                 tle_files=tle_files, step_seconds=args.step, histories=histories)
+        write_schedule(df, args.out)
+        print(f"Wrote pass matrix for {len(constellations)} constellation(s) over {len(sites)} site(s) to {args.out}")
+        return 0
+
+    df = compute_schedules(constellations, sites, windows, args.min_elevation, credentials=credentials,
+                           tle_files=tle_files, workers=args.workers, batch_size=args.batch_size,
+                           chunk=timedelta(days=args.chunk_days) if args.chunk_days else None, histories=histories)
+    if args.coverage:
+        coverage = compute_coverage(df, constellations, sites, windows, args.min_elevation)
+        write_schedule(coverage, args.coverage)
+        print(f"Wrote coverage statistics for {len(constellations)} constellation(s) over {len(sites)} site(s) to {args.coverage}")
+    if args.contact_plan:
+        antennas = {name: int(count) for name, count in (item.split('=', 1) for item in args.antennas)}
+        df = compute_contact_plan(df, antennas=antennas, setup_seconds=args.setup_seconds)
+    write_schedule(df, args.out)
+    print(f"Wrote {len(df)} passes for {len(constellations)} constellation(s) over {len(sites)} site(s) to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,74 +12,102 @@ MINELEV = 80
 MIDELEV = 85
 MAXELEV = 87
 
+# _URL queries return tle_latest OMM rows as JSON, propagated from their numeric fields (see core.ingest)
 CONFIGS = {
     "SPIRE" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/LEMUR~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/LEMUR~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "PLANET" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/SKYSAT~~/OBJECT_NAME/FLOCK~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/SKYSAT~~/OBJECT_NAME/FLOCK~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "SWARM" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/SPACEBEE~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/SPACEBEE~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "STARLINK" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/STARLINK~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/STARLINK~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "ONEWEB" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/ONEWEB~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/ONEWEB~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MIDELEV,
         "_RADIUSLEVELS"  : MIDRAD,
         "_ZOOMLEVELS"    : MIDZOOM },
     "GLOBALSTAR" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/GLOBALSTAR~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/GLOBALSTAR~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MIDELEV,
         "_RADIUSLEVELS"  : MIDRAD,
         "_ZOOMLEVELS"    : MIDZOOM },
     "IRIDIUM" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/IRIDIUM~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/IRIDIUM~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "ORBCOMM" : {
-        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/ORBCOMM~~/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/ORDINAL/1/OBJECT_NAME/ORBCOMM~~/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MIDELEV,
         "_RADIUSLEVELS"  : MIDRAD,
         "_ZOOMLEVELS"    : MIDZOOM },
     "AMATUER": {
-        "_URL": "/class/tle_latest/favorites/Amateur/ORDINAL/1/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/favorites/Amateur/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "NAVSTAR (USA)": {
-        "_URL": "/class/tle_latest/favorites/Navigation/ORDINAL/1/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/favorites/Navigation/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MAXELEV,
         "_RADIUSLEVELS"  : MAXRAD,
         "_ZOOMLEVELS"    : MAXZOOM },
     "SPECIAL INTEREST": {
-        "_URL": "/class/tle_latest/favorites/Special_Interest/ORDINAL/1/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/favorites/Special_Interest/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "WEATHER": {
-        "_URL": "/class/tle_latest/favorites/Weather/ORDINAL/1/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/favorites/Weather/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     "VISIBLE": {
-        "_URL": "/class/tle_latest/favorites/Visible/ORDINAL/1/format/3le/orderby/NORAD_CAT_ID%20asc",
+        "_URL": "/class/tle_latest/favorites/Visible/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
+        "_MINELEVATIONS" : MINELEV,
+        "_RADIUSLEVELS"  : MINRAD,
+        "_ZOOMLEVELS"    : MINZOOM },
+    # synthetic Walker-delta constellations (core.walker) for load testing, generated offline from "_SHELLS"
+    "WALKER 30K (SYNTHETIC)": {
+        "_SHELLS": [
+            {"altitude_km": 550, "inclination_deg": 53, "planes": 120, "per_plane": 250, "phasing": 1}],
+        "_MINELEVATIONS" : MINELEV,
+        "_RADIUSLEVELS"  : MINRAD,
+        "_ZOOMLEVELS"    : MINZOOM },
+    "MULTI-SHELL 100K (SYNTHETIC)": {
+        "_SHELLS": [
+            {"altitude_km": 525, "inclination_deg": 53, "planes": 100, "per_plane": 300, "phasing": 1},
+            {"altitude_km": 530, "inclination_deg": 43, "planes": 100, "per_plane": 300, "phasing": 3},
+            {"altitude_km": 535, "inclination_deg": 33, "planes": 100, "per_plane": 280, "phasing": 5},
+            {"altitude_km": 604, "inclination_deg": 148, "planes": 12, "per_plane": 500, "phasing": 1},
+            {"altitude_km": 614, "inclination_deg": 115.7, "planes": 20, "per_plane": 300, "phasing": 1}],
         "_MINELEVATIONS" : MINELEV,
         "_RADIUSLEVELS"  : MINRAD,
         "_ZOOMLEVELS"    : MINZOOM },
     }
 
+# generated sources, the pages only offer them when started with SYNTHETIC_CONSTELLATIONS=1 (see constellation_utils)
+SYNTHETIC = [name for name, config in CONFIGS.items() if "_SHELLS" in config]
+
+# uploaded 3LE / OMM file on the transit page instead of a Spacetrack query, with the usual display defaults
+CUSTOM = "CUSTOM (UPLOAD)"
+CUSTOM_CONFIG = {
+    "_MINELEVATIONS" : MINELEV,
+    "_RADIUSLEVELS"  : MINRAD,
+    "_ZOOMLEVELS"    : MINZOOM }
+
 ERROR_CODES = {
     "0": "No error.",
     "1": "Mean eccentricity is outside the range 0 ≤ e < 1.",
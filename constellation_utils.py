@@ -1,16 +1,33 @@
+import io
+import os
 import streamlit as st
-from skyfield.api import load, wgs84, EarthSatellite
+from skyfield.api import wgs84
 import pandas as pd
 import numpy as np
+from datetime import timedelta
 import constellation_configs as cc
 import pydeck as pdk
 import plotly.express as px
-import random
-import requests
-
-# Names of all constellations in config file
-CONSTELLATIONS = list(cc.CONFIGS.keys())
-DT_FORMAT = '%b %d, %Y %H:%M:%S'
+from core.propagation import get_timescale, NUM_TRACK, DT_FORMAT
+from core.elements import passed_qa, QA_PASSED
+from core.events import SatelliteMember, format_schedule_times, iter_chunked_schedule
+from core.event_table import EventTable
+from core.element_store import cached_element_store
+from core.ingest import ingest_elements, fetch_spacetrack_elements, UPLOAD_TYPES
+from core.walker import walker_store
+from core.spatial import SubSatelliteIndex
+from core.profiling import Profiler
+from core.jobs import JobRunner
+from spacetrack_utils import spacetrack_credentials
+from core.coverage import coverage_timeline, coverage_statistics, schedule_occupancy, in_view_series, COVERAGE_STEP
+
+# synthetic load test sources have 30k-100k members, a session only builds them after an explicit opt-in
+SHOW_SYNTHETIC = os.environ.get('SYNTHETIC_CONSTELLATIONS', '0') == '1'
+# Names of all constellations in config file offered by the pages
+CONSTELLATIONS = [name for name in cc.CONFIGS if SHOW_SYNTHETIC or name not in cc.SYNTHETIC]
+# transit page choices, the uploaded file option only exists there
+CUSTOM = cc.CUSTOM
+TRANSIT_CONSTELLATIONS = CONSTELLATIONS + [CUSTOM]
 
 DEBUG_CACHE = False
 DEBUG = False
@@ -18,211 +35,106 @@ DEBUG_DATA = False
 VERBOSE = False
 MULTI_COLOR = True
 
-NUM_TRACK = 50
 KM_BIN_SIZE = 100
 INC_BIN_SIZE = 5
 MAX_POINTS = 3000
-STALE_EPOCH = 5 # days
-
-ts = load.timescale()
+QA_PAGE_SIZE = 500 # rows per page in the QA log table
+TIMELINE_MAX_BARS = 300 # above this many passes the timeline is aggregated into satellites in view per time bin
+CARRIER_MHZ = 437.0 # default downlink carrier for Doppler profiles
+SEARCH_SHARE = 0.8 # share of the progress bar for the transit search, the rest for ephemerides / visibility
 
-class TransitEvent():
+@st.cache_resource(ttl=21600)
+def ingest_upload(data, filename):
     '''
-    Object that contains info about a transit event
+    @return (ElementStore, ingest report) of uploaded file bytes, parsed once per file content
     '''
-    def __init__(self, rise_time, culminate_time, set_time, sat_name, satrecObj, goeposition, loc_name):
-        self.rise = rise_time # ts objects
-        self.culminate = culminate_time # ts objects
-        self.set = set_time # ts objects
-        self.asset = sat_name
-        self.loc = goeposition # wgs84 GEOID object
-        self.loc_name = loc_name # string from UserLocation.selected_loc
-        self.geo_position = None # array of geocentric [x,y,z] (km) from rise to set 
-        self.latlon = None # array of [lat,lon] (deg)
-        self.azaltrange = None # array of [azimuth (deg), elevation (deg), range (km)] 
-        self.time_list = None # list of times for display
-
-        if isinstance(satrecObj, EarthSatellite):
-            self.satrec = satrecObj
-        else:
-            raise TypeError
-            if DEBUG:
-                print('Did not add satrec object!')
-                
-
-    def get_ephem(self):
-        
-        res = False
+    return ingest_elements(io.BytesIO(data), filename)
 
-        ts_range = ts.linspace(self.rise, self.set, NUM_TRACK)
-        difference = self.satrec - self.loc
-
-        geo_pos = np.zeros([NUM_TRACK, 3])
-        lat_lon = np.zeros([NUM_TRACK, 2])
-        azaltrange = np.zeros([NUM_TRACK, 3])
-
-        for id, time in enumerate(ts_range):
-            geocentric = self.satrec.at(time)
-            lat, lon = wgs84.latlon_of(geocentric)
-
-            topocentric = difference.at(time)
-            alt, az, range = topocentric.altaz()
+@st.cache_resource(ttl=21600)
+def get_data_from_spacetrack(const_name, query_limit=10000):
+    # the element store on disk is shared by every process, it is only fetched again when it is stale
+    config = cc.CONFIGS[const_name]
+    if "_SHELLS" in config:
+        # synthetic load test constellation, generated instead of queried
+        store = cached_element_store(f"synthetic_{const_name}", lambda: walker_store(config["_SHELLS"]))
+    else:
+        # OMM rows are converted to element records batch by batch as the JSON response streams in
+        fetch = lambda: fetch_spacetrack_elements(const_name, spacetrack_credentials(), query_limit)[0]
+        store = cached_element_store(f"spacetrack_{const_name}", fetch)
+    satellites = store.satellites()
+    if DEBUG:
+        print(f"Loaded {len(satellites)} satellites for {const_name}.")
+    return satellites
+
+@st.cache_resource
+def get_job_runner():
+    # one worker pool per process, so heavy queries from many sessions queue instead of all computing at once
+    return JobRunner(name='transits')
+
+def transit_job(key, fn, *args):
+    '''
+    @brief Background job of this session for key, the session's previous job is cancelled when key changed
 
-            azaltrange[id] = np.array([az.degrees, alt.degrees, range.km])
-            geo_pos[id] = np.array([geocentric.position.km[0], geocentric.position.km[1], geocentric.position.km[2]])
-            lat_lon[id] = np.array([lat.degrees, lon.degrees])
-        
-        self.geo_position = geo_pos
-        self.latlon = lat_lon
-        self.azaltrange = azaltrange
-        self.time_list = ts_range
-        res = True
-        return res
-
-    def is_populated(self):
-        status = False
-        check_latlon = self.latlon.shape == (NUM_TRACK, 2)
-        check_azaltrange = self.azaltrange.shape == (NUM_TRACK, 3)
-        check_position = self.geo_position.shape == (NUM_TRACK, 3)
-        check_time_nodes = len(self.time_list) == NUM_TRACK
-
-        if check_time_nodes and check_latlon and check_azaltrange and check_position:
-            status = True
-        else:
-            if DEBUG:
-                print(f"Ephemeris not populated for event: {self}")
-        return status
+    @param key  hashable inputs of the computation, e.g. constellation, location, time range
+    @param fn   fn(job, *args), runs off the script thread so it must not call st.*
+    @return core.jobs.Job
+    '''
+    job = get_job_runner().supersede(st.session_state.get('transit_job'), key, fn, *args)
+    st.session_state['transit_job'] = job
+    return job
 
-    def get_printable_times(self, format=DT_FORMAT):
-        '''
-        returns a list of time strings for all state vector epochs
-        '''
-        return [time.utc_strftime(format) for time in self.time_list]
-
-    def to_dict(self, tz):
-        # utility for converting object into reportable data in given tz
-        rise_az, set_az = 0, 0 # use defaults for safety and bring up any errors
-        if self.is_populated():
-            rise_az, set_az = self.azaltrange[0][0], self.azaltrange[-1][0]
-
-        dict_ret = {
-            'LOCATION': self.loc_name,
-            'RISE': self.rise.utc_datetime().astimezone(tz).strftime('%b %d, %Y %H:%M:%S'),
-            'CULMINATE': self.culminate.utc_datetime().astimezone(tz).strftime('%b %d, %Y %H:%M:%S'),
-            'SET': self.set.utc_datetime().astimezone(tz).strftime('%b %d, %Y %H:%M:%S'),
-            'ASSET': self.asset,
-            'RISE_AZIMUTH': rise_az,
-            'SET_AZIMUTH': set_az,
-            'LAUNCH_YEAR': f"'{self.satrec.model.intldesg[0:2]}"
-        }
- 
-        return dict_ret
-
-    def __str__(self):
-        return f"\n  Rise: {self.rise.utc_iso()} | Culminate: {self.culminate.utc_iso()} | Set: {self.set.utc_iso()}"
-
-class SatelliteMember(EarthSatellite):
+def cancel_transit_job():
     '''
-    Object that contains info about a satellite object and transit events
+    @return None, cancels the session's background job, e.g. from a widget callback as soon as an input changes
     '''
-    def __init__(self, st_object):
-        self.satrec_object = st_object # see above for attrs
-        self.events = []
-
-    def add_events(self, times, events, geoposition, for_loc):
-        rise_events, culmination_events, setting_events = times[np.where(events==0)], times[np.where(events==1)], times[np.where(events==2)]
-        # only add event if entire event is complete
-        if len(rise_events) == len(culmination_events) == len(setting_events):
-            for i in range(len(rise_events)):
-                event = TransitEvent(rise_events[i], culmination_events[i], setting_events[i], self.satrec_object.name, self.satrec_object, geoposition, for_loc)
-                # add event to list of events
-                self.events.append(event)
-        return None
-
-    def create_ephemeris(self):
-        res = False
-        for event in self.events: 
-            # populates lat/lon with time for event 
-            res = event.get_ephem()
-            if DEBUG and VERBOSE: 
-                print(f"Using {NUM_TRACK} point per transit to compute ephems.")
-        return res
-
-    def get_events_df(self, tz):
-        # utility for converting class into pd df 
-        df = pd.DataFrame.from_records([ev.to_dict(tz) for ev in self.events])
-        return df
-
-    def drop_events(self):
-        # used for callback when location / time range changes, we do not want to remember events
-        self.events = []
-
-    def __str__(self):
-        str_title = f"{self.satrec_object.name} | Epoch: {self.satrec_object.epoch.utc_iso()} | Events: {len(self.events)}"
-        for event in self.events:
-            str_title = f"{str_title} {event}"
-        return str_title
-
-@st.cache_resource(ttl=21600)
-def get_data_from_spacetrack(const_name, query_limit=10000):
-    
-    uriBase                = "https://www.space-track.org"
-    requestLogin           = "/ajaxauth/login"
-    requestCmdAction       = "/basicspacedata/query" 
-    requestURL = cc.CONFIGS[const_name]["_URL"] + f"/limit/{query_limit}"
-
-    with requests.Session() as session:
-        # need to log in first. note that we get a 200 to say the web site got the data, not that we are logged in
-        siteCred = {'identity': st.secrets.configuration.username, 'password': st.secrets.configuration.password}
-        resp = session.post(uriBase + requestLogin, data = siteCred)
-        if resp.status_code != 200:
-            st.error("Could not reach Spacetrack!")
-        # make get request from Spacetrack using the URL + auth
-        resp = session.get(uriBase + requestCmdAction + requestURL)  
-        if resp.status_code != 200:
-            st.error("API query failed from Spacetrack!")
-        else:
-            session.close()
-            # Convert text to bytearray
-            lines = resp.text.splitlines()
-            satellites = []
-            for index in range(0, len(lines), 3):
-                line_0, line_1, line_2 = lines[index:index+3]
-                satellite = EarthSatellite(line_1, line_2, line_0[1:], ts)
-                # print(satellite)
-                satellites.append(satellite)
-            return satellites
+    job = st.session_state.get('transit_job')
+    if job is not None:
+        job.cancel()
+    return None
 
 class SatConstellation(object):
     '''
     Object that contains all relevant information and methods for constellation!
     '''
-    def __init__(self, constellation):
-        if constellation in CONSTELLATIONS:
+    def __init__(self, constellation, min_elevation=None, radius_size=None, max_points=None):
+        if constellation in TRANSIT_CONSTELLATIONS:
+            config = cc.CONFIGS.get(constellation, cc.CUSTOM_CONFIG)
             self.constellation = constellation
-            self.min_elevation = cc.CONFIGS[constellation]['_MINELEVATIONS']
-            self.radius_size = cc.CONFIGS[constellation]['_RADIUSLEVELS']
-            self.map_zoom = cc.CONFIGS[constellation]['_ZOOMLEVELS']
+            self.min_elevation = config['_MINELEVATIONS']
+            self.radius_size = config['_RADIUSLEVELS']
+            self.map_zoom = config['_ZOOMLEVELS']
         else:
             st.error('Need a constellation to begin!')
 
-        help_str = "The angle of a satellite measured upwards from the observer's horizon. Thus, an object on the horizon has an elevation of 0° and one directly overhead has an elevation of 90°."
-        self.min_elevation = st.sidebar.slider("Restrict transits above horizon (degrees):", min_value=0, max_value=80, value=70, step=10, help=help_str)
-        self.radius_size = st.sidebar.slider("Point radius size:", min_value=500, max_value=6000, value=1000, step=300)
-        
-        global MAX_POINTS
-        MAX_POINTS = st.sidebar.slider("Max number of points on plot:", min_value=1000, max_value=10000, value=6000, step=1000)
+        # user settings (sidebar sliders on the transits page) override the constellation defaults
+        if min_elevation is not None:
+            self.min_elevation = min_elevation
+        if radius_size is not None:
+            self.radius_size = radius_size
+        # per instance, jobs of other sessions compute on the same worker threads
+        self.max_points = MAX_POINTS if max_points is None else max_points
+        self.num_track = NUM_TRACK # points per transit, set from max_points by the ephemerides
 
         self.initialized = False
+        self.source = constellation # identifies the element sets, the uploaded file for CUSTOM
+        self.long_horizon = False # schedule only, computed in time chunks (see generateLongHorizonPasses)
+        # per-stage timings and counters for this run, shown in the Logs tab
+        self.profiler = Profiler('constellation_transits', constellation=constellation)
         self.num_passes = 0
         self.unique_passes = 0
+        self.visibility_error = None # why transit visibility is missing, shown by showStats
         # download satellite data
-        self.notif_msgs = ""
+        self.qa_log = pd.DataFrame()
         self.query_sat_count = 0
         self.drop_count = 0
         self.satellites = self.get_sats()
+        # all passes of the constellation, filled by generatePasses
+        self.events = EventTable([sat.satrec_object for sat in self.satellites], {})
         # To be filled by generated sched
         self.schedule = pd.DataFrame()
+        # sub-satellite point index for "what's overhead" lookups, built on request for one instant
+        self.overhead_index = None
+        self.overhead_time = None
         # pandas df to be plotted
         self.stats_df = pd.DataFrame()
 
@@ -235,67 +147,60 @@ class SatConstellation(object):
         '''
 
         def load_file():
-            uploaded_file = st.file_uploader("Choose a valid TLE file (*.txt)", type = "txt")
-            sats = []
-            if uploaded_file is not None:
-                sats = load.tle_file(uploaded_file.name)
+            uploaded_file = st.file_uploader("Choose a 3LE / TLE or OMM (JSON, CSV, KVN) file", type=UPLOAD_TYPES)
+            if uploaded_file is None:
+                st.info('Upload an element set file to compute transits of your own satellites.', icon="ℹ️")
+                return []
+            store, report = ingest_upload(uploaded_file.getvalue(), uploaded_file.name)
+            self.source = (uploaded_file.name, uploaded_file.size)
+            st.caption(f"{report['LOADED']} of {report['READ']} element sets loaded, {report['INVALID']} invalid, "
+                       f"{report['DUPLICATES']} duplicates, {report['SUPERSEDED']} older epochs skipped.")
+            sats = store.satellites()
             if len(sats) > 0:
+                self.initialized = True
                 return sats
             else:
                 raise Exception("BAD_FILE_READ_ERROR")
         member_satellites = []
         # only add satellite with valid propagation
         try:
-            if self.constellation != "CUSTOM":
-                satellites = get_data_from_spacetrack(self.constellation)
-                self.initialized = True 
-            else:
-                satellites = load_file()
+            with self.profiler.span('fetch'):
+                if self.constellation != CUSTOM:
+                    satellites = get_data_from_spacetrack(self.constellation)
+                    self.initialized = True 
+                else:
+                    satellites = load_file()
             # Saved queried number of satellites.
             self.query_sat_count = len(satellites)
-            # Report successful query completion
-            self.notif_msgs = f"Processing {len(satellites)} satellites from Spacetrack.\n"
-            self.notif_msgs = self.notif_msgs + "-"*45
+            self.profiler.count('satellites_processed', len(satellites))
             # filter satellites for deorbitted sats just in case
-            log_msg = None
-            for sat in satellites:
-                alt = (sat.model.am - 1) * sat.model.radiusearthkm
-                tle_age = abs(ts.now() - sat.epoch)
-                if tle_age > STALE_EPOCH:
-                    log_msg = f"❌ Dropping sat: {sat}\n Reason: stale TLE, tle age: {tle_age:.2f} days"
-                    self.drop_count += 1
-                elif sat.model.error != 0:
-                    log_msg = f"❌ Dropping sat: {sat}\n Reason: propagation error, code: {cc.ERROR_CODES[str(sat.model.error)]}"
-                    self.drop_count += 1
-                elif alt < 150:
-                    log_msg = f"❌ Dropping sat: {sat}\n Reason: unrealistic altitude: {alt:.2f} km"
-                    self.drop_count += 1           
-                else:
-                    log_msg = f"✅ Adding sat: {sat}\n Passed: QA checks - tle age: {tle_age:.2f} days, altitude: {alt:.0f} km"
-                    member_satellites.append(SatelliteMember(sat))
-                self.notif_msgs = f"{self.notif_msgs}\n" + log_msg + f"\n" + "-"*25 
-            self.notif_msgs = f"{self.notif_msgs}" + "-"*25 + f"\n🛠️ Processed {len(satellites)} sats\n" + f"❌ Dropped {self.drop_count} sats\n" + f"✅ Saved {len(satellites) - self.drop_count} sats\n" 
+            with self.profiler.span('qa'):
+                passed, self.qa_log = passed_qa(satellites)
+            self.drop_count = len(satellites) - len(passed)
+            member_satellites = [SatelliteMember(sat) for sat in passed]
 
         except Exception as e:
             st.error(f"Something went horribly wrong, sorry. {e}")
         return member_satellites
 
-    def generatePasses(self, usrLocObject):
+    def generatePasses(self, usrLocObject, progress=None):
         '''!
         @brief  Generate the passes of a specific constellation over a specified location and time range.
 
         @param usrLocObject    TUPLE of latitude and longitude        
+        @param progress        optional callback(fraction, message), e.g. core.jobs.Job.report, raising stops the run
 
         @return passes      generate passes vector
         '''
 
         def findTransits(usrLocObject):
-            for sat in self.satellites:
-                times, events = sat.satrec_object.find_events(self.cityLatLon, self.time[0], self.time[1], self.min_elevation)
-                if len(events) > 0:
-                    sat.add_events(times, events, self.cityLatLon, usrLocObject.selected_loc)
-                if DEBUG and VERBOSE: 
-                    print(sat)
+            def search_progress(done, total):
+                progress(SEARCH_SHARE * done / total, f"Searched {done} of {total} satellites for transits...")
+
+            with self.profiler.span('find_events'):
+                self.events = EventTable([sat.satrec_object for sat in self.satellites], {usrLocObject.selected_loc: position})
+                self.events.find_passes(self.time[0], self.time[1], self.min_elevation,
+                                        progress=search_progress if progress is not None else None)
 
         # check if initialized
         if not self.initialized:
@@ -304,27 +209,71 @@ class SatConstellation(object):
         position = usrLocObject.selected_position
         dateRange = usrLocObject.date_range
         self.cityLatLon = wgs84.latlon(position[0], position[1])
+        ts = get_timescale()
         self.time = (ts.from_datetime(dateRange[0]), ts.from_datetime(dateRange[1]))
         self.tz = dateRange[0].tzinfo
-        # Adds transit events to each satellite
+        self.date_range = dateRange
+        self.long_horizon = False
+        self.profiler.update_context(location=usrLocObject.selected_loc, min_elevation=self.min_elevation,
+                                     start=dateRange[0].isoformat(), stop=dateRange[1].isoformat(), long_horizon=False)
+        # Adds transit events of all satellites to the event table
         findTransits(usrLocObject)
         # Returns a pandas dataframe and populates transit events with ephemeris info
-        return self.getSchedule()
+        return self.getSchedule(progress)
+
+    def generateLongHorizonPasses(self, usrLocObject, progress=None):
+        '''!
+        @brief  Schedule over a multi-week window, searched one chunk at a time so memory is bounded by the chunk length.
+                No transit events / ephemerides are kept, finished chunks are appended to the schedule as they stream in.
+
+        @param usrLocObject    UserLocation with selected position and date range
+        @param progress        optional callback(fraction, message), a progress bar on the page when None
 
-    def getSchedule(self):
+        @return passes      PANDAS df, see getSchedule
         '''
+        if not self.initialized:
+            return False
+
+        position = usrLocObject.selected_position
+        dateRange = usrLocObject.date_range
+        self.cityLatLon = wgs84.latlon(position[0], position[1])
+        self.tz = dateRange[0].tzinfo
+        self.date_range = dateRange
+        self.long_horizon = True
+        self.profiler.update_context(location=usrLocObject.selected_loc, min_elevation=self.min_elevation,
+                                     start=dateRange[0].isoformat(), stop=dateRange[1].isoformat(), long_horizon=True)
+        self.dropEvents()
+
+        satellites = [sat.satrec_object for sat in self.satellites]
+        chunks = []
+        bar = None
+        if progress is None:
+            bar = st.progress(0.0, text="Computing transit schedule in chunks...")
+            progress = lambda fraction, message: bar.progress(fraction, text=message)
+        with self.profiler.span('find_events_chunked'):
+            for done, total, df_chunk in iter_chunked_schedule(satellites, self.cityLatLon, usrLocObject.selected_loc,
+                                                               dateRange[0], dateRange[1], self.min_elevation, self.tz):
+                chunks.append(df_chunk)
+                progress(done / total, f"Computed {done} of {total} days, {sum(len(df) for df in chunks)} transits so far.")
+        if bar is not None:
+            bar.empty()
+
+        self.schedule = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        self.num_passes = len(self.schedule)
+        self.unique_passes = self.schedule['ASSET'].nunique() if self.num_passes > 0 else 0
+        self.profiler.count('events_found', self.num_passes)
+        return self.schedule.copy()
+
+    def getSchedule(self, progress=None):
+        '''
+        @param progress     optional callback(fraction, message), called before every stage
         @return passes      PANDAS df [Satellite Name, Time of Rise (string), Culminate (string), Set (string)]
         '''
+        report = progress or (lambda fraction, message: None)
 
         def update_pass_stats():
-            num_passes = 0
-            num_sats_with_passes = 0
-            for sat in self.satellites:
-                if sat.events:
-                    num_sats_with_passes += 1
-                    num_passes += len(sat.events)
-            self.num_passes = num_passes
-            self.unique_passes = num_sats_with_passes
+            self.num_passes = len(self.events)
+            self.unique_passes = len(np.unique(self.events.events['sat']))
             return None
 
         def compute_ephems():
@@ -332,22 +281,29 @@ class SatConstellation(object):
             @return None, computes points per transit based on number of transits and max points, for performance
             '''
             if self.num_passes > 0:
-                global NUM_TRACK
-                NUM_TRACK = int(MAX_POINTS / self.num_passes)
-                for sat in self.satellites:
-                    sat.create_ephemeris()
+                self.num_track = int(self.max_points / self.num_passes)
+                # all events share one time grid, Earth orientation is computed once for the batch
+                self.events.compute_ephemerides(self.num_track)
             else:
                 if DEBUG:
                     print('Did not generate schedule as there are no transits!')
             return None
 
+        def compute_visibility():
+            self.visibility_error = None
+            try:
+                self.events.compute_visibility()
+            except OSError as e:
+                # the planetary ephemeris could not be downloaded / read, the schedule is still usable without it
+                # (this can run on a job thread, the warning is shown by showStats)
+                self.visibility_error = str(e)
+                self.profiler.count('visibility_unavailable')
+            return None
+
         def get_pd_df():
             if self.num_passes > 0:
-                df_list = []
-                for sat in self.satellites:
-                    df_list.append(sat.get_events_df(self.tz))
-                passes_df = pd.concat(df_list)
-                self.schedule = passes_df
+                # one vectorized build over the event table, times stay datetime64 until display
+                self.schedule = self.events.to_schedule(self.tz)
             else:
                 if DEBUG:
                     print('Returning default empty DF, as there are no transits!')
@@ -355,12 +311,22 @@ class SatConstellation(object):
 
         # get number of transits and update class attributes for transit stats
         update_pass_stats()
+        self.profiler.count('events_found', self.num_passes)
 
         # generate ephemeris based on num transits and max points per transit
-        compute_ephems()
+        report(SEARCH_SHARE, f"Computing ephemerides of {self.num_passes} transits...")
+        with self.profiler.span('compute_ephems'):
+            compute_ephems()
+
+        # satellite sunlight / observer twilight at culmination for all transits in one batch
+        report(0.9, "Classifying transit visibility...")
+        with self.profiler.span('compute_visibility'):
+            compute_visibility()
 
         # return pandas dataframe
-        df_to_display = get_pd_df()
+        report(0.95, "Building the transit schedule...")
+        with self.profiler.span('get_pd_df'):
+            df_to_display = get_pd_df()
 
         return df_to_display
 
@@ -370,8 +336,7 @@ class SatConstellation(object):
         '''
         if DEBUG:
             print('Dropped all events for satellites since time range / location was changed!')
-        for sat in self.satellites:
-            sat.drop_events()
+        self.events.clear()
         return None
 
     def showStats(self, usrLoc):
@@ -396,10 +361,41 @@ class SatConstellation(object):
                     tz_info_str = f'''All times reported are in local timezone of {usrLoc.selected_tz}.'''
                     st.info(tz_info_str, icon="ℹ️")
 
-                    gTrack_info_str = f'''Limiting plotting to {MAX_POINTS} points total. 
+                    gTrack_info_str = f'''Limiting plotting to {self.max_points} points total. 
                                        These points are divided amongst number of transits equally. '''
                     st.info(gTrack_info_str, icon="ℹ️")
 
+        def plot_pass_timeline(sked_for_tl):
+            # one bar per pass, only used for a limited number of passes
+            # fig = px.timeline(sked_for_tl, x_start="RISE", x_end="SET", y='LAUNCH_YEAR')
+            fig = px.timeline(sked_for_tl, x_start="RISE", x_end="SET", y = "Location", color='ASSET', 
+                            hover_data={'ASSET':True, "RISE": False, "SET": False, 
+                            'RISE_AZIMUTH':':.2f', 'SET_AZIMUTH':':.2f', 'DURATION (sec)':':.2f'})
+            fig.update_yaxes(autorange="reversed")
+            return fig
+
+        def display_occupancy(sked_for_tl):
+            st.caption(f"{len(sked_for_tl)} transits are aggregated into the number of satellites in view over time, "
+                       f"zoom into a shorter window below to see individual transits.")
+            with self.profiler.span('plot_timeline'):
+                occupancy = schedule_occupancy(sked_for_tl, self.date_range[0], self.date_range[1])
+                fig = px.area(occupancy, x='TIME', y='IN_VIEW', color='ASSET', line_shape='hv',
+                              labels={'IN_VIEW': 'Satellites in view', 'TIME': ''})
+            st.plotly_chart(fig, theme="streamlit")
+            # drill down to individual passes in a sub-window
+            window_start, window_stop = self.date_range[0], self.date_range[1]
+            zoom = st.slider("Zoom into transits between:", min_value=window_start, max_value=window_stop,
+                             value=(window_start, min(window_stop, window_start + timedelta(hours=2))),
+                             step=timedelta(minutes=15), format="MM/DD/YY HH:mm")
+            in_zoom = sked_for_tl[(sked_for_tl['SET'] >= zoom[0]) & (sked_for_tl['RISE'] <= zoom[1])]
+            if len(in_zoom) == 0:
+                st.caption('No transits in the zoomed window.')
+            elif len(in_zoom) > TIMELINE_MAX_BARS:
+                st.caption(f"{len(in_zoom)} transits in the zoomed window, pick a shorter window to see individual transits.")
+            else:
+                st.plotly_chart(plot_pass_timeline(in_zoom), theme="streamlit")
+            return None
+
         def display_transits(types):
             for type in types:        
                 if type == "TABLE":
@@ -408,28 +404,32 @@ class SatConstellation(object):
                     st.caption(ele_info_str)
                     # print tabular schedule
                     transit_schedule = self.getTransits(purpose="TO_PRINT")
+                    if 'VISIBILITY' in transit_schedule.columns:
+                        help_str = "Satellite in sunlight at culmination while the sun is more than 6° below the horizon (nautical twilight or darker)."
+                        if st.checkbox("Only show optically visible transits", value=False, help=help_str):
+                            transit_schedule = transit_schedule[transit_schedule['VISIBILITY'] == 'VISIBLE']
+                            st.caption(f"{len(transit_schedule)} of {self.num_passes} transits are visible to the naked eye.")
                     # 'ASSET', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH'
                     st.dataframe(transit_schedule, use_container_width=True)
                 elif type == "TIMELINE":
                     try:
                         # plot timeline view
-                        sked_for_tl = self.getTransits(purpose="FOR_TIMELINE")
-                        sked_for_tl['Location'] = f"{usrLoc.selected_loc}"
-                        # fig = px.timeline(sked_for_tl, x_start="RISE", x_end="SET", y='LAUNCH_YEAR')
-                        fig = px.timeline(sked_for_tl, x_start="RISE", x_end="SET", y = "Location", color='ASSET', 
-                                        hover_data={'ASSET':True, "RISE": False, "SET": False, 
-                                        'RISE_AZIMUTH':':.2f', 'SET_AZIMUTH':':.2f', 'DURATION (sec)':':.2f'})
-                        fig.update_yaxes(autorange="reversed")
-                        # BUGGY - NEED TO RESOLVEd
-                        st.plotly_chart(fig, theme="streamlit")
+                        with self.profiler.span('plot_timeline'):
+                            sked_for_tl = self.getTransits(purpose="FOR_TIMELINE")
+                            sked_for_tl['Location'] = f"{usrLoc.selected_loc}"
+                        if len(sked_for_tl) > TIMELINE_MAX_BARS:
+                            display_occupancy(sked_for_tl)
+                        else:
+                            st.plotly_chart(plot_pass_timeline(sked_for_tl), theme="streamlit")
                     except Exception as e:
                         print("Encountered an exception while displaying timeline: ", e)
                         st.warning("Sorry, something went wrong, could not display timeline.")
                 elif type == "GROUND_TRACKS":
                     # plot ground tracks of transits
                     try:
-                        st.caption(f"Showing {NUM_TRACK} points for each ground track from transits for {self.constellation} satellite constellation over {usrLoc.selected_loc}.")
-                        gTrack = self.generateGroundTracks()
+                        st.caption(f"Showing {self.num_track} points for each ground track from transits for {self.constellation} satellite constellation over {usrLoc.selected_loc}.")
+                        with self.profiler.span('generateGroundTracks'):
+                            gTrack = self.generateGroundTracks()
                         st.pydeck_chart(gTrack)
                     except Exception as e:
                         print("Encountered an exception while displaying ground tracks: ", e)
@@ -438,33 +438,147 @@ class SatConstellation(object):
                     raise ValueError('cant find my purpose!!')
             return None
 
+        def display_qa_log():
+            if self.qa_log.empty:
+                st.caption('No QA results to show.')
+                return None
+            reasons = self.qa_log['REASON'].unique().tolist()
+            reason_filter = st.multiselect("Filter QA logs by reason:", reasons, default=[r for r in reasons if r != QA_PASSED] or reasons)
+            qa_view = self.qa_log[self.qa_log['REASON'].isin(reason_filter)]
+            num_pages = max(1, -(-len(qa_view) // QA_PAGE_SIZE))
+            page = st.number_input(f"Page (of {num_pages}):", min_value=1, max_value=num_pages, value=1, step=1)
+            start = (page - 1) * QA_PAGE_SIZE
+            st.caption(f"Showing {min(QA_PAGE_SIZE, max(len(qa_view) - start, 0))} of {len(qa_view)} QA log entries.")
+            st.dataframe(qa_view.iloc[start:start + QA_PAGE_SIZE].set_index('ASSET'), use_container_width=True)
+            return None
+
+        def display_coverage():
+            stats, gaps, revisits = self.getCoverage()
+            st.caption(f"Coverage of {usrLoc.selected_loc} merged over all {self.constellation} passes above {self.min_elevation}° in the selected time range.")
+            col1, col2, col3, col4 = st.columns([1,1,1,1])
+            col1.metric("Coverage", f"{stats['COVERAGE (%)']:.1f} %")
+            col2.metric("Mean revisit", f"{stats['MEAN_REVISIT (min)']:.1f} min" if len(revisits) else "-")
+            col3.metric("Median gap", f"{stats['P50_GAP (min)']:.1f} min")
+            col4.metric("Longest gap", f"{stats['MAX_GAP (min)']:.1f} min")
+            st.dataframe(pd.DataFrame([stats], index=[usrLoc.selected_loc]).rename_axis('LOCATION'), use_container_width=True)
+            fig = px.histogram(pd.DataFrame({'MINUTES': np.concatenate([gaps, revisits]),
+                                             'INTERVAL': ['Gap'] * len(gaps) + ['Revisit'] * len(revisits)}),
+                               x='MINUTES', color='INTERVAL', barmode='overlay', title='Gap and Revisit Distributions')
+            st.plotly_chart(fig, theme="streamlit")
+            display_in_view()
+            return None
+
+        def display_in_view():
+            help_str = f"Propagates all {len(self.satellites)} satellites every {COVERAGE_STEP} seconds over the selected time range, this can take a while for big constellations."
+            if not st.checkbox("Show number of satellites in view over time", value=False, help=help_str):
+                return None
+            with st.spinner("Counting satellites in view..."):
+                with self.profiler.span('in_view_series'):
+                    in_view, stats = self.getInViewCounts()
+            col1, col2, col3 = st.columns([1,1,1])
+            col1.metric("Min in view", stats['MIN'])
+            col2.metric("Mean in view", f"{stats['MEAN']:.1f}")
+            col3.metric("Max in view", stats['MAX'])
+            fig = px.line(in_view, x='TIME', y='IN_VIEW', line_shape='hv', labels={'IN_VIEW': 'Satellites in view', 'TIME': ''},
+                          title=f"Satellites Above {self.min_elevation}° Over {usrLoc.selected_loc}")
+            st.plotly_chart(fig, theme="streamlit")
+            return None
+
+        def display_overhead():
+            with st.expander("What's overhead?"):
+                window_start, window_stop = self.date_range[0], self.date_range[1]
+                col1, col2 = st.columns([3,1])
+                when = col1.slider("Time:", min_value=window_start, max_value=window_stop, value=window_start,
+                                   step=timedelta(minutes=5), format="MM/DD/YY HH:mm")
+                radius = col2.number_input("Radius (km):", min_value=100, max_value=5000, value=1000, step=100)
+                # expander bodies run even when collapsed, so members are only propagated once asked for
+                if not st.checkbox("Find satellites overhead", value=False):
+                    return None
+                with st.spinner("Indexing sub-satellite points..."):
+                    with self.profiler.span('overhead_index'):
+                        index = self.getOverheadIndex(when)
+                sat_idx, distance = index.within_radius(self.cityLatLon.latitude.degrees, self.cityLatLon.longitude.degrees, radius, 0)
+                st.caption(f"{len(sat_idx)} {self.constellation} satellites within {radius} km of {usrLoc.selected_loc} "
+                           f"at {index.grid.times[0].utc_strftime(DT_FORMAT)} UTC.")
+                st.dataframe(index.to_frame(sat_idx, 0, distance).set_index('ASSET'), use_container_width=True)
+            return None
+
+        def display_doppler():
+            with st.expander("Doppler profiles"):
+                help_str = "Downlink carrier frequency, the shift is positive while the satellite approaches."
+                carrier_mhz = st.number_input("Carrier frequency (MHz):", min_value=1.0, max_value=40000.0, value=CARRIER_MHZ, step=1.0, help=help_str)
+                profiles = self.getDopplerProfiles(carrier_mhz * 1e6)
+                st.caption(f"Range rate and Doppler shift at {self.num_track} points per transit, the download has every point.")
+                summary = profiles.groupby('PASS').agg(ASSET=('ASSET', 'first'), START=('TIME', 'min'),
+                                                       MAX_DOPPLER=('DOPPLER (Hz)', 'max'), MIN_DOPPLER=('DOPPLER (Hz)', 'min'),
+                                                       MAX_RANGE_RATE=('RANGE_RATE (km/s)', lambda rr: rr.abs().max()))
+                summary = summary.sort_values(by='START')
+                summary['START'] = summary['START'].dt.strftime(DT_FORMAT)
+                st.dataframe(summary.set_index('ASSET'), use_container_width=True)
+                st.download_button("Download Doppler profiles (CSV)", profiles.to_csv(index=False).encode('utf-8'),
+                                   file_name=f"{self.constellation}_doppler.csv", mime='text/csv')
+            return None
+
+        def display_profile():
+            st.caption("Time spent per stage for this run (stages still running, e.g. this tab, are not included).")
+            st.dataframe(pd.DataFrame.from_records(self.profiler.to_records()), use_container_width=True, hide_index=True)
+            counters = self.profiler.counters
+            col1, col2, col3 = st.columns([1,1,1])
+            col1.metric("Satellites processed", counters.get('satellites_processed', 0))
+            col2.metric("Events found", counters.get('events_found', 0))
+            col3.metric("Points emitted", counters.get('points_emitted', 0))
+            with st.expander("See run profile as JSON"):
+                st.code(self.profiler.to_json(), language="json")
+            return None
+
         display_results_summary()
+        if self.visibility_error is not None:
+            st.warning(f"Transit visibility (sunlit / twilight) is not shown, the planetary ephemeris could not be loaded: {self.visibility_error}", icon="⚠️")
 
-        tab1, tab2, tab3 = st.tabs(["Transits", "Constellation Statistics", "Logs"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Transits", "Coverage", "Constellation Statistics", "Logs"])
 
         with tab1:
             if self.num_passes > 0:
                 # display elements in this order
-                display_transits(types=["GROUND_TRACKS","TABLE","TIMELINE"])
+                if self.long_horizon:
+                    # no per transit ephemerides are kept in long-horizon mode
+                    display_transits(types=["TABLE","TIMELINE"])
+                else:
+                    display_transits(types=["GROUND_TRACKS","TABLE","TIMELINE"])
+                    display_doppler()
                 display_info_tab()
             else:
                 st.caption('No transists found in the given timeframe.')
+            if not self.long_horizon:
+                display_overhead()
 
         with tab2:
+            if self.num_passes > 0:
+                with self.profiler.span('coverage_statistics'):
+                    display_coverage()
+            else:
+                st.caption('No transists found in the given timeframe.')
+
+        with tab3:
             # gets a pandas df for stats to be plotted
             st.caption(f"Showing results for {len(self.satellites)} satellites in {self.constellation} constellation that are still in orbit.")
-            self.getDataPDtoPlot()
-            launchDist = self.getLaunchDist()
+            with self.profiler.span('plot_statistics'):
+                self.getDataPDtoPlot()
+                launchDist = self.getLaunchDist()
+                smaHist = self.getSMADist()
+                incDist = self.getIncDist()
             st.plotly_chart(launchDist, theme="streamlit")
-            smaHist = self.getSMADist()
             st.plotly_chart(smaHist, theme="streamlit")
-            incDist = self.getIncDist()
             st.plotly_chart(incDist, theme="streamlit")
         
-        with tab3:
+        with tab4:
             summary_txt = f"🛠️ Processed {self.query_sat_count} sats\n" + f"❌ Dropped {self.drop_count} sats\n" + f"✅ Saved {self.query_sat_count - self.drop_count} sats" 
             st.text_area("QA Summary", summary_txt, disabled=True)
-            st.text_area("Extended Logs", self.notif_msgs, disabled=True)
+            display_qa_log()
+            display_profile()
+
+        # one JSON line per run for production logs
+        self.profiler.emit()
 
         return None
 
@@ -475,51 +589,84 @@ class SatConstellation(object):
         df = self.schedule.copy()
         if purpose == "TO_PRINT":
             # Only select a subset of columns
-            df = df[['ASSET', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH']]
+            # visibility classes are only there when the sun ephemeris could be loaded
+            visibility_cols = [col for col in ['SATELLITE_LIGHT', 'OBSERVER_SKY', 'VISIBILITY'] if col in df.columns]
+            df = df[['ASSET', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH'] + visibility_cols]
+            # sort on datetimes, format as strings only for display
+            df = format_schedule_times(df.sort_values(by='RISE', ascending=True))
             df.set_index('ASSET', inplace=True)
-            df.sort_values(by='RISE', ascending=True, inplace=True)
             # df.rename(columns={"RISE": "a", "SET": "c"}, inplace=True)
         elif purpose == "FOR_TIMELINE":
-            df = df[['ASSET', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH', 'LAUNCH_YEAR']]
-            df["RISE"] = pd.to_datetime(df["RISE"])
-            df["SET"] = pd.to_datetime(df["SET"])
+            df = df[['ASSET', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH', 'LAUNCH_YEAR']].copy()
             df['DURATION (sec)'] = (df.SET - df.RISE) / pd.Timedelta(seconds=1)
             # df.rename(columns={"RISE": "a", "SET": "c"}, inplace=True)
         else:
             raise ValueError('cant find my purpose!!')
         return df
 
+    def getDopplerProfiles(self, frequency_hz):
+        '''
+        @return pandas df with range rate and Doppler shift over every ephemeris point of every transit, see
+                EventTable.doppler_profiles
+        '''
+        return self.events.doppler_profiles(frequency_hz, self.tz)
+
+    def getCoverage(self):
+        '''
+        @brief Merges all passes into one coverage timeline over the selected time range
+
+        @return dict of coverage statistics, gap lengths (min) and revisit intervals (min)
+        '''
+        duration = (self.date_range[1] - self.date_range[0]).total_seconds()
+        starts = (self.schedule['RISE'] - self.date_range[0]).dt.total_seconds().to_numpy()
+        stops = (self.schedule['SET'] - self.date_range[0]).dt.total_seconds().to_numpy()
+        stats = coverage_statistics(starts, stops, 0.0, duration)
+        cov_starts, _, gaps = coverage_timeline(starts, stops, 0.0, duration)
+        return stats, gaps / 60, np.diff(cov_starts) / 60
+
+    def getInViewCounts(self, step_seconds=COVERAGE_STEP):
+        '''
+        @brief Number of constellation members above the minimum elevation at every step over the selected time range,
+               from batched propagation in chunks of satellites
+
+        @return pandas df with TIME / IN_VIEW columns and dict with MIN / MEAN / MAX
+        '''
+        site = (self.cityLatLon.latitude.degrees, self.cityLatLon.longitude.degrees)
+        return in_view_series([sat.satrec_object for sat in self.satellites], site, self.date_range[0], self.date_range[1],
+                              self.min_elevation, step_seconds)
+
+    def getOverheadIndex(self, when):
+        '''
+        @return SubSatelliteIndex of all members at one instant (timezone aware datetime), one propagation step per
+                query, kept until another instant is asked for
+        '''
+        if self.overhead_index is None or self.overhead_time != when:
+            self.overhead_index = SubSatelliteIndex.at_time([sat.satrec_object for sat in self.satellites], when)
+            self.overhead_time = when
+        return self.overhead_index
+
     def generateGroundTracks(self):
-        lat_list, lon_list, asset_list, label_list, color_list = [], [], [], [], []
-        for sat in self.satellites:
-            rand_r, rand_g, rand_b = random.randint(0,255), random.randint(0,255), random.randint(0,255)
-            for event in sat.events:
-                if event.is_populated():
-                    time_nodes = event.get_printable_times()
-                    for idx, node in enumerate(event.latlon):
-                        lat_list.append(node[0])
-                        lon_list.append(node[1])
-                        azimuth = round(event.azaltrange[idx][0],2)
-                        elevation = round(event.azaltrange[idx][1],2)
-                        asset_list.append(event.asset)
-                        label_dp = f'''{event.asset} ({sat.satrec_object.model.satnum}) 
-                                        Epoch: {time_nodes[idx]}
-                                        Alt/Azm: {elevation}/{azimuth}
-                                        Lat/Lon: {round(node[0],2)}/{round(node[1],2)}'''
-                        label_list.append(label_dp)
-                        if "FM-" in event.asset:
-                            color_list.append([0, 255, 0])
-                        else:
-                            if MULTI_COLOR:
-                                color_list.append([rand_r, rand_g, rand_b]) # plot different colors
-                            else:
-                                color_list.append([255, 255, 255])
-                else:
-                    print(f"did not add this event: {event}")
-                    if DEBUG:
-                        print(f"Could not add event for ground tracks: {event}")
-                
-        chart_data = pd.DataFrame({"epoch": label_list, "lat": lat_list, "lon": lon_list, "asset": asset_list, "colors": color_list})
+        ephem = self.events.ephem
+        sat_idx = self.events.events['sat'][self.events.ephemeris_event_index()]
+        assets = self.events.asset_names[sat_idx]
+        satnums = np.array([sat.model.satnum for sat in self.events.satellites])[sat_idx]
+        epochs = get_timescale().tt_jd(ephem['jd']).utc_strftime(DT_FORMAT) if len(ephem) else []
+
+        def rounded(values):
+            return pd.Series(np.round(values.astype(float), 2)).astype(str)
+
+        labels = (pd.Series(assets, dtype=object) + ' (' + pd.Series(satnums).astype(str) + ') \n Epoch: ' + pd.Series(epochs, dtype=object)
+                  + '\n Alt/Azm: ' + rounded(ephem['elevation']) + '/' + rounded(ephem['azimuth'])
+                  + '\n Lat/Lon: ' + rounded(ephem['lat']) + '/' + rounded(ephem['lon']))
+        if MULTI_COLOR:
+            sat_colors = np.random.randint(0, 256, size=(len(self.events.satellites), 3)) # plot different colors
+        else:
+            sat_colors = np.full((len(self.events.satellites), 3), 255)
+        sat_colors[["FM-" in name for name in self.events.asset_names]] = [0, 255, 0]
+
+        chart_data = pd.DataFrame({"epoch": labels, "lat": ephem['lat'].astype(float), "lon": ephem['lon'].astype(float),
+                                   "asset": assets, "colors": sat_colors[sat_idx].tolist()})
+        self.profiler.count('points_emitted', len(chart_data))
 
         # Simple implementation
         # st.map(chart_data)
@@ -0,0 +1,7 @@
+'''
+UI-free compute core: element ingestion / QA, propagation, transit events, RIC frames and eclipse checks.
+
+Nothing is imported here on purpose, import the submodule you need (e.g. `from core import events`) so
+worker processes and batch jobs only pay for what they use. The Streamlit adapters built on top of this
+package live in constellation_utils.py and satellite_utils.py.
+'''
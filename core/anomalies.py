@@ -0,0 +1,130 @@
+'''
+Manoeuvre and decay screening over element histories: SMA, inclination and RAAN series of every satellite are laid out
+as one padded (satellite, element set) array so steps, drift rates and robust z-scores are computed for all
+satellites at once.
+'''
+import numpy as np
+import pandas as pd
+from skyfield.constants import DAY_S
+from core.propagation import UNIX_EPOCH_JD
+from core.tle_history import mean_elements
+
+DEBUG = False
+
+RECENT_DAYS = 7 # window screened for anomalies, older element sets are the baseline
+BASELINE_DAYS = 60
+Z_THRESHOLD = 6.0 # robust z-score above which a change is flagged
+MAD_SCALE = 1.4826 # median absolute deviation -> standard deviation for normal noise
+# noise floors, element set to element set scatter below these is never flagged
+SMA_NOISE_KM = 0.05
+INC_NOISE_DEG = 0.003
+RAAN_NOISE_DEG = 0.01
+DECAY_RATE_KM_DAY = 0.2 # SMA loss rate that counts as decay
+DECAY_MIN_STEPS = 3 # decay needs this many recent steps, mostly downward, a single drop is a manoeuvre
+DECAY_DOWN_FRACTION = 0.8
+
+FLAG_MANEUVER = 'MANEUVER'
+FLAG_DECAY = 'DECAY'
+TRENDS_URL = "http://celestrak.org/NORAD/elements/graph-orbit-data.php?CATNR={}" # source of the Tracker's trends plot
+ANOMALY_COLUMNS = ['NORAD ID', 'ASSET', 'FLAG', 'SCORE', 'SETS', 'LAST_EPOCH', 'SMA (km)', 'SMA_STEP (km)',
+                   'INC_STEP (deg)', 'RAAN_STEP (deg)', 'SMA_RATE (km/day)', 'TRENDS']
+
+def padded(values, offsets):
+    '''
+    @return (n_groups, longest group) array of grouped values, groups are values[offsets[i]:offsets[i + 1]], nan padded
+    '''
+    counts = np.diff(offsets)
+    out = np.full((len(counts), counts.max() if len(counts) else 0), np.nan)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    cols = np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], counts)
+    out[rows, cols] = values[offsets[0]:offsets[-1]]
+    return out
+
+def robust_z(values, baseline, noise_floor):
+    '''
+    @return |values - median| / robust sigma per row, the sigma comes from the baseline columns and never drops
+            below noise_floor
+    '''
+    masked = np.where(baseline, values, np.nan)
+    # all nan rows have no baseline yet, they are scored against the noise floor alone
+    with np.errstate(all='ignore'):
+        center = np.nan_to_num(np.nanmedian(masked, axis=1))
+        sigma = MAD_SCALE * np.nanmedian(np.abs(masked - center[:, None]), axis=1)
+    sigma = np.fmax(np.nan_to_num(sigma), noise_floor)
+    return np.abs(values - center[:, None]) / sigma[:, None]
+
+def screen_history(history, now_jd, recent_days=RECENT_DAYS, baseline_days=BASELINE_DAYS, z_threshold=Z_THRESHOLD):
+    '''
+    @brief Flags satellites whose SMA falls steadily faster than DECAY_RATE_KM_DAY over the recent window (DECAY), or
+           whose SMA / inclination / RAAN changed more than their baseline scatter allows (MANEUVER)
+
+    Steps between consecutive element sets are scored with robust z-scores against the same satellite's steps in
+    the baseline window. RAAN steps are taken after removing the satellite's median nodal drift.
+
+    @param history  TLEHistory
+    @param now_jd   UTC julian date the recent window ends at
+    @return pandas df with ANOMALY_COLUMNS ranked by SCORE, one row per satellite with element sets in the recent window
+    '''
+    if len(history) == 0:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    sma, inc, raan = mean_elements(history.records)
+    epochs = padded(history.epochs, history.offsets)
+    sma, inc = padded(sma, history.offsets), padded(inc, history.offsets)
+    raan = np.degrees(np.unwrap(np.radians(padded(raan, history.offsets)), axis=1))
+
+    # steps between consecutive element sets, scored at the later one
+    dt_days = np.diff(epochs, axis=1)
+    valid = dt_days > 0
+    later = epochs[:, 1:]
+    recent = valid & (later >= now_jd - recent_days) & (later <= now_jd)
+    baseline = valid & (later < now_jd - recent_days) & (later >= now_jd - recent_days - baseline_days)
+
+    sma_step, inc_step = np.diff(sma, axis=1), np.diff(inc, axis=1)
+    with np.errstate(all='ignore'):
+        raan_rate = np.diff(raan, axis=1) / dt_days
+        drift = np.nan_to_num(np.nanmedian(np.where(baseline | recent, raan_rate, np.nan), axis=1))
+    raan_step = np.diff(raan, axis=1) - drift[:, None] * dt_days
+
+    scores = {}
+    for name, step, floor in [('SMA', sma_step, SMA_NOISE_KM), ('INC', inc_step, INC_NOISE_DEG), ('RAAN', raan_step, RAAN_NOISE_DEG)]:
+        z = np.where(recent, robust_z(step, baseline, floor), 0.0)
+        pick = np.argmax(z, axis=1)
+        scores[name] = (z[np.arange(len(z)), pick], step[np.arange(len(z)), pick])
+
+    # decay, least squares SMA rate over the recent window's element sets
+    in_recent = (epochs >= now_jd - recent_days) & (epochs <= now_jd)
+    t = np.where(in_recent, epochs - now_jd, np.nan)
+    y = np.where(in_recent, sma, np.nan)
+    with np.errstate(all='ignore'):
+        t_mean, y_mean = np.nanmean(t, axis=1), np.nanmean(y, axis=1)
+        sma_rate = np.nansum((t - t_mean[:, None]) * (y - y_mean[:, None]), axis=1) / \
+                   np.nansum((t - t_mean[:, None]) ** 2, axis=1)
+
+    maneuver_z = np.max([scores[name][0] for name in scores], axis=0)
+    recent_steps = recent.sum(axis=1)
+    down_fraction = (recent & (sma_step < 0)).sum(axis=1) / np.maximum(recent_steps, 1)
+    decaying = (np.nan_to_num(sma_rate) < -DECAY_RATE_KM_DAY) & (recent_steps >= DECAY_MIN_STEPS) & \
+               (down_fraction >= DECAY_DOWN_FRACTION)
+    flag = np.select([decaying, maneuver_z >= z_threshold], [FLAG_DECAY, FLAG_MANEUVER], default='')
+    has_recent = recent_steps > 0
+    counts = np.diff(history.offsets)
+    last = history.offsets[1:] - 1
+
+    df = pd.DataFrame({
+        'NORAD ID': history.norad_ids,
+        'ASSET': [history.info.get(int(norad_id), (str(norad_id), ''))[0] for norad_id in history.norad_ids],
+        'FLAG': flag,
+        # decay is ranked by how many noise floors a day the SMA loses
+        'SCORE': np.fmax(maneuver_z, np.where(decaying, -np.nan_to_num(sma_rate) / SMA_NOISE_KM, 0.0)),
+        'SETS': counts,
+        'LAST_EPOCH': pd.to_datetime((history.epochs[last] - UNIX_EPOCH_JD) * DAY_S, unit='s', utc=True).round('s'),
+        'SMA (km)': sma[np.arange(len(counts)), counts - 1],
+        'SMA_STEP (km)': scores['SMA'][1],
+        'INC_STEP (deg)': scores['INC'][1],
+        'RAAN_STEP (deg)': scores['RAAN'][1],
+        'SMA_RATE (km/day)': sma_rate,
+        'TRENDS': [TRENDS_URL.format(norad_id) for norad_id in history.norad_ids],
+    })[has_recent]
+    if DEBUG:
+        print(f"Screened {len(df)} satellites, {(df['FLAG'] != '').sum()} flagged.")
+    return df.sort_values(by='SCORE', ascending=False, ignore_index=True)
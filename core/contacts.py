@@ -0,0 +1,152 @@
+'''
+Ground station contact planning: picks which passes to track so every antenna follows one satellite at a time (with a
+setup / slew gap between contacts) and every satellite talks to one antenna at a time, maximising total weighted
+contact time with a greedy pass followed by local swaps.
+'''
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+
+DEBUG = False
+
+SETUP_SECONDS = 120.0 # slew / setup time an antenna needs between two contacts
+IMPROVE_ROUNDS = 3 # local improvement sweeps over unscheduled passes
+
+class _Resource(object):
+    '''
+    Non overlapping intervals booked on one antenna or satellite, kept sorted by start
+    '''
+    def __init__(self, gap=0.0):
+        self.gap = gap
+        self.starts, self.stops, self.ids = [], [], []
+
+    def conflicts(self, start, stop):
+        '''
+        @return ids of booked intervals closer than gap to [start, stop]
+        '''
+        idx = bisect_left(self.starts, start)
+        found = []
+        # booked intervals never overlap, so their stops are sorted too and the scan stops at the first free one
+        before = idx - 1
+        while before >= 0 and self.stops[before] + self.gap > start:
+            found.append(self.ids[before])
+            before -= 1
+        after = idx
+        while after < len(self.starts) and self.starts[after] < stop + self.gap:
+            found.append(self.ids[after])
+            after += 1
+        return found
+
+    def add(self, start, stop, pass_id):
+        idx = bisect_left(self.starts, start)
+        self.starts.insert(idx, start)
+        self.stops.insert(idx, stop)
+        self.ids.insert(idx, pass_id)
+
+    def remove(self, start, pass_id):
+        idx = bisect_left(self.starts, start)
+        while self.ids[idx] != pass_id:
+            idx += 1
+        del self.starts[idx], self.stops[idx], self.ids[idx]
+
+def schedule_contacts(passes, antennas=None, setup_seconds=SETUP_SECONDS, priorities=None, min_duration=0.0,
+                      improve_rounds=IMPROVE_ROUNDS):
+    '''
+    @brief Contact plan over a pass table of many satellites and ground stations
+
+    @param passes           pandas df with LOCATION, ASSET, RISE, SET (datetime) columns, e.g. a transit schedule
+    @param antennas         dict of location -> number of antennas (default 1 per location)
+    @param setup_seconds    minimum gap between two contacts on the same antenna
+    @param priorities       dict of asset -> weight (default 1), a contact is worth weight x duration (sec)
+    @param min_duration     passes shorter than this (sec) are never scheduled
+    @return copy of passes sorted by RISE with SCHEDULED, ANTENNA and WEIGHT columns
+    '''
+    antennas = antennas or {}
+    priorities = priorities or {}
+    df = passes.sort_values(by='RISE', ignore_index=True)
+    t_ref = df['RISE'].min()
+    start = (df['RISE'] - t_ref).dt.total_seconds().to_numpy()
+    stop = (df['SET'] - t_ref).dt.total_seconds().to_numpy()
+    weight = (stop - start) * df['ASSET'].map(lambda asset: priorities.get(asset, 1.0)).to_numpy(dtype=float)
+    locations, assets = df['LOCATION'].to_numpy(), df['ASSET'].to_numpy()
+
+    station_antennas = {loc: [(f"{loc} #{k + 1}", _Resource(setup_seconds)) for k in range(antennas.get(loc, 1))]
+                        for loc in pd.unique(locations)}
+    satellite_busy = {asset: _Resource() for asset in pd.unique(assets)}
+    assigned = {} # pass id -> (antenna label, antenna resource)
+
+    def blockers(pass_id, antenna):
+        return set(antenna.conflicts(start[pass_id], stop[pass_id])) | \
+               set(satellite_busy[assets[pass_id]].conflicts(start[pass_id], stop[pass_id]))
+
+    def book(pass_id, label, antenna):
+        antenna.add(start[pass_id], stop[pass_id], pass_id)
+        satellite_busy[assets[pass_id]].add(start[pass_id], stop[pass_id], pass_id)
+        assigned[pass_id] = (label, antenna)
+
+    def release(pass_id):
+        _, antenna = assigned.pop(pass_id)
+        antenna.remove(start[pass_id], pass_id)
+        satellite_busy[assets[pass_id]].remove(start[pass_id], pass_id)
+
+    def try_book(pass_id):
+        for label, antenna in station_antennas[locations[pass_id]]:
+            if not blockers(pass_id, antenna):
+                book(pass_id, label, antenna)
+                return True
+        return False
+
+    eligible = (stop - start) >= min_duration
+    candidates = np.flatnonzero(eligible)
+    # greedy, most valuable passes first
+    by_weight = candidates[np.argsort(-weight[candidates], kind='stable')]
+    for pass_id in by_weight:
+        try_book(pass_id)
+
+    # local improvement: drop one contact when the unscheduled passes it blocks are worth more together
+    longest = (stop - start).max() if len(start) else 0.0
+    for sweep in range(improve_rounds):
+        improved = False
+        for pass_id in by_weight[::-1]:
+            if pass_id not in assigned:
+                continue
+            # start is sorted, only passes within one pass length + setup gap can be blocked by this one
+            lo = np.searchsorted(start, start[pass_id] - setup_seconds - longest)
+            hi = np.searchsorted(start, stop[pass_id] + setup_seconds)
+            nearby = [idx for idx in range(lo, hi) if eligible[idx] and idx not in assigned
+                      and (locations[idx] == locations[pass_id] or assets[idx] == assets[pass_id])]
+            if weight[nearby].sum() <= weight[pass_id]:
+                continue
+            label, antenna = assigned[pass_id]
+            release(pass_id)
+            booked = [idx for idx in sorted(nearby, key=lambda idx: -weight[idx]) if try_book(idx)]
+            if weight[booked].sum() > weight[pass_id]:
+                improved = True
+                continue
+            for idx in booked:
+                release(idx)
+            book(pass_id, label, antenna)
+        if DEBUG:
+            print(f"Contact plan sweep {sweep + 1}: {len(assigned)} contacts, weight {weight[list(assigned)].sum():.0f}")
+        if not improved:
+            break
+
+    df['SCHEDULED'] = False
+    df['ANTENNA'] = None
+    df['WEIGHT'] = weight
+    if assigned:
+        ids = np.fromiter(assigned, dtype=int)
+        df.loc[ids, 'SCHEDULED'] = True
+        df.loc[ids, 'ANTENNA'] = [assigned[idx][0] for idx in ids]
+    return df
+
+def contact_plan_summary(plan):
+    '''
+    @return pandas df per LOCATION with number of passes, scheduled contacts and contact time (min)
+    '''
+    duration = (plan['SET'] - plan['RISE']).dt.total_seconds() / 60
+    return pd.DataFrame({
+        'PASSES': plan.groupby('LOCATION').size(),
+        'CONTACTS': plan.groupby('LOCATION')['SCHEDULED'].sum(),
+        'CONTACT TIME (min)': duration[plan['SCHEDULED']].groupby(plan['LOCATION'][plan['SCHEDULED']]).sum(),
+    }).fillna(0.0)
@@ -0,0 +1,224 @@
+'''
+Coverage of ground sites by whole constellations: elevation of every satellite over every site on a shared time
+grid from one batched propagation, and revisit / gap statistics from merged pass intervals.
+'''
+import numpy as np
+import pandas as pd
+from core.propagation import utc_datetime_index
+from core.timegrid import TimeGrid, site_itrs, enu_matrix
+
+DEBUG = False
+
+COVERAGE_STEP = 30 # seconds between grid samples, passes shorter than this can be missed
+SAT_CHUNK = 256 # satellites propagated at once, bounds memory to ~SAT_CHUNK x grid size
+GAP_PERCENTILES = [50, 90, 95]
+OCCUPANCY_BINS = 240 # time bins of the aggregated timeline
+TOP_ASSETS = 5 # assets shown on their own in the aggregated timeline, the rest are summed as OTHER
+PASS_MATRIX_COLUMNS = ['CONSTELLATION', 'LOCATION', 'SATELLITES', 'PASSES', 'VISIBLE (min)', 'COVERAGE (%)', 'MAX_GAP (min)']
+
+def site_elevations(grid, satrecs, sites, chunk_size=SAT_CHUNK, history=None):
+    '''
+    @brief Elevation of satellites over sites, every chunk of satellites is propagated once and shared by all sites
+
+    @param grid         TimeGrid
+    @param satrecs      list of skyfield EarthSatellite objects
+    @param sites        dict of site name -> (latitude, longitude[, elevation (m)])
+    @param history      optional TLEHistory, satellites are then propagated by NORAD ID with the element set nearest
+                        to every sample (TLEHistory.propagate) instead of their own
+    @return generator of (satellite slice, dict of site name -> elevation (n_chunk, N) deg), -90 where sgp4 failed
+    '''
+    # site geometry does not depend on time, build it once
+    geometry = {name: (site_itrs(*site[:2], *site[2:3]), enu_matrix(*site[:2])[2]) for name, site in sites.items()}
+    for idx in range(0, len(satrecs), chunk_size):
+        chunk = slice(idx, min(idx + chunk_size, len(satrecs)))
+        if history is None:
+            errors, r_teme, _ = grid.sgp4([sat.model for sat in satrecs[chunk]])
+        else:
+            errors, r_teme, _ = history.propagate(grid, [sat.model.satnum for sat in satrecs[chunk]])
+        r_itrs = grid.rotate(grid.teme_to_itrs, r_teme)
+        failed = errors != 0
+        elevations = {}
+        for name, (position, up) in geometry.items():
+            rel = r_itrs - position
+            sin_el = (rel @ up) / np.linalg.norm(rel, axis=-1)
+            el = np.degrees(np.arcsin(np.clip(sin_el, -1.0, 1.0)))
+            el[failed] = -90.0
+            elevations[name] = el
+        yield chunk, elevations
+
+def true_runs(mask):
+    '''
+    @return start indices and lengths of runs of True in a 1D bool array
+    '''
+    padded = np.concatenate(([False], np.asarray(mask, dtype=bool), [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, stops = edges[::2], edges[1::2]
+    return starts, stops - starts
+
+def site_coverage(grid, satrecs, sites, min_elevation, chunk_size=SAT_CHUNK, history=None):
+    '''
+    @brief Reduces site elevations to per site pass counts, visible samples and the satellites in view per instant,
+           see site_elevations
+
+    @return dict of site name -> {'passes': int, 'visible_samples': int, 'in_view': (N,) int count series}
+    '''
+    stats = {name: {'passes': 0, 'visible_samples': 0, 'in_view': np.zeros(len(grid), dtype=np.int32)} for name in sites}
+    for _, elevations in site_elevations(grid, satrecs, sites, chunk_size, history):
+        for name, el in elevations.items():
+            visible = el >= min_elevation
+            # a pass starts on every rise, or at the first sample if the satellite is already up
+            rises = visible[:, 1:] & ~visible[:, :-1]
+            stats[name]['passes'] += int(rises.sum() + visible[:, 0].sum())
+            stats[name]['visible_samples'] += int(visible.sum())
+            stats[name]['in_view'] += visible.sum(axis=0, dtype=np.int32)
+    return stats
+
+def pass_matrix(constellations, sites, start, stop, min_elevation, step_seconds=COVERAGE_STEP, chunk_size=SAT_CHUNK,
+                histories=None):
+    '''
+    @brief Pass counts, visible time and longest coverage gap for every constellation x site pair
+
+    One TimeGrid (and its Earth orientation matrices) is shared by all constellations.
+
+    @param constellations   dict of constellation name -> list of skyfield EarthSatellite objects
+    @param sites            dict of site name -> (latitude, longitude[, elevation (m)])
+    @param start, stop      timezone aware datetimes
+    @param histories        optional dict of constellation name -> TLEHistory, those constellations are propagated
+                            with the element set nearest to every sample, see site_elevations
+    @return pandas df with PASS_MATRIX_COLUMNS, one row per constellation x site
+    '''
+    histories = histories or {}
+    grid = TimeGrid.from_datetimes(start, stop, step_seconds)
+    step_min = step_seconds / 60
+    rows = []
+    for constellation, satellites in constellations.items():
+        stats = site_coverage(grid, satellites, sites, min_elevation, chunk_size, histories.get(constellation))
+        for name, site_stats in stats.items():
+            covered = site_stats['in_view'] > 0
+            _, gaps = true_runs(~covered)
+            rows.append({
+                'CONSTELLATION': constellation,
+                'LOCATION': name,
+                'SATELLITES': len(satellites),
+                'PASSES': site_stats['passes'],
+                'VISIBLE (min)': site_stats['visible_samples'] * step_min,
+                'COVERAGE (%)': 100.0 * covered.mean() if len(covered) else 0.0,
+                'MAX_GAP (min)': gaps.max() * step_min if len(gaps) else 0.0,
+            })
+        if DEBUG:
+            print(f"Pass matrix: {constellation} done over {len(sites)} sites and {len(grid)} samples.")
+    return pd.DataFrame(rows, columns=PASS_MATRIX_COLUMNS)
+
+def in_view_series(satellites, site, start, stop, min_elevation, step_seconds=COVERAGE_STEP, chunk_size=SAT_CHUNK):
+    '''
+    @brief Number of satellites above min_elevation over one site at every step of a regular grid, satellites are
+           propagated chunk_size at a time so memory does not grow with the constellation size
+
+    @param site             (latitude, longitude[, elevation (m)])
+    @param start, stop      timezone aware datetimes
+    @return pandas df with TIME (UTC, or start's timezone) and IN_VIEW columns, and dict with MIN / MEAN / MAX
+    '''
+    grid = TimeGrid.from_datetimes(start, stop, step_seconds)
+    counts = site_coverage(grid, satellites, {'SITE': site}, min_elevation, chunk_size)['SITE']['in_view']
+    df = pd.DataFrame({'TIME': utc_datetime_index(grid.times, start.tzinfo), 'IN_VIEW': counts})
+    stats = {'MIN': int(counts.min()), 'MEAN': float(counts.mean()), 'MAX': int(counts.max())} if len(counts) else {}
+    return df, stats
+
+def merge_intervals(starts, stops):
+    '''
+    @return start and stop arrays of the union of [start, stop] intervals, sorted and non overlapping
+    '''
+    starts, stops = np.asarray(starts, dtype=float), np.asarray(stops, dtype=float)
+    if len(starts) == 0:
+        return starts, stops
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], stops[order]
+    reach = np.maximum.accumulate(stops)
+    # a new coverage interval begins wherever a pass starts after everything before it has set
+    new = np.concatenate(([True], starts[1:] > reach[:-1]))
+    return starts[new], np.maximum.reduceat(stops, np.flatnonzero(new))
+
+def coverage_timeline(starts, stops, window_start, window_stop):
+    '''
+    @brief Merges pass intervals (seconds) of all members into a coverage timeline over a window
+
+    @return coverage starts, coverage stops and gap lengths (seconds), gaps include the window edges
+    '''
+    starts = np.clip(np.asarray(starts, dtype=float), window_start, window_stop)
+    stops = np.clip(np.asarray(stops, dtype=float), window_start, window_stop)
+    cov_starts, cov_stops = merge_intervals(starts, stops)
+    edges = np.concatenate(([window_start], np.column_stack([cov_starts, cov_stops]).ravel(), [window_stop]))
+    gaps = edges[1::2] - edges[0::2]
+    return cov_starts, cov_stops, gaps[gaps > 0]
+
+def coverage_statistics(starts, stops, window_start, window_stop, percentiles=GAP_PERCENTILES):
+    '''
+    @brief Coverage fraction, revisit intervals (time between coverage starts) and gap percentiles
+
+    @param starts, stops    pass rise / set times in seconds, any common reference
+    @return dict of statistic -> value, times in minutes
+    '''
+    cov_starts, cov_stops, gaps = coverage_timeline(starts, stops, window_start, window_stop)
+    revisits = np.diff(cov_starts)
+    duration = window_stop - window_start
+    stats = {
+        'PASSES': len(starts),
+        'COVERAGE (%)': 100.0 * np.sum(cov_stops - cov_starts) / duration if duration > 0 else 0.0,
+        'MEAN_REVISIT (min)': revisits.mean() / 60 if len(revisits) else np.nan,
+        'MAX_REVISIT (min)': revisits.max() / 60 if len(revisits) else np.nan,
+        'MEAN_GAP (min)': gaps.mean() / 60 if len(gaps) else 0.0,
+    }
+    gap_percentiles = np.percentile(gaps, percentiles) / 60 if len(gaps) else np.zeros(len(percentiles))
+    stats.update({f'P{q:g}_GAP (min)': value for q, value in zip(percentiles, gap_percentiles)})
+    stats['MAX_GAP (min)'] = gaps.max() / 60 if len(gaps) else 0.0
+    return stats
+
+def schedule_coverage(schedule, window_start, window_stop, percentiles=GAP_PERCENTILES, locations=None):
+    '''
+    @brief Coverage statistics per LOCATION of a schedule with datetime RISE / SET columns
+
+    @param locations    locations to report (default: those in the schedule), one without passes is one long gap
+    @return pandas df indexed by LOCATION, see coverage_statistics
+    '''
+    duration = (window_stop - window_start).total_seconds()
+    if locations is None:
+        locations = pd.unique(schedule['LOCATION'])
+    rows = {}
+    for location in locations:
+        passes = schedule[schedule['LOCATION'] == location]
+        starts = (passes['RISE'] - window_start).dt.total_seconds().to_numpy()
+        stops = (passes['SET'] - window_start).dt.total_seconds().to_numpy()
+        rows[location] = coverage_statistics(starts, stops, 0.0, duration, percentiles)
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('LOCATION')
+
+def occupancy_counts(starts, stops, edges):
+    '''
+    @return number of [start, stop] intervals overlapping each bin [edges[i], edges[i + 1])
+    '''
+    starts, stops = np.sort(np.asarray(starts, dtype=float)), np.sort(np.asarray(stops, dtype=float))
+    edges = np.asarray(edges, dtype=float)
+    # started before the bin ends minus already set before the bin starts
+    return np.searchsorted(starts, edges[1:], side='left') - np.searchsorted(stops, edges[:-1], side='left')
+
+def schedule_occupancy(schedule, window_start, window_stop, bins=OCCUPANCY_BINS, top_n=TOP_ASSETS):
+    '''
+    @brief Satellites in view per time bin for a schedule with datetime RISE / SET columns, split into the top_n
+           assets by total pass time and OTHER
+
+    @return long pandas df with TIME (bin start), ASSET and IN_VIEW columns
+    '''
+    duration = (window_stop - window_start).total_seconds()
+    edges = np.linspace(0.0, duration, bins + 1)
+    starts = (schedule['RISE'] - window_start).dt.total_seconds().to_numpy()
+    stops = (schedule['SET'] - window_start).dt.total_seconds().to_numpy()
+    pass_time = pd.Series(stops - starts, index=schedule['ASSET'].to_numpy()).groupby(level=0).sum()
+    top = pass_time.nlargest(top_n).index
+    is_top = schedule['ASSET'].isin(top).to_numpy()
+    times = pd.Timestamp(window_start) + pd.to_timedelta(edges[:-1], unit='s')
+    frames = []
+    for asset in list(top) + ['OTHER']:
+        rows = (schedule['ASSET'] == asset).to_numpy() if asset != 'OTHER' else ~is_top
+        if asset == 'OTHER' and not rows.any():
+            continue
+        frames.append(pd.DataFrame({'TIME': times, 'ASSET': asset, 'IN_VIEW': occupancy_counts(starts[rows], stops[rows], edges)}))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,57 @@
+'''
+Sunlight / eclipse status of satellites and twilight at observers, against a planetary ephemeris loaded once per process.
+'''
+from functools import lru_cache
+import numpy as np
+from skyfield.api import load
+
+EPHEMERIS_FILE = 'de421.bsp'
+EARTH_RADIUS_KM = 6378.137
+
+# observer sky by sun elevation (deg): above SUNRISE is day, then civil / nautical / astronomical twilight, then night
+SKY_CLASSES = ['DAY', 'CIVIL', 'NAUTICAL', 'ASTRONOMICAL', 'NIGHT']
+SKY_LIMITS = [-0.8333, -6.0, -12.0, -18.0]
+DARK_SKIES = ['NAUTICAL', 'ASTRONOMICAL', 'NIGHT'] # dark enough to see a sunlit satellite with the naked eye
+
+@lru_cache(maxsize=None)
+def get_ephemeris():
+    '''
+    @return JPL ephemeris, loaded on first use and shared by every caller afterwards
+    '''
+    return load(EPHEMERIS_FILE)
+
+def sunlit_mask(geocentric):
+    '''
+    @return bool array, True where the satellite is in sunlight, for all positions in one vectorized call
+    '''
+    return np.atleast_1d(geocentric.is_sunlit(get_ephemeris()))
+
+def sun_positions(times):
+    '''
+    @return geocentric GCRS position of the Sun (N, 3) km for a skyfield Time array, in one vectorized call
+    '''
+    eph = get_ephemeris()
+    return np.atleast_2d((eph['sun'] - eph['earth']).at(times).position.km.T)
+
+def sunlit_from_vectors(r_gcrs, sun_gcrs):
+    '''
+    @return bool array, True where positions (..., 3) km are outside the Earth's (cylindrical) shadow
+    '''
+    sun_dir = sun_gcrs / np.linalg.norm(sun_gcrs, axis=-1, keepdims=True)
+    along = np.sum(r_gcrs * sun_dir, axis=-1)
+    off_axis = np.linalg.norm(r_gcrs - along[..., None] * sun_dir, axis=-1)
+    return (along > 0) | (off_axis > EARTH_RADIUS_KM)
+
+def sun_elevation_from_vectors(up_gcrs, sun_gcrs):
+    '''
+    @return elevation (deg) of the Sun above the local horizon for unit up vectors (..., 3) of observers
+    '''
+    sun_dir = sun_gcrs / np.linalg.norm(sun_gcrs, axis=-1, keepdims=True)
+    return np.degrees(np.arcsin(np.clip(np.sum(up_gcrs * sun_dir, axis=-1), -1.0, 1.0)))
+
+def sky_class(sun_elevation):
+    '''
+    @return array of SKY_CLASSES names for sun elevations (deg)
+    '''
+    # SKY_LIMITS are descending, digitize counts how many limits the sun is below
+    return np.array(SKY_CLASSES, dtype=object)[np.digitize(-np.asarray(sun_elevation), np.negative(SKY_LIMITS), right=True)]
@@ -0,0 +1,193 @@
+'''
+Binary element store: one fixed-width record per satellite (mean elements, epoch, NORAD ID, interned name) saved as
+.npy files and opened memory-mapped, so every page / worker process reads the same file through the page cache
+instead of downloading and parsing TLE text, and only builds the Satrec objects it actually propagates.
+
+Layout of a store, path is a symlink to the current version directory next to it:
+    elements.npy    STORE_DTYPE records sorted by NORAD ID
+    names.npy       unique satellite names, records refer to them by name_id
+'''
+import os
+import glob
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+import numpy as np
+from skyfield.api import EarthSatellite
+from core.propagation import get_timescale
+from core.tle_history import HISTORY_DTYPE, element_records, satrec_from_record
+
+DEBUG = False
+
+ELEMENT_STORE_DIR = os.environ.get('ELEMENT_STORE_DIR', '.element_store')
+STORE_MAX_AGE = 6 * 3600 # seconds before a cached store is fetched again, same as the Streamlit resource caches
+
+STORE_DTYPE = np.dtype(HISTORY_DTYPE.descr + [('name_id', np.uint32), ('intldesg', 'S8')])
+ELEMENTS_FILE = 'elements.npy'
+NAMES_FILE = 'names.npy'
+VERSION_SUFFIX = '.version' # version directories are <path>.<random><VERSION_SUFFIX>
+VERSION_GRACE = 60 # seconds a replaced version is kept for readers that resolved the path just before the switch
+
+# one lock per store path, so only one session / job thread refetches a stale store
+_STORE_LOCKS = defaultdict(threading.RLock)
+_STORE_LOCKS_LOCK = threading.Lock()
+
+class ElementStore(object):
+    '''
+    Read-only view over a memory-mapped (or in-memory) array of element records
+    '''
+    def __init__(self, records, names, path=None):
+        self.records = records # STORE_DTYPE array, np.memmap when opened from disk
+        self.names = names # unique names, indexed by records['name_id']
+        self.path = path
+
+    @classmethod
+    def from_records(cls, elements, names, intldesg):
+        '''
+        @param elements     HISTORY_DTYPE array
+        @param names        satellite name of every record, interned into the names table
+        @param intldesg     international designator (TLE style, e.g. 98067A) of every record
+        @return in-memory store sorted by NORAD ID
+        '''
+        names, name_id = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        records = np.zeros(len(elements), dtype=STORE_DTYPE)
+        for field in HISTORY_DTYPE.names:
+            records[field] = elements[field]
+        records['name_id'] = name_id
+        records['intldesg'] = np.char.encode(np.asarray(intldesg, dtype=str), 'ascii', errors='replace')
+        order = np.argsort(records['norad'], kind='stable')
+        return cls(records[order], names)
+
+    @classmethod
+    def from_satellites(cls, satellites):
+        '''
+        @return in-memory store of EarthSatellite objects, sorted by NORAD ID
+        '''
+        satellites = list(satellites)
+        elements, _ = element_records(satellites)
+        return cls.from_records(elements, [sat.name or '' for sat in satellites], [sat.model.intldesg for sat in satellites])
+
+    @classmethod
+    def open(cls, path):
+        '''
+        @return store over the files in path, the records are memory-mapped (nothing is read until used)
+        '''
+        # resolve the path symlink once, so both files come from the same version even while it is switched
+        version = os.path.realpath(path)
+        records = np.load(os.path.join(version, ELEMENTS_FILE), mmap_mode='r')
+        names = np.load(os.path.join(version, NAMES_FILE))
+        return cls(records, names, path)
+
+    def save(self, path):
+        '''
+        @brief Writes both files into a new version directory and switches the path symlink to it with one rename,
+               readers open either the old or the new pair of files, never a mix, and keep their old mapping
+
+        Replaced versions are removed VERSION_GRACE seconds after they were replaced.
+        '''
+        path = os.path.normpath(path)
+        parent, base = os.path.split(path)
+        os.makedirs(parent or '.', exist_ok=True)
+        # savers of one path take turns, so none removes a version another one is still writing
+        with _store_lock(path):
+            version = tempfile.mkdtemp(prefix=f"{base}.", suffix=VERSION_SUFFIX, dir=parent or '.')
+            for file_name, array in [(NAMES_FILE, np.asarray(self.names)), (ELEMENTS_FILE, np.asarray(self.records))]:
+                with open(os.path.join(version, file_name), 'wb') as f:
+                    np.save(f, array)
+            previous = os.path.realpath(path) if os.path.islink(path) else None
+            if os.path.isdir(path) and not os.path.islink(path):
+                # plain store directory written before versioning (or an empty directory), os.replace cannot replace it
+                for file_name in [ELEMENTS_FILE, NAMES_FILE]:
+                    if os.path.exists(os.path.join(path, file_name)):
+                        os.remove(os.path.join(path, file_name))
+                os.rmdir(path)
+            link = f"{version}.link"
+            os.symlink(os.path.basename(version), link) # relative, the store directory can be moved as a whole
+            os.replace(link, path)
+            if previous is not None:
+                os.utime(previous) # the directory's mtime is when it was replaced
+            for old in glob.glob(f"{glob.escape(path)}.*{VERSION_SUFFIX}"):
+                if os.path.realpath(old) != os.path.realpath(version) and time.time() - os.path.getmtime(old) > VERSION_GRACE:
+                    shutil.rmtree(old, ignore_errors=True)
+        return None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def norad_ids(self):
+        return self.records['norad']
+
+    def name(self, idx):
+        return str(self.names[self.records['name_id'][idx]])
+
+    def labels(self, format="{norad:<6} | {name}"):
+        '''
+        @return display label of every record, built from the arrays without creating satellites
+        '''
+        names = self.names[self.records['name_id']]
+        return [format.format(norad=int(norad), name=name) for norad, name in zip(self.records['norad'], names)]
+
+    def index_of(self, norad_id):
+        '''
+        @return record index of a NORAD ID, or -1 if it is not in the store
+        '''
+        idx = int(np.searchsorted(self.records['norad'], norad_id))
+        return idx if idx < len(self.records) and self.records['norad'][idx] == norad_id else -1
+
+    def satellite(self, idx):
+        '''
+        @return skyfield EarthSatellite of one record
+        '''
+        record = self.records[idx]
+        satrec = satrec_from_record(record, record['intldesg'].decode('ascii'))
+        satellite = EarthSatellite.from_satrec(satrec, get_timescale())
+        satellite.name = str(self.names[record['name_id']])
+        return satellite
+
+    def satellites(self, idx=None):
+        '''
+        @return list of EarthSatellite objects for record indices idx (slice, index array or None for all)
+        '''
+        indices = np.arange(len(self.records))[idx if idx is not None else slice(None)]
+        return [self.satellite(i) for i in indices]
+
+@lru_cache(maxsize=32)
+def _open_cached(version_path):
+    return ElementStore.open(version_path)
+
+def open_element_store(path):
+    '''
+    @return ElementStore at path, opened once per process and reopened only when the store was saved again
+    '''
+    # every save is a new version directory, so its resolved path identifies the contents
+    return _open_cached(os.path.realpath(path))
+
+def _store_lock(path):
+    with _STORE_LOCKS_LOCK:
+        return _STORE_LOCKS[os.path.abspath(path)]
+
+def cached_element_store(key, fetch, max_age=STORE_MAX_AGE, store_dir=None):
+    '''
+    @brief Opens the store saved under key, fetching and saving it first when it is missing or older than max_age
+
+    @param key      file system safe name, e.g. a constellation or Celestrak group
+    @param fetch    callable returning an ElementStore or an iterable of EarthSatellite objects
+    @return ElementStore
+    '''
+    path = os.path.join(store_dir or ELEMENT_STORE_DIR, key)
+    elements_path = os.path.join(path, ELEMENTS_FILE)
+    # callers waiting on the lock find the store fresh once the first one has saved it
+    with _store_lock(path):
+        if not os.path.exists(elements_path) or time.time() - os.path.getmtime(elements_path) > max_age:
+            fetched = fetch()
+            store = fetched if isinstance(fetched, ElementStore) else ElementStore.from_satellites(fetched)
+            if len(store) == 0:
+                raise ValueError(f"No satellites fetched for {key}, element store not written.")
+            store.save(path)
+            if DEBUG:
+                print(f"Saved {len(store)} element sets to {path}.")
+        return open_element_store(path)
@@ -0,0 +1,89 @@
+'''
+3LE parsing and vectorized QA checks of element sets, Spacetrack queries live in core.spacetrack.
+'''
+import numpy as np
+import pandas as pd
+from skyfield.api import EarthSatellite
+import constellation_configs as cc
+from core.propagation import get_timescale
+
+STALE_EPOCH = 5 # days
+MIN_ALTITUDE = 150 # km
+
+# QA reasons reported in the Logs tab
+QA_PASSED = 'passed QA checks'
+QA_STALE = 'stale TLE'
+QA_PROP_ERROR = 'propagation error'
+QA_LOW_ALTITUDE = 'unrealistic altitude'
+
+def iter_3le(lines):
+    '''
+    Generator that yields (name, line 1, line 2) from an iterable of 3LE (or 2LE) lines as they arrive,
+    so a large file or upload never has to be held in memory as one string / list of lines
+    '''
+    name = None
+    line_1 = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.rstrip()
+        if not line:
+            continue
+        if line.startswith('1 ') and len(line) >= 69:
+            line_1 = line
+        elif line.startswith('2 ') and len(line) >= 69 and line_1 is not None:
+            yield name, line_1, line
+            name, line_1 = None, None
+        else:
+            # title line, Spacetrack prefixes names with "0 "
+            name = line[2:] if line.startswith('0 ') else line
+            line_1 = None
+
+def parse_3le(lines):
+    '''
+    Generator that yields EarthSatellite objects from an iterable of 3LE lines as they arrive
+    '''
+    ts = get_timescale()
+    for name, line_1, line_2 in iter_3le(lines):
+        yield EarthSatellite(line_1, line_2, name, ts)
+
+def qa_check_satellites(satellites, t_now=None):
+    '''
+    @brief Runs QA checks (stale epoch, propagation error, altitude floor) as array operations over all satellites
+
+    @return pandas df with one row per satellite and STATUS / REASON columns, in input order
+    '''
+    if t_now is None:
+        t_now = get_timescale().now()
+    count = len(satellites)
+    am = np.fromiter((sat.model.am for sat in satellites), dtype=float, count=count)
+    radius = np.fromiter((sat.model.radiusearthkm for sat in satellites), dtype=float, count=count)
+    error = np.fromiter((sat.model.error for sat in satellites), dtype=int, count=count)
+    epoch_tt = np.fromiter((sat.epoch.tt for sat in satellites), dtype=float, count=count)
+
+    alt = (am - 1) * radius
+    tle_age = np.abs(t_now.tt - epoch_tt)
+    is_stale = tle_age > STALE_EPOCH
+    has_error = error != 0
+    is_low = alt < MIN_ALTITUDE
+    # first failing check wins, same precedence as the checks are listed in
+    reason = np.select([is_stale, has_error, is_low], [QA_STALE, QA_PROP_ERROR, QA_LOW_ALTITUDE], default=QA_PASSED)
+
+    qa_df = pd.DataFrame({
+        'ASSET': [sat.name for sat in satellites],
+        'NORAD ID': [sat.model.satnum for sat in satellites],
+        'TLE AGE (days)': tle_age.round(2),
+        'ALTITUDE (km)': alt.round(0),
+        'ERROR': [cc.ERROR_CODES.get(str(code), str(code)) for code in error],
+        'STATUS': np.where(reason == QA_PASSED, '✅ Added', '❌ Dropped'),
+        'REASON': reason,
+    })
+    return qa_df
+
+def passed_qa(satellites, t_now=None):
+    '''
+    @return (satellites that passed QA checks, QA table)
+    '''
+    qa_df = qa_check_satellites(satellites, t_now)
+    passed = (qa_df['REASON'] == QA_PASSED).to_numpy()
+    return [sat for sat, ok in zip(satellites, passed) if ok], qa_df
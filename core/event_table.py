@@ -0,0 +1,256 @@
+'''
+Compact storage of transit events: one structured NumPy array for all passes of a constellation over many sites,
+with per pass ephemerides in a ragged flat buffer (offsets into one array) instead of Python objects per event.
+'''
+import numpy as np
+import pandas as pd
+from skyfield.api import wgs84
+from core.propagation import get_timescale, utc_datetime_index, NUM_TRACK
+from core.timegrid import TimeGrid, geodetic, topocentric, enu_matrix, doppler_shift
+from core.events import complete_passes, SCHEDULE_COLUMNS
+from core.eclipse import sun_positions, sunlit_from_vectors, sun_elevation_from_vectors, sky_class, DARK_SKIES
+
+DEBUG = False
+
+# times are TT julian dates, sunlit / sun_elevation are at culmination (nan until compute_visibility)
+EVENT_DTYPE = np.dtype([('sat', np.int32), ('site', np.int16),
+                        ('rise', np.float64), ('culminate', np.float64), ('set', np.float64),
+                        ('max_elevation', np.float32), ('rise_azimuth', np.float32), ('set_azimuth', np.float32),
+                        ('sunlit', np.bool_), ('sun_elevation', np.float32)])
+# GCRS position (km), sub-satellite point (deg) and look angles from the event's site (deg, km, km/s)
+EPHEM_DTYPE = np.dtype([('jd', np.float64), ('x', np.float32), ('y', np.float32), ('z', np.float32),
+                        ('lat', np.float32), ('lon', np.float32),
+                        ('azimuth', np.float32), ('elevation', np.float32), ('range', np.float32),
+                        ('range_rate', np.float32)])
+PROFILE_COLUMNS = ['PASS', 'LOCATION', 'ASSET', 'TIME', 'AZIMUTH', 'ELEVATION', 'RANGE (km)', 'RANGE_RATE (km/s)', 'DOPPLER (Hz)']
+
+class EventTable(object):
+    '''
+    All transit events of a set of satellites over a set of sites, queried with vector filters
+    '''
+    def __init__(self, satellites, sites):
+        '''
+        @param satellites   list of skyfield EarthSatellite objects, events refer to them by index
+        @param sites        dict of site name -> (latitude, longitude[, elevation (m)])
+        '''
+        self.satellites = list(satellites)
+        self.site_names = list(sites)
+        self.sites = [tuple(sites[name]) + (0.0,) * (3 - len(sites[name])) for name in self.site_names]
+        self.events = np.empty(0, dtype=EVENT_DTYPE)
+        self.ephem_offsets = np.zeros(1, dtype=np.int64) # ephemeris of event i is ephem[offsets[i]:offsets[i + 1]]
+        self.ephem = np.empty(0, dtype=EPHEM_DTYPE)
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def nbytes(self):
+        return self.events.nbytes + self.ephem_offsets.nbytes + self.ephem.nbytes
+
+    @property
+    def asset_names(self):
+        return np.array([sat.name for sat in self.satellites], dtype=object)
+
+    def clear(self):
+        self.events = np.empty(0, dtype=EVENT_DTYPE)
+        self.clear_ephemerides()
+
+    def clear_ephemerides(self):
+        self.ephem_offsets = np.zeros(len(self.events) + 1, dtype=np.int64)
+        self.ephem = np.empty(0, dtype=EPHEM_DTYPE)
+
+    def find_passes(self, t0, t1, min_elevation, progress=None):
+        '''
+        @brief Searches every satellite over every site and replaces the stored events with all complete passes
+
+        @param progress optional callback(satellites done, total) after every satellite, may raise to stop the search
+        @return number of satellites with at least one pass
+        '''
+        positions = [wgs84.latlon(lat, lon, elevation_m=elev) for lat, lon, elev in self.sites]
+        rows = []
+        for sat_idx, sat in enumerate(self.satellites):
+            for site_idx, position in enumerate(positions):
+                times, events = sat.find_events(position, t0, t1, altitude_degrees=min_elevation)
+                starts = complete_passes(events)
+                if len(starts) == 0:
+                    continue
+                block = np.zeros(len(starts), dtype=EVENT_DTYPE)
+                block['sat'], block['site'], block['sun_elevation'] = sat_idx, site_idx, np.nan
+                block['rise'], block['culminate'], block['set'] = times.tt[starts], times.tt[starts + 1], times.tt[starts + 2]
+                rows.append(block)
+            if progress is not None:
+                progress(sat_idx + 1, len(self.satellites))
+        self.events = np.concatenate(rows) if rows else np.empty(0, dtype=EVENT_DTYPE)
+        self.clear_ephemerides()
+        if len(self.events):
+            # look angles at rise / culmination / set for all passes in one batch
+            jd = np.column_stack([self.events['rise'], self.events['culminate'], self.events['set']])
+            samples = self._sample(jd)
+            self.events['rise_azimuth'] = samples['azimuth'][:, 0]
+            self.events['max_elevation'] = samples['elevation'][:, 1]
+            self.events['set_azimuth'] = samples['azimuth'][:, 2]
+        if DEBUG:
+            print(f"Found {len(self.events)} passes over {len(self.sites)} site(s), {self.nbytes} bytes.")
+        return len(np.unique(self.events['sat']))
+
+    def compute_ephemerides(self, num_points=NUM_TRACK):
+        '''
+        @brief Samples every pass evenly from rise to set, all passes share one TimeGrid
+
+        @return True if any event was populated
+        '''
+        if len(self.events) == 0 or num_points < 1:
+            return False
+        jd = self.events['rise'][:, None] + (self.events['set'] - self.events['rise'])[:, None] * np.linspace(0.0, 1.0, num_points)
+        self.ephem = self._sample(jd).ravel()
+        self.ephem_offsets = np.arange(len(self.events) + 1, dtype=np.int64) * num_points
+        return True
+
+    def compute_visibility(self):
+        '''
+        @brief Satellite sunlight and observer sky at the culmination of every pass, in one batch against the
+               ephemeris loaded once per process (core.eclipse)
+
+        @return True if any event was classified
+        '''
+        if len(self.events) == 0:
+            return False
+        grid = TimeGrid(get_timescale().tt_jd(self.events['culminate']))
+        samples = self._sample(self.events['culminate'][:, None], grid)[:, 0]
+        r_gcrs = np.column_stack([samples['x'], samples['y'], samples['z']]).astype(float)
+        sun_gcrs = sun_positions(grid.times)
+        # local up of each event's site, Earth fixed -> GCRS with the transposed rotation at each culmination
+        up_itrs = np.array([enu_matrix(lat, lon)[2] for lat, lon, _ in self.sites])[self.events['site']]
+        up_gcrs = grid.rotate(np.swapaxes(grid.gcrs_to_itrs, 0, 1), up_itrs)
+        self.events['sunlit'] = sunlit_from_vectors(r_gcrs, sun_gcrs)
+        self.events['sun_elevation'] = sun_elevation_from_vectors(up_gcrs, sun_gcrs)
+        return True
+
+    @property
+    def has_visibility(self):
+        return len(self.events) > 0 and not np.isnan(self.events['sun_elevation']).any()
+
+    def _sample(self, jd, grid=None):
+        '''
+        @return EPHEM_DTYPE array (n_events, k) for TT julian dates jd (n_events, k), propagating each satellite once
+        '''
+        num_events, k = jd.shape
+        if grid is None:
+            grid = TimeGrid(get_timescale().tt_jd(jd.ravel()))
+        out = np.zeros(num_events * k, dtype=EPHEM_DTYPE)
+        out['jd'] = jd.ravel()
+        offsets = np.arange(k)
+        order = np.argsort(self.events['sat'], kind='stable')
+        sat_ids, first = np.unique(self.events['sat'][order], return_index=True)
+        for sat_idx, event_idx in zip(sat_ids, np.split(order, first[1:])):
+            samples = (event_idx[:, None] * k + offsets).ravel()
+            _, r_teme, v_teme = grid.sgp4([self.satellites[sat_idx].model], samples)
+            r_gcrs = grid.rotate(grid.teme_to_gcrs, r_teme[0], samples)
+            r_itrs, v_itrs = grid.itrs_state(r_teme[0], v_teme[0], samples)
+            lat, lon, _ = geodetic(r_itrs)
+            out['x'][samples], out['y'][samples], out['z'][samples] = r_gcrs.T
+            out['lat'][samples], out['lon'][samples] = lat, lon
+            # look angles per site, a satellite's passes usually involve few sites
+            site_of_sample = np.repeat(self.events['site'][event_idx], k)
+            for site_idx in np.unique(site_of_sample):
+                here = site_of_sample == site_idx
+                el, az, rng, rng_rate = topocentric(r_itrs[here], *self.sites[site_idx], v_itrs=v_itrs[here])
+                out['elevation'][samples[here]], out['azimuth'][samples[here]], out['range'][samples[here]] = el, az, rng
+                out['range_rate'][samples[here]] = rng_rate
+        return out.reshape(num_events, k)
+
+    def ephemeris(self, event_idx):
+        '''
+        @return EPHEM_DTYPE array from rise to set of one event (empty if not computed)
+        '''
+        return self.ephem[self.ephem_offsets[event_idx]:self.ephem_offsets[event_idx + 1]]
+
+    def ephemeris_event_index(self):
+        '''
+        @return event index of every row of the flat ephemeris buffer
+        '''
+        return np.repeat(np.arange(len(self.events)), np.diff(self.ephem_offsets))
+
+    def doppler_profiles(self, frequency_hz, tz=None, mask=None):
+        '''
+        @brief Range rate and Doppler shift of a carrier over every sample of the (selected) pass ephemerides,
+               computed on the flat ephemeris buffer in one batch
+
+        @param frequency_hz     carrier frequency
+        @return long pandas df with PROFILE_COLUMNS, PASS is the event index (empty before compute_ephemerides)
+        '''
+        event_idx = self.ephemeris_event_index()
+        if mask is not None:
+            keep = mask[event_idx]
+            event_idx, ephem = event_idx[keep], self.ephem[keep]
+        else:
+            ephem = self.ephem
+        if len(ephem) == 0:
+            return pd.DataFrame(columns=PROFILE_COLUMNS)
+        events = self.events[event_idx]
+        return pd.DataFrame({
+            'PASS': event_idx,
+            'LOCATION': np.array(self.site_names, dtype=object)[events['site']],
+            'ASSET': self.asset_names[events['sat']],
+            'TIME': utc_datetime_index(get_timescale().tt_jd(ephem['jd']), tz),
+            'AZIMUTH': ephem['azimuth'].astype(float),
+            'ELEVATION': ephem['elevation'].astype(float),
+            'RANGE (km)': ephem['range'].astype(float),
+            'RANGE_RATE (km/s)': ephem['range_rate'].astype(float),
+            'DOPPLER (Hz)': doppler_shift(ephem['range_rate'], frequency_hz),
+        })
+
+    def query(self, asset=None, site=None, start=None, stop=None, min_elevation=None, visible=None):
+        '''
+        @brief Vector filter over all events, times are skyfield Time objects, asset / site are names
+
+        @return bool mask over self.events
+        '''
+        mask = np.ones(len(self.events), dtype=bool)
+        if asset is not None:
+            mask &= np.isin(self.events['sat'], np.flatnonzero(self.asset_names == asset))
+        if site is not None:
+            mask &= self.events['site'] == self.site_names.index(site)
+        if start is not None:
+            mask &= self.events['set'] >= start.tt
+        if stop is not None:
+            mask &= self.events['rise'] <= stop.tt
+        if min_elevation is not None:
+            mask &= self.events['max_elevation'] >= min_elevation
+        if visible is not None:
+            mask &= self.visible_mask() == visible
+        return mask
+
+    def visible_mask(self):
+        '''
+        @return bool mask of passes visible to the naked eye: satellite sunlit while the observer's sky is dark
+        '''
+        return self.events['sunlit'] & np.isin(sky_class(self.events['sun_elevation']), DARK_SKIES)
+
+    def to_schedule(self, tz=None, mask=None):
+        '''
+        @return pandas df with SCHEDULE_COLUMNS and MAX_ELEVATION, one row per (selected) event, plus
+                SATELLITE_LIGHT / OBSERVER_SKY / VISIBILITY once compute_visibility has run
+        '''
+        events = self.events if mask is None else self.events[mask]
+        if len(events) == 0:
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS + ['MAX_ELEVATION'])
+        ts = get_timescale()
+        launch_years = np.array([f"'{sat.model.intldesg[0:2]}" for sat in self.satellites], dtype=object)
+        df = pd.DataFrame({
+            'LOCATION': np.array(self.site_names, dtype=object)[events['site']],
+            'RISE': utc_datetime_index(ts.tt_jd(events['rise']), tz),
+            'CULMINATE': utc_datetime_index(ts.tt_jd(events['culminate']), tz),
+            'SET': utc_datetime_index(ts.tt_jd(events['set']), tz),
+            'ASSET': self.asset_names[events['sat']],
+            'RISE_AZIMUTH': events['rise_azimuth'].astype(float),
+            'SET_AZIMUTH': events['set_azimuth'].astype(float),
+            'LAUNCH_YEAR': launch_years[events['sat']],
+            'MAX_ELEVATION': events['max_elevation'].astype(float),
+        })
+        if self.has_visibility:
+            sky = sky_class(events['sun_elevation'])
+            df['SATELLITE_LIGHT'] = np.where(events['sunlit'], 'SUNLIT', 'ECLIPSED')
+            df['OBSERVER_SKY'] = sky
+            df['VISIBILITY'] = np.where(events['sunlit'] & np.isin(sky, DARK_SKIES), 'VISIBLE', 'NOT VISIBLE')
+        return df
@@ -0,0 +1,260 @@
+'''
+Transit events of satellites over ground locations.
+'''
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from skyfield.api import EarthSatellite
+from core.propagation import get_timescale, utc_datetime_index, utc_julian_date, UNIX_EPOCH_JD, NUM_TRACK, DT_FORMAT
+from core.timegrid import TimeGrid, geodetic, topocentric
+
+DEBUG = False
+
+SCHEDULE_COLUMNS = ['LOCATION', 'RISE', 'CULMINATE', 'SET', 'ASSET', 'RISE_AZIMUTH', 'SET_AZIMUTH', 'LAUNCH_YEAR']
+SCHEDULE_TIME_COLUMNS = ['RISE', 'CULMINATE', 'SET']
+CHUNK_LENGTH = timedelta(days=1) # long windows are searched one chunk at a time
+CHUNK_OVERLAP = timedelta(hours=1) # extra search past a chunk so passes rising in it can set, grown when needed
+
+class TransitEvent():
+    '''
+    Object that contains info about a transit event
+    '''
+    def __init__(self, rise_time, culminate_time, set_time, sat_name, satrecObj, goeposition, loc_name):
+        self.rise = rise_time # ts objects
+        self.culminate = culminate_time # ts objects
+        self.set = set_time # ts objects
+        self.asset = sat_name
+        self.loc = goeposition # wgs84 GEOID object
+        self.loc_name = loc_name # string from UserLocation.selected_loc
+        self.geo_position = None # array of geocentric [x,y,z] (km) from rise to set
+        self.latlon = None # array of [lat,lon] (deg)
+        self.azaltrange = None # array of [azimuth (deg), elevation (deg), range (km)]
+        self.range_rate = None # array of range rate (km/s), positive while the satellite moves away
+        self.time_list = None # list of times for display
+
+        if isinstance(satrecObj, EarthSatellite):
+            self.satrec = satrecObj
+        else:
+            raise TypeError
+
+    def is_populated(self):
+        status = False
+        if self.time_list is not None:
+            num_points = len(self.time_list)
+            check_latlon = self.latlon.shape == (num_points, 2)
+            check_azaltrange = self.azaltrange.shape == (num_points, 3)
+            check_position = self.geo_position.shape == (num_points, 3)
+            status = check_latlon and check_azaltrange and check_position
+        if not status and DEBUG:
+            print(f"Ephemeris not populated for event: {self}")
+        return status
+
+    def __str__(self):
+        return f"\n  Rise: {self.rise.utc_iso()} | Culminate: {self.culminate.utc_iso()} | Set: {self.set.utc_iso()}"
+
+class SatelliteMember(EarthSatellite):
+    '''
+    Constellation member wrapping a QA-passed EarthSatellite, its transits live in the constellation's EventTable
+    '''
+    def __init__(self, st_object):
+        self.satrec_object = st_object # see above for attrs
+
+    def __str__(self):
+        return f"{self.satrec_object.name} | Epoch: {self.satrec_object.epoch.utc_iso()}"
+
+def complete_passes(events):
+    '''
+    @return indices into find_events output where a full rise -> culminate -> set sequence starts
+    '''
+    events = np.asarray(events)
+    if len(events) < 3:
+        return np.array([], dtype=int)
+    return np.flatnonzero((events[:-2] == 0) & (events[1:-1] == 1) & (events[2:] == 2))
+
+def compute_event_ephemerides(events, num_points=NUM_TRACK):
+    '''
+    @brief Populates the ephemeris of many TransitEvents at once
+
+    All sample instants go on one TimeGrid, so the timescale and Earth orientation matrices are built once
+    for the whole batch and each satellite is propagated once over all of its events.
+
+    @return True if any event was populated
+    '''
+    if not events:
+        return False
+    ts = get_timescale()
+    rise = np.array([(ev.rise.whole, ev.rise.tt_fraction) for ev in events])
+    duration = np.array([(ev.set.whole - ev.rise.whole) + (ev.set.tt_fraction - ev.rise.tt_fraction) for ev in events])
+    # same sampling as ts.linspace(rise, set, num_points) for every event, flattened event-major
+    fraction = rise[:, 1:2] + duration[:, None] * np.linspace(0.0, 1.0, num_points)
+    grid = TimeGrid(ts.tt_jd(np.repeat(rise[:, 0], num_points), fraction.ravel()))
+
+    by_satellite = {}
+    for idx, ev in enumerate(events):
+        by_satellite.setdefault(id(ev.satrec), []).append(idx)
+
+    offsets = np.arange(num_points)
+    for event_idx in by_satellite.values():
+        satrec = events[event_idx[0]].satrec
+        samples = (np.array(event_idx)[:, None] * num_points + offsets).ravel()
+        _, r_teme, v_teme = grid.sgp4([satrec.model], samples)
+        r_gcrs = grid.rotate(grid.teme_to_gcrs, r_teme[0], samples)
+        r_itrs, v_itrs = grid.itrs_state(r_teme[0], v_teme[0], samples)
+        lat, lon, _ = geodetic(r_itrs)
+        for k, idx in enumerate(event_idx):
+            ev = events[idx]
+            span = slice(k * num_points, (k + 1) * num_points)
+            el, az, rng, rng_rate = topocentric(r_itrs[span], ev.loc.latitude.degrees, ev.loc.longitude.degrees,
+                                                ev.loc.elevation.m, v_itrs=v_itrs[span])
+            ev.geo_position = r_gcrs[span]
+            ev.latlon = np.column_stack([lat[span], lon[span]])
+            ev.azaltrange = np.column_stack([az, el, rng])
+            ev.range_rate = rng_rate
+            ev.time_list = grid.times[samples[span]]
+    return True
+
+def events_to_schedule(events, tz=None):
+    '''
+    @brief Builds a schedule straight from event arrays, rise / culminate / set are datetime64 columns in tz
+
+    @return pandas df with SCHEDULE_COLUMNS, one row per event, times are formatted only at display time
+    '''
+    if not events:
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+    ts = get_timescale()
+    count = len(events)
+
+    def event_times(attr):
+        whole = np.fromiter((getattr(ev, attr).whole for ev in events), dtype=float, count=count)
+        fraction = np.fromiter((getattr(ev, attr).tt_fraction for ev in events), dtype=float, count=count)
+        return utc_datetime_index(ts.tt_jd(whole, fraction), tz)
+
+    # use defaults for safety when ephemeris is missing and bring up any errors
+    populated = np.fromiter((ev.is_populated() for ev in events), dtype=bool, count=count)
+    rise_az = np.array([ev.azaltrange[0][0] if ok else 0.0 for ev, ok in zip(events, populated)])
+    set_az = np.array([ev.azaltrange[-1][0] if ok else 0.0 for ev, ok in zip(events, populated)])
+
+    return pd.DataFrame({
+        'LOCATION': [ev.loc_name for ev in events],
+        'RISE': event_times('rise'),
+        'CULMINATE': event_times('culminate'),
+        'SET': event_times('set'),
+        'ASSET': [ev.asset for ev in events],
+        'RISE_AZIMUTH': rise_az,
+        'SET_AZIMUTH': set_az,
+        'LAUNCH_YEAR': [f"'{ev.satrec.model.intldesg[0:2]}" for ev in events],
+    })
+
+def format_schedule_times(df, format=DT_FORMAT):
+    '''
+    @return copy of a schedule with its datetime columns formatted as strings for display
+    '''
+    df = df.copy()
+    for col in SCHEDULE_TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].dt.strftime(format)
+    return df
+
+def time_chunks(start, stop, chunk=CHUNK_LENGTH):
+    '''
+    @return list of consecutive (start, stop) datetimes covering start -> stop, the last one may be shorter
+    '''
+    chunks = []
+    while start < stop:
+        chunks.append((start, min(start + chunk, stop)))
+        start = chunks[-1][1]
+    return chunks
+
+def find_chunk_passes(sat, position, chunk_start, chunk_stop, window_stop, min_elevation, overlap=CHUNK_OVERLAP):
+    '''
+    @brief Complete passes of one satellite that rise inside [chunk_start, chunk_stop)
+
+    The search runs past the chunk (never past window_stop) so a pass crossing the chunk boundary is found whole
+    in the chunk it rises in, and is skipped by the next chunk. The overlap doubles until the last pass has set.
+
+    @return skyfield Time of the events and indices of the rise event of each pass (see complete_passes)
+    '''
+    ts = get_timescale()
+    t0, t_chunk = ts.from_datetime(chunk_start), ts.from_datetime(chunk_stop)
+    search_stop = min(chunk_stop + overlap, window_stop)
+    while True:
+        times, events = sat.find_events(position, t0, ts.from_datetime(search_stop), altitude_degrees=min_elevation)
+        starts = complete_passes(events)
+        rises = np.flatnonzero(events == 0)
+        rises = rises[times[rises].tt < t_chunk.tt] if len(rises) else rises
+        # a rise in the chunk still waiting for its set at the end of the search
+        pending = len(rises) > 0 and rises[-1] not in starts and rises[-1] >= len(events) - 2
+        if not pending or search_stop >= window_stop:
+            break
+        overlap *= 2
+        search_stop = min(chunk_stop + overlap, window_stop)
+    if len(starts):
+        starts = starts[times[starts].tt < t_chunk.tt]
+    return times, starts
+
+def find_history_passes(history, norad_id, position, chunk_start, chunk_stop, window_stop, min_elevation,
+                        overlap=CHUNK_OVERLAP):
+    '''
+    @brief Complete passes of one satellite of a TLEHistory that rise inside [chunk_start, chunk_stop), every pass is
+           searched with the element set nearest to its rise (TLEHistory.epoch_segments), see find_chunk_passes
+
+    A pass rising within a few seconds of the midpoint between two epochs can be found by both element sets, or by
+    neither, when they disagree about its rise time by more than its distance to the midpoint.
+
+    @return generator of (skyfield EarthSatellite of the element set, Time of the events, indices of the rise events)
+    '''
+    ts = get_timescale()
+    jd_start, jd_stop = (float(utc_julian_date(ts.from_datetime(t))) for t in (chunk_start, chunk_stop))
+    segments = history.epoch_segments(norad_id, jd_start, jd_stop)
+    # inner edges are epoch midpoints, the chunk's own edges are kept exact
+    edges = [chunk_start] + list(pd.to_datetime([(stop - UNIX_EPOCH_JD) * 86400 for _, _, stop in segments[:-1]],
+                                                unit='s', utc=True)) + [chunk_stop]
+    for (record_idx, _, _), start, stop in zip(segments, edges[:-1], edges[1:]):
+        sat = history.satellite(record_idx)
+        times, starts = find_chunk_passes(sat, position, start, stop, window_stop, min_elevation, overlap)
+        if len(starts):
+            yield sat, times, starts
+
+def chunk_schedule(satellites, position, loc_name, chunk_start, chunk_stop, window_stop, min_elevation, tz=None,
+                   overlap=CHUNK_OVERLAP):
+    '''
+    @brief Schedule of passes rising inside one chunk of a long window, without keeping TransitEvent objects
+
+    @param satellites   list of skyfield EarthSatellite objects
+    @return pandas df with SCHEDULE_COLUMNS
+    '''
+    columns = {col: [] for col in SCHEDULE_COLUMNS}
+    for sat in satellites:
+        times, starts = find_chunk_passes(sat, position, chunk_start, chunk_stop, window_stop, min_elevation, overlap)
+        if len(starts) == 0:
+            continue
+        topocentric_at = (sat - position).at
+        _, rise_az, _ = topocentric_at(times[starts]).altaz()
+        _, set_az, _ = topocentric_at(times[starts + 2]).altaz()
+        columns['LOCATION'] += [loc_name] * len(starts)
+        columns['RISE'] += list(utc_datetime_index(times[starts], tz))
+        columns['CULMINATE'] += list(utc_datetime_index(times[starts + 1], tz))
+        columns['SET'] += list(utc_datetime_index(times[starts + 2], tz))
+        columns['ASSET'] += [sat.name] * len(starts)
+        columns['RISE_AZIMUTH'] += list(rise_az.degrees)
+        columns['SET_AZIMUTH'] += list(set_az.degrees)
+        columns['LAUNCH_YEAR'] += [f"'{sat.model.intldesg[0:2]}"] * len(starts)
+    df = pd.DataFrame(columns)
+    for col in SCHEDULE_TIME_COLUMNS:
+        df[col] = pd.to_datetime(df[col], utc=True)
+        df[col] = df[col] if tz is None else df[col].dt.tz_convert(tz)
+    return df
+
+def iter_chunked_schedule(satellites, position, loc_name, start, stop, min_elevation, tz=None, chunk=CHUNK_LENGTH,
+                          overlap=CHUNK_OVERLAP):
+    '''
+    @brief Long window schedules one chunk at a time, memory is bounded by the chunk length, not the window
+
+    @return generator of (chunks done, total chunks, schedule df of the finished chunk)
+    '''
+    chunks = time_chunks(start, stop, chunk)
+    for idx, (chunk_start, chunk_stop) in enumerate(chunks):
+        df = chunk_schedule(satellites, position, loc_name, chunk_start, chunk_stop, stop, min_elevation, tz, overlap)
+        if DEBUG:
+            print(f"Chunk {idx + 1}/{len(chunks)}: {len(df)} passes from {chunk_start} to {chunk_stop}.")
+        yield idx + 1, len(chunks), df
@@ -0,0 +1,282 @@
+'''
+Element set ingestion: Spacetrack OMM JSON queries and uploaded 3LE, OMM JSON / CSV or OMM KVN files are parsed
+straight into element records (sgp4init inputs, no skyfield objects), validated and de-duplicated with array operations
+and kept as an ElementStore, so 100k element sets load in seconds and only the satellites that are propagated get built.
+'''
+import io
+import json
+import numpy as np
+import pandas as pd
+from sgp4.api import Satrec
+import constellation_configs as cc
+from core.elements import iter_3le
+from core.spacetrack import stream_spacetrack
+from core.propagation import UNIX_EPOCH_JD
+from core.tle_history import HISTORY_DTYPE, ELEMENT_FIELDS
+from core.element_store import ElementStore
+
+DEBUG = False
+
+FORMAT_3LE = '3le'
+FORMAT_JSON = 'json'
+FORMAT_CSV = 'csv'
+FORMAT_KVN = 'kvn'
+UPLOAD_TYPES = ['txt', 'tle', '3le', 'json', 'csv', 'kvn'] # file extensions accepted by the upload widget
+
+# OMM mean motion units (rev/day, rev/day^2, rev/day^3) -> SGP4 units (rad/min, rad/min^2, rad/min^3), as sgp4.omm
+XPDOTP = 1440.0 / (2.0 * np.pi)
+NS_PER_DAY = 86400 * 10 ** 9
+ISO_EPOCH = r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?$' # OMM EPOCH (UTC), Spacetrack uses a space for the T
+OMM_COLUMNS = ['OBJECT_NAME', 'OBJECT_ID', 'EPOCH', 'MEAN_MOTION', 'ECCENTRICITY', 'INCLINATION', 'RA_OF_ASC_NODE',
+               'ARG_OF_PERICENTER', 'MEAN_ANOMALY', 'NORAD_CAT_ID', 'BSTAR', 'MEAN_MOTION_DOT', 'MEAN_MOTION_DDOT']
+REPORT_COLUMNS = ['READ', 'INVALID', 'DUPLICATES', 'SUPERSEDED', 'LOADED']
+STREAM_BATCH = 2000 # streamed OMM rows converted to element records at a time
+
+def sniff_format(head, filename=''):
+    '''
+    @return one of the FORMAT_* names from the first bytes of a file, the extension only breaks ties
+    '''
+    text = head.decode('utf-8', errors='replace').lstrip('﻿').lstrip()
+    if text[:1] in ('[', '{'):
+        return FORMAT_JSON
+    if text.startswith('CCSDS_OMM_VERS') or '\nCCSDS_OMM_VERS' in text:
+        return FORMAT_KVN
+    if 'NORAD_CAT_ID' in text.split('\n', 1)[0]:
+        return FORMAT_CSV
+    if filename.lower().endswith('.kvn'):
+        return FORMAT_KVN
+    return FORMAT_3LE
+
+def records_from_3le(lines):
+    '''
+    @return HISTORY_DTYPE array, names and international designators of the element sets in 3LE / 2LE lines
+    '''
+    columns = {field: [] for field in HISTORY_DTYPE.names}
+    names, intldesg = [], []
+    for name, line_1, line_2 in iter_3le(lines):
+        satrec = Satrec.twoline2rv(line_1, line_2)
+        columns['norad'].append(satrec.satnum)
+        columns['jd'].append(satrec.jdsatepoch)
+        columns['jd_fraction'].append(satrec.jdsatepochF)
+        for field in ELEMENT_FIELDS:
+            columns[field].append(getattr(satrec, field))
+        names.append(name or str(satrec.satnum))
+        intldesg.append(satrec.intldesg)
+    records = np.zeros(len(names), dtype=HISTORY_DTYPE)
+    for field in HISTORY_DTYPE.names:
+        records[field] = columns[field]
+    return records, names, intldesg
+
+def records_from_omm(df):
+    '''
+    @brief Converts OMM mean elements (CCSDS field names, Celestrak / Spacetrack JSON and CSV columns) to element
+           records, column by column, with the same unit conversions as sgp4.omm.initialize
+
+    @param df   pandas df with at least the OMM_COLUMNS that carry elements, NORAD_CAT_ID, EPOCH and MEAN_MOTION
+    @return HISTORY_DTYPE array, names and international designators, unparseable values become nan
+    '''
+    def number(column, default=0.0):
+        if column not in df:
+            return np.full(len(df), default)
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+    records = np.zeros(len(df), dtype=HISTORY_DTYPE)
+    records['norad'] = np.nan_to_num(number('NORAD_CAT_ID', np.nan), nan=-1).astype(np.int32)
+    # epoch -> julian date split at midnight like Satrec.jdsatepoch / jdsatepochF, integer ns keep full precision
+    # numpy parses ISO strings of any precision, malformed ones are left as NaT instead of failing the whole file
+    text = df['EPOCH'].fillna('').astype(str).str.strip().str.rstrip('Z')
+    is_iso = text.str.match(ISO_EPOCH).to_numpy(dtype=bool)
+    epoch = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    epoch[is_iso] = text[is_iso].to_numpy(dtype=str).astype('datetime64[ns]')
+    ns = epoch.astype(np.int64)
+    if 'EPOCH_MICROSECONDS' in df:
+        # Spacetrack tle_latest rows carry the epoch in whole seconds plus a separate microseconds field
+        whole_seconds = ~text.str.contains('.', regex=False).to_numpy(dtype=bool)
+        ns = ns + np.where(whole_seconds, np.nan_to_num(number('EPOCH_MICROSECONDS')), 0).astype(np.int64) * 1000
+    days, remainder = np.divmod(ns, NS_PER_DAY)
+    records['jd'] = np.where(is_iso, UNIX_EPOCH_JD + days, np.nan)
+    records['jd_fraction'] = remainder / NS_PER_DAY
+    records['no_kozai'] = number('MEAN_MOTION', np.nan) / XPDOTP
+    records['ndot'] = number('MEAN_MOTION_DOT') / (XPDOTP * 1440.0)
+    records['nddot'] = number('MEAN_MOTION_DDOT') / (XPDOTP * 1440.0 * 1440.0)
+    records['bstar'] = number('BSTAR')
+    records['ecco'] = number('ECCENTRICITY', np.nan)
+    for field, column in [('inclo', 'INCLINATION'), ('nodeo', 'RA_OF_ASC_NODE'), ('argpo', 'ARG_OF_PERICENTER'),
+                          ('mo', 'MEAN_ANOMALY')]:
+        records[field] = np.radians(number(column, np.nan))
+
+    names = df['OBJECT_NAME'].fillna('').astype(str).to_numpy() if 'OBJECT_NAME' in df else \
+        records['norad'].astype(str)
+    # 1998-067A -> 98067A, the TLE form Satrec.intldesg uses
+    intldesg = df['OBJECT_ID'].fillna('').astype(str).str[2:].str.replace('-', '', regex=False).to_numpy() \
+        if 'OBJECT_ID' in df else np.full(len(df), '')
+    return records, names, intldesg
+
+def iter_kvn(lines):
+    '''
+    Generator that yields one dict of KEY -> value per OMM in KVN lines, a new message starts at CCSDS_OMM_VERS
+    '''
+    fields = {}
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if not sep or key == 'COMMENT':
+            continue
+        if key == 'CCSDS_OMM_VERS' and fields:
+            yield fields
+            fields = {}
+        # values may carry units, e.g. "MEAN_MOTION = 15.5 [rev/day]"
+        fields[key] = value.split('[', 1)[0].strip()
+    if fields:
+        yield fields
+
+def valid_records(records):
+    '''
+    @return boolean mask of element sets SGP4 can be initialised from: finite values, positive NORAD ID and mean
+            motion, 0 <= e < 1, 0 <= i <= 180 deg
+    '''
+    finite = np.ones(len(records), dtype=bool)
+    for field in ['jd', 'jd_fraction'] + ELEMENT_FIELDS:
+        finite &= np.isfinite(records[field])
+    with np.errstate(invalid='ignore'):
+        return finite & (records['norad'] > 0) & (records['no_kozai'] > 0) & (records['ecco'] >= 0) & \
+               (records['ecco'] < 1) & (records['inclo'] >= 0) & (records['inclo'] <= np.pi)
+
+def build_store(records, names, intldesg):
+    '''
+    @brief Validates and de-duplicates element records, keeps the newest epoch of every NORAD ID
+
+    @return (ElementStore, dict with REPORT_COLUMNS counts)
+    '''
+    names, intldesg = np.asarray(names, dtype=str), np.asarray(intldesg, dtype=str)
+    report = dict.fromkeys(REPORT_COLUMNS, 0)
+    report['READ'] = len(records)
+
+    valid = valid_records(records)
+    report['INVALID'] = int((~valid).sum())
+    records, names, intldesg = records[valid], names[valid], intldesg[valid]
+
+    # newest epoch last within each NORAD ID, repeated (NORAD ID, epoch) pairs are duplicates
+    order = np.lexsort((records['jd_fraction'], records['jd'], records['norad']))
+    records, names, intldesg = records[order], names[order], intldesg[order]
+    same_norad = records['norad'][1:] == records['norad'][:-1]
+    duplicate = np.zeros(len(records), dtype=bool) # the earlier copy, so a duplicated newest epoch is still loaded
+    duplicate[:-1] = same_norad & (records['jd'][1:] == records['jd'][:-1]) & \
+                    (records['jd_fraction'][1:] == records['jd_fraction'][:-1])
+    newest = np.ones(len(records), dtype=bool)
+    newest[:-1] = ~same_norad
+    report['DUPLICATES'] = int(duplicate.sum())
+    report['SUPERSEDED'] = int((~newest & ~duplicate).sum())
+    report['LOADED'] = int(newest.sum())
+    return ElementStore.from_records(records[newest], names[newest], intldesg[newest]), report
+
+def omm_records(df, source='OMM'):
+    '''
+    @return records, names and international designators of OMM rows, see records_from_omm, raises ValueError when
+            a required field is missing
+    '''
+    missing = [col for col in ['NORAD_CAT_ID', 'EPOCH', 'MEAN_MOTION'] if col not in df]
+    if missing:
+        raise ValueError(f"{source} is missing OMM fields {', '.join(missing)}.")
+    return records_from_omm(df)
+
+def iter_omm_batches(rows, source='OMM', batch_size=STREAM_BATCH):
+    '''
+    @brief Converts a stream of OMM rows (dicts, e.g. from core.spacetrack.stream_spacetrack) to element records a batch
+           at a time, so only one batch of rows is held as Python objects
+
+    @return generator of (records, names, intldesg, number of rows read), invalid element sets already dropped
+    '''
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) < batch_size:
+            continue
+        yield _valid_batch(batch, source)
+        batch = []
+    if batch:
+        yield _valid_batch(batch, source)
+
+def _valid_batch(rows, source):
+    records, names, intldesg = omm_records(pd.DataFrame(rows), source)
+    valid = valid_records(records)
+    return records[valid], np.asarray(names, dtype=str)[valid], np.asarray(intldesg, dtype=str)[valid], len(rows)
+
+def stream_store_from_omm(rows, source='OMM', batch_size=STREAM_BATCH, progress=None):
+    '''
+    @brief Builds an ElementStore from a stream of OMM rows as they arrive, see iter_omm_batches
+
+    @param progress optional callback(rows read so far), called after every batch
+    @return (ElementStore, dict with REPORT_COLUMNS counts)
+    '''
+    parts, read = [], 0
+    for records, names, intldesg, count in iter_omm_batches(rows, source, batch_size):
+        parts.append((records, names, intldesg))
+        read += count
+        if progress is not None:
+            progress(read)
+    if not parts:
+        return build_store(np.zeros(0, dtype=HISTORY_DTYPE), [], [])
+    store, report = build_store(*(np.concatenate(part) for part in zip(*parts)))
+    report['INVALID'] = read - report['READ']
+    report['READ'] = read
+    return store, report
+
+def fetch_spacetrack_elements(const_name, credentials, query_limit=10000):
+    '''
+    @return (ElementStore, report) of a constellation's latest OMM element sets, streamed from Spacetrack JSON
+    '''
+    rows = stream_spacetrack(cc.CONFIGS[const_name]["_URL"], credentials, query_limit)
+    return stream_store_from_omm(rows, const_name)
+
+def read_records(buffer, filename=''):
+    '''
+    @brief Parses an element set file (3LE / TLE, OMM JSON, CSV or KVN) into element records, every epoch is kept
+           and nothing is validated yet, see ingest_elements
+
+    @param buffer   binary file object, e.g. a Streamlit UploadedFile or open(path, 'rb')
+    @param filename used to break ties when the format cannot be told from the content
+    @return HISTORY_DTYPE array, names and international designators
+    '''
+    head = buffer.read(4096)
+    buffer.seek(0)
+    file_format = sniff_format(head, filename)
+    if DEBUG:
+        print(f"Reading {filename} as {file_format}.")
+    if file_format == FORMAT_3LE:
+        return records_from_3le(io.TextIOWrapper(buffer, encoding='utf-8', errors='replace'))
+    if file_format == FORMAT_JSON:
+        data = json.load(buffer)
+        df = pd.DataFrame([data] if isinstance(data, dict) else data)
+    elif file_format == FORMAT_CSV:
+        df = pd.read_csv(buffer, dtype={'OBJECT_NAME': str, 'OBJECT_ID': str, 'EPOCH': str})
+    else:
+        df = pd.DataFrame(list(iter_kvn(io.TextIOWrapper(buffer, encoding='utf-8', errors='replace'))))
+    return omm_records(df, filename or 'File')
+
+def history_records(buffer, filename=''):
+    '''
+    @brief Reads the valid element sets of a file for a TLEHistory, every epoch is kept
+
+    @return HISTORY_DTYPE array and dict of NORAD ID -> (name, international designator), see TLEHistory.extend_records
+    '''
+    records, names, intldesg = read_records(buffer, filename)
+    valid = valid_records(records)
+    names, intldesg = np.asarray(names, dtype=str)[valid], np.asarray(intldesg, dtype=str)[valid]
+    records = records[valid]
+    return records, dict(zip(records['norad'].tolist(), zip(names.tolist(), intldesg.tolist())))
+
+def ingest_elements(buffer, filename=''):
+    '''
+    @brief Parses an uploaded element set file into an ElementStore, one record (the newest epoch) per NORAD ID
+
+    @param buffer   binary file object, e.g. a Streamlit UploadedFile or open(path, 'rb')
+    @param filename used to break ties when the format cannot be told from the content
+    @return (ElementStore, dict with REPORT_COLUMNS counts)
+    '''
+    store, report = build_store(*read_records(buffer, filename))
+    if DEBUG:
+        print(f"Ingested {filename}: {report}")
+    return store, report
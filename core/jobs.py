@@ -0,0 +1,158 @@
+'''
+Background jobs: long computations (transit search, ephemerides) run on a shared thread pool instead of the script
+thread, report progress through a callback and stop at their next progress checkpoint once a newer job supersedes them.
+'''
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError
+
+DEBUG = False
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2)) # jobs computed at once, shared by every session of a process
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+DONE = 'DONE'
+FAILED = 'FAILED'
+CANCELLED = 'CANCELLED'
+
+class JobCancelled(Exception):
+    '''
+    Raised at a progress checkpoint of a cancelled job, unwinds the computation
+    '''
+    pass
+
+class Job(object):
+    '''
+    Handle of one submitted computation: status, progress, result and cooperative cancellation
+    '''
+    def __init__(self, key):
+        self.key = key # inputs the job was submitted for, a job with other inputs supersedes it
+        self.progress = 0.0 # fraction done, 0 - 1
+        self.message = 'Waiting for a free worker...'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    def report(self, fraction, message=None):
+        '''
+        @brief Progress callback handed to the computation, also its cancellation checkpoint
+
+        @param fraction fraction done, 0 - 1
+        @param message  optional status text
+        @return None, raises JobCancelled once the job was cancelled
+        '''
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.key} was cancelled.")
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        return None
+
+    def cancel(self):
+        '''
+        Stops a queued job before it starts, a running one at its next report
+        '''
+        self._cancel.set()
+        if self._future is not None:
+            self._future.cancel()
+        return None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self._future.done()
+
+    def wait(self, timeout=None):
+        '''
+        @return True if the job finished (done, failed or cancelled) within timeout seconds
+        '''
+        try:
+            self._future.exception(timeout)
+        except CancelledError:
+            pass
+        except TimeoutError:
+            return False
+        return True
+
+    @property
+    def status(self):
+        if not self._future.done():
+            return RUNNING if self.started is not None else PENDING
+        if self._future.cancelled() or isinstance(self._future.exception(), JobCancelled):
+            return CANCELLED
+        return FAILED if self._future.exception() is not None else DONE
+
+    @property
+    def error(self):
+        '''
+        @return exception raised by a failed job, else None
+        '''
+        return self._future.exception() if self.status == FAILED else None
+
+    @property
+    def elapsed(self):
+        '''
+        @return seconds the job has been computing, 0 while it is queued
+        '''
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+class JobRunner(object):
+    '''
+    Thread pool for jobs, the computations share the process' satellites and caches so nothing is pickled
+    '''
+    def __init__(self, max_workers=JOB_WORKERS, name='job'):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def submit(self, key, fn, *args, **kwargs):
+        '''
+        @brief Queues fn(job, *args, **kwargs), fn reports progress (and gets stopped) through job.report
+
+        @return Job
+        '''
+        job = Job(key)
+        job._future = self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def supersede(self, current, key, fn, *args, **kwargs):
+        '''
+        @brief Job for key: current if it was submitted for the same key, else current is cancelled and a new job
+               is submitted
+
+        @param current  latest Job of the caller (e.g. one per session) or None
+        @return Job
+        '''
+        if current is not None and current.key == key and not current.cancelled:
+            return current
+        if current is not None:
+            current.cancel()
+            if DEBUG:
+                print(f"Cancelled job {current.key} ({current.status}), superseded by {key}.")
+        return self.submit(key, fn, *args, **kwargs)
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.report(0.0, 'Started...')
+        job.started = time.time()
+        try:
+            result = fn(job, *args, **kwargs)
+        finally:
+            job.finished = time.time()
+            if DEBUG:
+                print(f"Job {job.key} finished in {job.elapsed:.2f} s.")
+        job.progress = 1.0
+        return result
+
+    def shutdown(self, cancel=True):
+        self.executor.shutdown(wait=False, cancel_futures=cancel)
+        return None
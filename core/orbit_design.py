@@ -0,0 +1,143 @@
+'''
+Orbit design trade space: the legacy orbit playground's derived parameters (eccentricity, period, apogee / perigee
+velocity), J2 secular rates, sun-synchronous inclination, ground-track repeat and site pass counts, evaluated for a
+whole grid of altitude x inclination x eccentricity design points as array operations.
+'''
+import numpy as np
+import pandas as pd
+from skyfield.constants import DAY_S, ANGVEL
+from core.timegrid import TimeGrid
+from core.coverage import site_elevations, SAT_CHUNK
+from core.element_store import ElementStore
+from core.propagation import utc_julian_date
+from core.tle_history import HISTORY_DTYPE
+from core.walker import kozai_mean_motion, SYNTHETIC_NORAD_START
+
+DEBUG = False
+
+MU_KM3_S2 = 398600.4418 # WGS84, the legacy playground rounded to 398600
+EARTH_RADIUS_KM = 6378.137
+J2 = 1.08262668e-3
+SUN_SYNC_RATE = 360.0 / 365.2421897 # deg/day the orbit plane has to precess to follow the mean sun
+SUN_SYNC_TOLERANCE_DEG = 0.5 # designs this close to the sun-synchronous inclination are flagged SUN_SYNC
+MIN_PERIGEE_KM = 120.0 # designs with a lower perigee re-enter, they are dropped
+REPEAT_MAX_DAYS = 30 # longest ground-track repeat cycle searched for
+REPEAT_TOLERANCE_KM = 10.0 # equator shift after a cycle still counted as a repeat
+PASS_STEP = 60 # seconds between samples of the pass count grid
+DESIGN_COLUMNS = ['ALTITUDE (km)', 'INCLINATION (deg)', 'ECCENTRICITY', 'SMA (km)', 'APOGEE (km)', 'PERIGEE (km)',
+                  'PERIOD (min)', 'V_APOGEE (km/s)', 'V_PERIGEE (km/s)', 'RAAN_RATE (deg/day)', 'ARGP_RATE (deg/day)',
+                  'SSO_INCLINATION (deg)', 'SUN_SYNC', 'REVS_PER_DAY', 'REPEAT_DAYS', 'REPEAT_REVS']
+
+def design_grid(altitudes_km, inclinations_deg, eccentricities):
+    '''
+    @return pandas df with one row per (altitude, inclination, eccentricity) combination, altitude is the mean
+            altitude (semi-major axis - Earth radius)
+    '''
+    alt, inc, ecc = np.meshgrid(np.asarray(altitudes_km, dtype=float), np.asarray(inclinations_deg, dtype=float),
+                                np.asarray(eccentricities, dtype=float), indexing='ij')
+    return pd.DataFrame({'ALTITUDE (km)': alt.ravel(), 'INCLINATION (deg)': inc.ravel(), 'ECCENTRICITY': ecc.ravel()})
+
+def repeat_cycle(revs_per_day, max_days=REPEAT_MAX_DAYS, tolerance_km=REPEAT_TOLERANCE_KM):
+    '''
+    @brief Shortest ground-track repeat: D nodal days after which the satellite has flown a whole number of revolutions
+           R, up to an equator shift of tolerance_km
+
+    @param revs_per_day nodal revolutions per nodal day (N,)
+    @return repeat days and revolutions (N,), nan where nothing repeats within max_days
+    '''
+    days = np.arange(1, max_days + 1)
+    revs = np.outer(revs_per_day, days) # (N, max_days)
+    # every revolution the track moves one equator spacing 2 pi R / revs_per_day
+    shift_km = np.abs(revs - np.round(revs)) * 2 * np.pi * EARTH_RADIUS_KM / np.asarray(revs_per_day)[:, None]
+    repeats = shift_km <= tolerance_km
+    first = np.argmax(repeats, axis=1)
+    found = repeats.any(axis=1)
+    repeat_days = np.where(found, days[first], np.nan)
+    return repeat_days, np.where(found, np.round(revs[np.arange(len(revs)), first]), np.nan)
+
+def orbit_parameters(designs, max_days=REPEAT_MAX_DAYS, tolerance_km=REPEAT_TOLERANCE_KM):
+    '''
+    @brief Derived parameters of every design point, designs with a perigee below MIN_PERIGEE_KM are dropped
+
+    @param designs  pandas df with ALTITUDE (km), INCLINATION (deg), ECCENTRICITY, e.g. from design_grid
+    @return pandas df with DESIGN_COLUMNS
+    '''
+    alt = designs['ALTITUDE (km)'].to_numpy(dtype=float)
+    inc = np.radians(designs['INCLINATION (deg)'].to_numpy(dtype=float))
+    ecc = designs['ECCENTRICITY'].to_numpy(dtype=float)
+    sma = EARTH_RADIUS_KM + alt
+    keep = (sma * (1 - ecc) - EARTH_RADIUS_KM >= MIN_PERIGEE_KM) & (ecc >= 0) & (ecc < 1)
+    alt, inc, ecc, sma = alt[keep], inc[keep], ecc[keep], sma[keep]
+
+    r_apogee, r_perigee = sma * (1 + ecc), sma * (1 - ecc)
+    # angular momentum, vis-viva at the apsides as in the legacy playground
+    h = np.sqrt(MU_KM3_S2 * sma * (1 - ecc ** 2))
+    n = np.sqrt(MU_KM3_S2 / sma ** 3) # rad/s
+    # J2 secular drift of the node, perigee and mean anomaly
+    j2_term = 1.5 * J2 * (EARTH_RADIUS_KM / (sma * (1 - ecc ** 2))) ** 2 * n
+    cos_i = np.cos(inc)
+    raan_rate = -j2_term * cos_i
+    argp_rate = 0.5 * j2_term * (5 * cos_i ** 2 - 1)
+    mean_rate = n + 0.5 * j2_term * np.sqrt(1 - ecc ** 2) * (3 * cos_i ** 2 - 1)
+    # inclination whose nodal precession follows the sun, none above ~6000 km
+    cos_sso = -np.radians(SUN_SYNC_RATE) / DAY_S / j2_term
+    sso_inc = np.degrees(np.arccos(np.where(np.abs(cos_sso) <= 1, cos_sso, np.nan)))
+    # revolutions (node to node) per day of the Earth turning under the drifting node
+    revs_per_day = (mean_rate + argp_rate) / (ANGVEL - raan_rate)
+    repeat_days, repeat_revs = repeat_cycle(revs_per_day, max_days, tolerance_km)
+
+    to_deg_day = np.degrees(1.0) * DAY_S
+    return pd.DataFrame({
+        'ALTITUDE (km)': alt,
+        'INCLINATION (deg)': np.degrees(inc),
+        'ECCENTRICITY': ecc,
+        'SMA (km)': sma,
+        'APOGEE (km)': r_apogee - EARTH_RADIUS_KM,
+        'PERIGEE (km)': r_perigee - EARTH_RADIUS_KM,
+        'PERIOD (min)': 2 * np.pi / n / 60,
+        'V_APOGEE (km/s)': h / r_apogee,
+        'V_PERIGEE (km/s)': h / r_perigee,
+        'RAAN_RATE (deg/day)': raan_rate * to_deg_day,
+        'ARGP_RATE (deg/day)': argp_rate * to_deg_day,
+        'SSO_INCLINATION (deg)': sso_inc,
+        'SUN_SYNC': np.abs(np.degrees(inc) - sso_inc) <= SUN_SYNC_TOLERANCE_DEG,
+        'REVS_PER_DAY': revs_per_day,
+        'REPEAT_DAYS': repeat_days,
+        'REPEAT_REVS': repeat_revs,
+    }, columns=DESIGN_COLUMNS)
+
+def design_store(params, epoch_jd):
+    '''
+    @return ElementStore with one satellite per design point (RAAN, argument of perigee and mean anomaly 0 at epoch),
+            record i is row i of params
+    '''
+    records = np.zeros(len(params), dtype=HISTORY_DTYPE)
+    records['norad'] = SYNTHETIC_NORAD_START + np.arange(len(params))
+    records['jd'] = np.floor(epoch_jd - 0.5) + 0.5
+    records['jd_fraction'] = epoch_jd - records['jd']
+    records['ecco'] = params['ECCENTRICITY'].to_numpy(dtype=float)
+    records['inclo'] = np.radians(params['INCLINATION (deg)'].to_numpy(dtype=float))
+    records['no_kozai'] = kozai_mean_motion(params['SMA (km)'].to_numpy(dtype=float), records['ecco'], records['inclo'])
+    return ElementStore.from_records(records, [f"DESIGN-{idx}" for idx in range(len(params))], [''] * len(params))
+
+def design_pass_counts(params, sites, start, stop, min_elevation, step_seconds=PASS_STEP, chunk_size=SAT_CHUNK):
+    '''
+    @brief Passes above min_elevation over every site for one satellite per design point, all design points are
+           propagated together with SGP4 on one shared TimeGrid
+
+    @param params       pandas df from orbit_parameters
+    @param sites        dict of site name -> (latitude, longitude[, elevation (m)])
+    @param start, stop  timezone aware datetimes
+    @return pandas df of pass counts, one column per site (PASSES <site>) and row per design point
+    '''
+    grid = TimeGrid.from_datetimes(start, stop, step_seconds)
+    satellites = design_store(params, utc_julian_date(grid.times[0])).satellites()
+    counts = {name: np.zeros(len(satellites), dtype=np.int64) for name in sites}
+    for chunk, elevations in site_elevations(grid, satellites, sites, chunk_size):
+        for name, el in elevations.items():
+            visible = el >= min_elevation
+            # same counting as core.coverage.site_coverage, a satellite already up at the start counts once
+            counts[name][chunk] = (visible[:, 1:] & ~visible[:, :-1]).sum(axis=1) + visible[:, 0]
+    if DEBUG:
+        print(f"Pass counts for {len(satellites)} design points over {len(sites)} sites and {len(grid)} samples.")
+    return pd.DataFrame({f"PASSES {name}": count for name, count in counts.items()}, index=params.index)
@@ -0,0 +1,74 @@
+'''
+Lightweight span based profiling of pipeline stages with counters, reported as a table or one JSON line per run.
+'''
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime as dt, timezone
+
+# when set, JSON lines are appended to this file instead of written to stdout
+PROFILE_LOG_ENV = 'CONSTELLATION_PROFILE_LOG'
+
+class Profiler(object):
+    '''
+    Collects wall-clock time per stage and named counters for one run
+    '''
+    def __init__(self, run_name, **context):
+        self.run_name = run_name
+        self.context = dict(context) # e.g. constellation, site
+        self.spans = [] # list of (stage, seconds) in completion order
+        self.counters = {}
+        self.started = dt.now(timezone.utc)
+
+    @contextmanager
+    def span(self, stage):
+        t_start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.spans.append((stage, time.perf_counter() - t_start))
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def update_context(self, **context):
+        self.context.update(context)
+
+    def stage_totals(self):
+        '''
+        @return dict of stage -> {'calls', 'seconds'}, stages in order of first completion
+        '''
+        totals = {}
+        for stage, seconds in self.spans:
+            entry = totals.setdefault(stage, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+        return totals
+
+    def to_records(self):
+        return [{'STAGE': stage, 'CALLS': entry['calls'], 'SECONDS': round(entry['seconds'], 4)}
+                for stage, entry in self.stage_totals().items()]
+
+    def to_json(self):
+        return json.dumps({
+            'run': self.run_name,
+            'started': self.started.isoformat(),
+            'context': self.context,
+            'stages': {stage: round(entry['seconds'], 4) for stage, entry in self.stage_totals().items()},
+            'counters': self.counters,
+        }, default=str)
+
+    def emit(self):
+        '''
+        writes the run summary as a single JSON line
+        '''
+        line = self.to_json()
+        path = os.environ.get(PROFILE_LOG_ENV)
+        if path:
+            with open(path, 'a') as f:
+                f.write(line + '\n')
+        else:
+            print(line, file=sys.stdout, flush=True)
+        return line
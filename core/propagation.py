@@ -0,0 +1,72 @@
+'''
+Time scale handling and vectorized propagation of satellites over time ranges.
+'''
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from skyfield.api import load, wgs84, EarthSatellite
+from skyfield.constants import DAY_S
+from core.eclipse import sunlit_mask
+
+NUM_TRACK = 50 # default points per transit ephemeris
+EPHEM_POINTS = 500 # points per orbit ephemeris
+DT_FORMAT = '%b %d, %Y %H:%M:%S' # times shown in tables and captions
+UNIX_EPOCH_JD = 2440587.5
+
+@lru_cache(maxsize=None)
+def get_timescale():
+    '''
+    @return skyfield Timescale, built once per process on first use instead of at import
+    '''
+    return load.timescale()
+
+def utc_julian_date(times):
+    '''
+    @return UTC julian date(s) of a skyfield Time, the time argument SGP4 and TLE epochs use
+    '''
+    return times.whole + (times.tai_fraction - times._leap_seconds() / DAY_S)
+
+def utc_datetime_index(times, tz=None):
+    '''
+    @return pandas DatetimeIndex in UTC (or converted to tz) for a skyfield Time array, without building Python datetimes
+    '''
+    fraction_utc = np.atleast_1d(times.tai_fraction - times._leap_seconds() / DAY_S)
+    seconds = ((np.atleast_1d(times.whole) - UNIX_EPOCH_JD) + fraction_utc) * DAY_S
+    index = pd.to_datetime(np.round(seconds * 1e6).astype('int64'), unit='us', utc=True)
+    return index if tz is None else index.tz_convert(tz)
+
+class SatelliteEphemeris(object):
+    '''
+    Positional information about a satellite sampled evenly between two times, computed for all samples at once
+    '''
+    def __init__(self, start_time, end_time, satrecObj, num_points=EPHEM_POINTS):
+        self.timerange = [start_time, end_time]
+        self.num_points = num_points
+        self.times = None # skyfield Time array
+        self.geocentric = None # Geocentric position object over self.times
+        self.ephem_populated = False # to be initialised by init_states()
+        if isinstance(satrecObj, EarthSatellite):
+            self.satrec = satrecObj
+            self.ephem_populated = self.init_states() # bool to indicate if ephem is generated
+        else:
+            raise TypeError(f'Ephemeris needs a satrec object to compute state vectors, got something else: {type(satrecObj)}!')
+
+    def init_states(self):
+        '''
+        propagates the satellite over self.timerange in one vectorized call
+        '''
+        ts = get_timescale()
+        self.times = ts.linspace(self.timerange[0], self.timerange[1], self.num_points)
+        self.geocentric = self.satrec.at(self.times)
+        return True
+
+    def get_df(self, format=DT_FORMAT):
+        '''
+        return a df with ephemeris states: epoch string, lat/lon (deg), sunlit flag and GCRS state (km, km/s)
+        '''
+        lat, lon = wgs84.latlon_of(self.geocentric)
+        pos = self.geocentric.position.km
+        vel = self.geocentric.velocity.km_per_s
+        return pd.DataFrame({'epoch': self.times.utc_strftime(format), 'lat': lat.degrees, 'lon': lon.degrees,
+                             'sunlit': sunlit_mask(self.geocentric),
+                             'x': pos[0], 'y': pos[1], 'z': pos[2], 'vx': vel[0], 'vy': vel[1], 'vz': vel[2]})
@@ -0,0 +1,28 @@
+'''
+Radial / In-track / Cross-track (RIC) frame transforms, vectorized over all samples.
+'''
+import numpy as np
+
+def ric_matrices(r_vec, v_vec):
+    '''
+    @param r_vec, v_vec     (N, 3) inertial position / velocity of the reference object
+
+    @return (N, 3, 3) inertial to RIC rotation matrices, rows are [r_hat, i_hat, c_hat]
+    '''
+    r_hat = r_vec / np.linalg.norm(r_vec, axis=-1, keepdims=True)
+    h_vec = np.cross(r_vec, v_vec)
+    c_hat = h_vec / np.linalg.norm(h_vec, axis=-1, keepdims=True)
+    i_hat = np.cross(c_hat, r_hat)
+    return np.stack([r_hat, i_hat, c_hat], axis=-2)
+
+def ric_difference(state1, state2):
+    '''
+    @param state1, state2   (N, 6) inertial states [x, y, z, vx, vy, vz] of primary and secondary objects
+
+    @return (N, 3) position of the secondary w.r.t. the primary, in the primary's RIC frame
+    '''
+    state1, state2 = np.asarray(state1, dtype=float), np.asarray(state2, dtype=float)
+    if state1.shape[-1] != 6 or state2.shape[-1] != 6:
+        raise ValueError("Cannot do RIC transform when states are not of length 6!")
+    diff = state2[:, :3] - state1[:, :3]
+    return np.einsum('nij,nj->ni', ric_matrices(state1[:, :3], state1[:, 3:]), diff)
@@ -0,0 +1,86 @@
+'''
+Spacetrack queries, kept apart from the element / propagation modules so pages that only tabulate the catalog do not
+import skyfield.
+'''
+import io
+import json
+import codecs
+import pandas as pd
+
+SPACETRACK_URI = "https://www.space-track.org"
+SPACETRACK_LOGIN = "/ajaxauth/login"
+SPACETRACK_QUERY = "/basicspacedata/query"
+STREAM_CHUNK_SIZE = 64 * 1024 # bytes per chunk read from streamed Spacetrack responses
+
+def query_spacetrack(request_url, credentials, query_limit=10000):
+    '''
+    @brief Runs one Spacetrack basicspacedata query in JSON format, e.g. the tle_latest OMM rows of a constellation
+
+    @param request_url  query path after /basicspacedata/query, like constellation_configs.CONFIGS[...]["_URL"]
+    @param credentials  dict with Spacetrack 'identity' and 'password'
+    @return pandas df with one row per object, numeric fields converted
+    '''
+    import requests # only needed when actually downloading
+
+    with requests.Session() as session:
+        # need to log in first. note that we get a 200 to say the web site got the data, not that we are logged in
+        resp = session.post(SPACETRACK_URI + SPACETRACK_LOGIN, data = credentials)
+        if resp.status_code != 200:
+            raise ConnectionError("Could not reach Spacetrack!")
+        resp = session.get(SPACETRACK_URI + SPACETRACK_QUERY + request_url + f"/limit/{query_limit}")
+        if resp.status_code != 200:
+            raise ConnectionError("API query failed from Spacetrack!")
+        return pd.read_json(io.StringIO(resp.text))
+
+def iter_json_array(chunks):
+    '''
+    Generator that yields the elements of a JSON array (e.g. OMM rows) from an iterable of byte / text chunks as soon
+    as each one is complete, so the response body is never held as one string
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')(errors='replace') # a character may be split across chunks
+    buffer, pos, done = '', 0, False
+    for chunk in chunks:
+        buffer = buffer[pos:] + (utf8.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        pos = 0
+        while not done:
+            # skip the separators between rows
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n[,\ufeff':
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                done = True
+                break
+            try:
+                row, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break # row not complete yet, read the next chunk
+            if end == len(buffer) and not isinstance(row, (dict, list, str)):
+                break # a number or literal may continue in the next chunk
+            pos = end
+            yield row
+    if not done and buffer[pos:].strip(' \t\r\n[,\ufeff'):
+        # the body ended on a number / literal row, a truncated or malformed body raises here
+        row, end = decoder.raw_decode(buffer, pos)
+        if buffer[end:].strip():
+            raise ValueError(f"Unexpected data after JSON row: {buffer[end:end + 50]!r}")
+        yield row
+
+def stream_spacetrack(request_url, credentials, query_limit=10000, chunk_size=STREAM_CHUNK_SIZE):
+    '''
+    @brief Runs one Spacetrack JSON query and yields its rows as they are downloaded, see query_spacetrack
+
+    @param chunk_size   bytes read from the response at a time
+    @return generator of dicts, one per object, values as Spacetrack sends them (mostly strings)
+    '''
+    import requests # only needed when actually downloading
+
+    with requests.Session() as session:
+        resp = session.post(SPACETRACK_URI + SPACETRACK_LOGIN, data = credentials)
+        if resp.status_code != 200:
+            raise ConnectionError("Could not reach Spacetrack!")
+        with session.get(SPACETRACK_URI + SPACETRACK_QUERY + request_url + f"/limit/{query_limit}", stream=True) as resp:
+            if resp.status_code != 200:
+                raise ConnectionError("API query failed from Spacetrack!")
+            yield from iter_json_array(resp.iter_content(chunk_size=chunk_size))
@@ -0,0 +1,124 @@
+'''
+Time-sliced spatial index over sub-satellite points: a constellation is propagated once on a TimeGrid and every
+time step gets a KD-tree over unit vectors, so "which satellites are near this point at time t" is a tree lookup.
+'''
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from core.propagation import get_timescale
+from core.timegrid import TimeGrid, geodetic
+from core.coverage import SAT_CHUNK
+
+DEBUG = False
+
+INDEX_STEP = 60 # seconds between indexed time steps
+MEAN_EARTH_RADIUS_KM = 6371.0088
+
+def unit_vectors(lat_deg, lon_deg):
+    '''
+    @return unit vectors (..., 3) on the sphere for latitudes / longitudes in degrees
+    '''
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+def chord_length(distance_km):
+    '''
+    @return straight line distance between unit vectors that are distance_km apart along the surface
+    '''
+    return 2.0 * np.sin(np.minimum(distance_km / MEAN_EARTH_RADIUS_KM, np.pi) / 2.0)
+
+class SubSatelliteIndex(object):
+    '''
+    Sub-satellite points of many satellites on a fixed time grid with one KD-tree per time step, built on first use
+    '''
+    def __init__(self, grid, satellites, chunk_size=SAT_CHUNK):
+        '''
+        @param grid         TimeGrid
+        @param satellites   list of skyfield EarthSatellite objects, results refer to them by index
+        '''
+        self.grid = grid
+        self.satellites = list(satellites)
+        self.lat = np.full((len(grid), len(self.satellites)), np.nan, dtype=np.float32) # (time step, satellite) deg
+        self.lon = np.full((len(grid), len(self.satellites)), np.nan, dtype=np.float32)
+        for idx in range(0, len(self.satellites), chunk_size):
+            chunk = slice(idx, min(idx + chunk_size, len(self.satellites)))
+            errors, r_teme, _ = grid.sgp4([sat.model for sat in self.satellites[chunk]])
+            lat, lon, _ = geodetic(grid.rotate(grid.teme_to_itrs, r_teme))
+            lat[errors != 0], lon[errors != 0] = np.nan, np.nan
+            self.lat[:, chunk], self.lon[:, chunk] = lat.T, lon.T
+        self._trees = {} # time step -> (cKDTree, satellite indices in the tree)
+
+    @classmethod
+    def from_datetimes(cls, satellites, start, stop, step_seconds=INDEX_STEP, chunk_size=SAT_CHUNK):
+        '''
+        @return index over start -> stop, memory is 2 x 4 bytes x steps x satellites so keep the window short
+        '''
+        return cls(TimeGrid.from_datetimes(start, stop, step_seconds), satellites, chunk_size)
+
+    @classmethod
+    def at_time(cls, satellites, t, chunk_size=SAT_CHUNK):
+        '''
+        @return index with a single step at t (timezone aware datetime), every satellite is propagated once
+        '''
+        return cls(TimeGrid(get_timescale().from_datetimes([t])), satellites, chunk_size)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def step_of(self, t):
+        '''
+        @return index of the grid step nearest to t (skyfield Time or timezone aware datetime)
+        '''
+        if not hasattr(t, 'tt'):
+            t = self.grid.ts.from_datetime(t)
+        return int(np.argmin(np.abs(self.grid.times.tt - t.tt)))
+
+    def tree(self, step):
+        if step not in self._trees:
+            valid = np.flatnonzero(~np.isnan(self.lat[step]))
+            self._trees[step] = (cKDTree(unit_vectors(self.lat[step, valid], self.lon[step, valid])), valid)
+        return self._trees[step]
+
+    def within_radius(self, lat, lon, radius_km, step):
+        '''
+        @return indices of satellites whose sub-satellite point is within radius_km (great circle) of lat / lon,
+                sorted by distance, and the distances (km)
+        '''
+        tree, valid = self.tree(step)
+        target = unit_vectors(lat, lon)
+        hits = valid[np.asarray(tree.query_ball_point(target, chord_length(radius_km)), dtype=int)]
+        distance = self.distance_km(lat, lon, hits, step)
+        order = np.argsort(distance)
+        return hits[order], distance[order]
+
+    def within_bbox(self, lat_min, lat_max, lon_min, lon_max, step):
+        '''
+        @return indices of satellites with sub-satellite points inside a lat / lon box, lon_min > lon_max crosses the
+                antimeridian
+        '''
+        lat, lon = self.lat[step], self.lon[step]
+        in_lon = (lon >= lon_min) & (lon <= lon_max) if lon_min <= lon_max else (lon >= lon_min) | (lon <= lon_max)
+        return np.flatnonzero((lat >= lat_min) & (lat <= lat_max) & in_lon)
+
+    def distance_km(self, lat, lon, sat_idx, step):
+        '''
+        @return great circle distance (km) from lat / lon to the sub-satellite points of sat_idx at a step
+        '''
+        target = unit_vectors(lat, lon)
+        points = unit_vectors(self.lat[step, sat_idx], self.lon[step, sat_idx])
+        cos_angle = np.clip(points @ target, -1.0, 1.0)
+        return MEAN_EARTH_RADIUS_KM * np.arccos(cos_angle)
+
+    def to_frame(self, sat_idx, step, distance=None):
+        '''
+        @return pandas df with ASSET, NORAD ID, LAT, LON (and DISTANCE (km)) for satellites at a step
+        '''
+        df = pd.DataFrame({
+            'ASSET': [self.satellites[idx].name for idx in sat_idx],
+            'NORAD ID': [self.satellites[idx].model.satnum for idx in sat_idx],
+            'LAT': self.lat[step, sat_idx].astype(float),
+            'LON': self.lon[step, sat_idx].astype(float),
+        })
+        if distance is not None:
+            df['DISTANCE (km)'] = distance
+        return df
@@ -0,0 +1,147 @@
+'''
+Shared time grids: the timescale, SGP4 time arguments and Earth orientation matrices for a set of instants are
+built once and reused by every satellite / site propagated on that grid.
+
+Array convention: vectors are (..., N, 3) with N the number of grid instants, e.g. (n_sat, N, 3) for a batch.
+'''
+from functools import cached_property
+import numpy as np
+from sgp4.api import SatrecArray
+from skyfield.constants import DAY_S, ANGVEL
+from skyfield.framelib import itrs
+from skyfield.sgp4lib import TEME
+from core.propagation import get_timescale
+
+# WGS84 ellipsoid
+WGS84_RADIUS_KM = 6378.137
+WGS84_FLATTENING = 1 / 298.257223563
+WGS84_E2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+SPEED_OF_LIGHT_KM_S = 299792.458
+
+class TimeGrid(object):
+    '''
+    A fixed set of instants with everything that only depends on time computed once per grid
+    '''
+    def __init__(self, times):
+        self.times = times # skyfield Time array
+        self.ts = times.ts
+        # SGP4 expects UTC julian dates split into whole / fraction, same split skyfield uses
+        self.jd_whole = np.atleast_1d(times.whole).astype(float)
+        self.jd_fraction = np.atleast_1d(times.tai_fraction - times._leap_seconds() / DAY_S).astype(float)
+
+    @classmethod
+    def linspace(cls, t0, t1, num):
+        return cls(get_timescale().linspace(t0, t1, num))
+
+    @classmethod
+    def from_datetimes(cls, start, stop, step_seconds):
+        '''
+        @return grid from start to stop (timezone aware datetimes) with a fixed step, stop included when on the step
+        '''
+        ts = get_timescale()
+        t0, t1 = ts.from_datetime(start), ts.from_datetime(stop)
+        offsets = np.arange(0.0, (t1.tt - t0.tt) * DAY_S + 1e-6, step_seconds) / DAY_S
+        return cls(ts.tt_jd(t0.whole, t0.tt_fraction + offsets))
+
+    def __len__(self):
+        return len(self.jd_whole)
+
+    @cached_property
+    def teme_to_gcrs(self):
+        # TEME.rotation_at is GCRS -> TEME, transpose every instant
+        return np.swapaxes(np.atleast_3d(TEME.rotation_at(self.times)), 0, 1)
+
+    @cached_property
+    def gcrs_to_itrs(self):
+        return np.atleast_3d(itrs.rotation_at(self.times))
+
+    @cached_property
+    def teme_to_itrs(self):
+        return np.einsum('ijn,jkn->ikn', self.gcrs_to_itrs, self.teme_to_gcrs)
+
+    def sgp4(self, satrecs, idx=slice(None)):
+        '''
+        @brief Propagates many sgp4 Satrec objects over (a subset of) the grid in one C call
+
+        @return error codes (n_sat, N), TEME position (n_sat, N, 3) km, TEME velocity (n_sat, N, 3) km/s
+        '''
+        return SatrecArray(list(satrecs)).sgp4(self.jd_whole[idx], self.jd_fraction[idx])
+
+    def rotate(self, matrices, vectors, idx=slice(None)):
+        '''
+        @return vectors (..., N, 3) rotated by the per-instant matrices (3, 3, N) of this grid
+        '''
+        return np.einsum('ijn,...nj->...ni', matrices[:, :, idx], vectors)
+
+    def itrs_state(self, r_teme, v_teme, idx=slice(None)):
+        '''
+        @return Earth fixed position (km) and velocity (km/s) from TEME states on this grid
+        '''
+        r_itrs = self.rotate(self.teme_to_itrs, r_teme, idx)
+        v_itrs = self.rotate(self.teme_to_itrs, v_teme, idx)
+        # remove the Earth's rotation from the velocity, omega x r with omega along z
+        v_itrs[..., 0] += ANGVEL * r_itrs[..., 1]
+        v_itrs[..., 1] -= ANGVEL * r_itrs[..., 0]
+        return r_itrs, v_itrs
+
+def geodetic(r_itrs):
+    '''
+    @return WGS84 latitude (deg), longitude (deg) and height (km) for Earth fixed positions (..., 3) km
+    '''
+    x, y, z = r_itrs[..., 0], r_itrs[..., 1], r_itrs[..., 2]
+    R = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z, R)
+    for _ in range(3):
+        sin_lat = np.sin(lat)
+        C = 1.0 / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+        lat = np.arctan2(z + WGS84_RADIUS_KM * C * WGS84_E2 * sin_lat, R)
+    sin_lat = np.sin(lat)
+    C = 1.0 / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    height = R / np.cos(lat) - WGS84_RADIUS_KM * C
+    return np.degrees(lat), np.degrees(lon), height
+
+def site_itrs(lat_deg, lon_deg, elevation_m=0.0):
+    '''
+    @return Earth fixed position (3,) km of a WGS84 site
+    '''
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    C = 1.0 / np.sqrt(1.0 - WGS84_E2 * np.sin(lat) ** 2)
+    S = (1.0 - WGS84_E2) * C
+    h = elevation_m / 1000.0
+    return np.array([(WGS84_RADIUS_KM * C + h) * np.cos(lat) * np.cos(lon),
+                     (WGS84_RADIUS_KM * C + h) * np.cos(lat) * np.sin(lon),
+                     (WGS84_RADIUS_KM * S + h) * np.sin(lat)])
+
+def enu_matrix(lat_deg, lon_deg):
+    '''
+    @return (3, 3) rotation from Earth fixed to local East / North / Up axes
+    '''
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    sin_lat, cos_lat, sin_lon, cos_lon = np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+    return np.array([[-sin_lon, cos_lon, 0.0],
+                     [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+                     [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat]])
+
+def topocentric(r_itrs, lat_deg, lon_deg, elevation_m=0.0, v_itrs=None):
+    '''
+    @brief Look angles of Earth fixed positions (..., 3) from a site
+
+    @return elevation (deg), azimuth (deg), range (km) and, when v_itrs is given, range rate (km/s)
+    '''
+    rel = r_itrs - site_itrs(lat_deg, lon_deg, elevation_m)
+    enu = rel @ enu_matrix(lat_deg, lon_deg).T
+    rng = np.linalg.norm(rel, axis=-1)
+    el = np.degrees(np.arcsin(np.clip(enu[..., 2] / rng, -1.0, 1.0)))
+    az = np.degrees(np.arctan2(enu[..., 0], enu[..., 1])) % 360.0
+    if v_itrs is None:
+        return el, az, rng
+    # the site is fixed in ITRS, so the relative velocity is the satellite's Earth fixed velocity
+    range_rate = np.sum(rel * v_itrs, axis=-1) / rng
+    return el, az, rng, range_rate
+
+def doppler_shift(range_rate, frequency_hz):
+    '''
+    @return Doppler shift (Hz) of a carrier received at the site for range rates (km/s), positive while approaching
+    '''
+    return -np.asarray(range_rate, dtype=float) / SPEED_OF_LIGHT_KM_S * frequency_hz
@@ -0,0 +1,253 @@
+'''
+Epoch-versioned element history: many element sets per NORAD ID in one structured array sorted by (NORAD ID, epoch),
+so hindcasts can propagate every time sample from the element set with the nearest epoch.
+
+Element sets are kept as the mean elements SGP4 is initialised from (no TLE text), ~100 bytes each.
+'''
+import numpy as np
+from sgp4.api import Satrec, WGS72
+from skyfield.api import EarthSatellite
+from core.propagation import get_timescale, utc_julian_date
+from core.elements import parse_3le
+
+DEBUG = False
+
+SGP4_EPOCH_JD = 2433281.5 # sgp4init epochs are days since 1949 December 31 00:00 UT
+UNKNOWN_SATELLITE = 255 # error code of samples without any element set
+
+# WGS72 constants, the ones SGP4 mean elements are defined with
+XKE = 0.07436691613317342 # sqrt(GM) in earth radii ^ 1.5 / min
+J2 = 0.001082616
+EARTH_RADIUS_KM = 6378.135
+
+# epoch is the UTC julian date split into whole / fraction like Satrec.jdsatepoch / jdsatepochF
+HISTORY_DTYPE = np.dtype([('norad', np.int32), ('jd', np.float64), ('jd_fraction', np.float64),
+                          ('bstar', np.float64), ('ndot', np.float64), ('nddot', np.float64), ('ecco', np.float64),
+                          ('argpo', np.float64), ('inclo', np.float64), ('mo', np.float64), ('no_kozai', np.float64),
+                          ('nodeo', np.float64)])
+ELEMENT_FIELDS = ['bstar', 'ndot', 'nddot', 'ecco', 'argpo', 'inclo', 'mo', 'no_kozai', 'nodeo']
+
+def element_records(satellites):
+    '''
+    @return HISTORY_DTYPE array and dict of NORAD ID -> (name, international designator) for EarthSatellite objects
+    '''
+    satellites = list(satellites)
+    records = np.zeros(len(satellites), dtype=HISTORY_DTYPE)
+    records['norad'] = [sat.model.satnum for sat in satellites]
+    records['jd'] = [sat.model.jdsatepoch for sat in satellites]
+    records['jd_fraction'] = [sat.model.jdsatepochF for sat in satellites]
+    for field in ELEMENT_FIELDS:
+        records[field] = [getattr(sat.model, field) for sat in satellites]
+    info = {sat.model.satnum: (sat.name, sat.model.intldesg) for sat in satellites}
+    return records, info
+
+def mean_elements(records):
+    '''
+    @brief SGP4 mean semi-major axis (Kozai -> Brouwer mean motion, as in sgp4init), inclination and RAAN
+
+    @param records  HISTORY_DTYPE array
+    @return SMA (km), inclination (deg), RAAN (deg) arrays
+    '''
+    cos_inc = np.cos(records['inclo'])
+    ecc_term = (1.0 - records['ecco'] ** 2) ** 1.5
+    ak = (XKE / records['no_kozai']) ** (2.0 / 3.0)
+    d1 = 0.75 * J2 * (3.0 * cos_inc ** 2 - 1.0) / ecc_term
+    delta = d1 / ak ** 2
+    adel = ak * (1.0 - delta ** 2 - delta * (1.0 / 3.0 + 134.0 * delta ** 2 / 81.0))
+    no_unkozai = records['no_kozai'] / (1.0 + d1 / adel ** 2)
+    sma = (XKE / no_unkozai) ** (2.0 / 3.0) * EARTH_RADIUS_KM
+    return sma, np.degrees(records['inclo']), np.degrees(records['nodeo'])
+
+def satrec_from_record(record, intldesg=''):
+    '''
+    @return sgp4 Satrec of one HISTORY_DTYPE record, identical to the one parsed from its TLE
+    '''
+    satrec = Satrec()
+    # whole day offset first so the epoch fraction keeps full precision
+    epoch = (record['jd'] - SGP4_EPOCH_JD) + record['jd_fraction']
+    satrec.sgp4init(WGS72, 'i', int(record['norad']), epoch, *(float(record[field]) for field in ELEMENT_FIELDS))
+    satrec.intldesg = intldesg
+    return satrec
+
+class TLEHistory(object):
+    '''
+    Element sets of many satellites over time, grouped by NORAD ID and sorted by epoch within each group
+    '''
+    def __init__(self, records=None, info=None):
+        '''
+        @param records  HISTORY_DTYPE array in any order, repeated (NORAD ID, epoch) pairs are kept once
+        @param info     dict of NORAD ID -> (name, international designator)
+        '''
+        self.info = dict(info or {})
+        self.records = np.empty(0, dtype=HISTORY_DTYPE)
+        self._satrecs = {} # record index -> Satrec, built on first use
+        self._set_records(records if records is not None else np.empty(0, dtype=HISTORY_DTYPE))
+
+    def _set_records(self, records):
+        order = np.lexsort((records['jd_fraction'], records['jd'], records['norad']))
+        records = records[order]
+        keep = np.ones(len(records), dtype=bool)
+        keep[1:] = (records['norad'][1:] != records['norad'][:-1]) | (records['jd'][1:] != records['jd'][:-1]) | \
+                   (records['jd_fraction'][1:] != records['jd_fraction'][:-1])
+        self.records = records[keep]
+        # group of NORAD ID i is records[offsets[i]:offsets[i + 1]]
+        self.norad_ids, first = np.unique(self.records['norad'], return_index=True)
+        self.offsets = np.append(first, len(self.records))
+        self._satrecs = {}
+
+    @classmethod
+    def from_satellites(cls, satellites):
+        records, info = element_records(satellites)
+        return cls(records, info)
+
+    @classmethod
+    def from_3le(cls, lines):
+        return cls.from_satellites(parse_3le(lines))
+
+    def extend(self, satellites):
+        '''
+        @brief Adds element sets (EarthSatellite objects), epochs already in the history are not duplicated
+
+        @return number of element sets added
+        '''
+        return self.extend_records(*element_records(satellites))
+
+    def extend_records(self, records, info):
+        '''
+        @brief Adds HISTORY_DTYPE element records, epochs already in the history are not duplicated
+
+        @param info dict of NORAD ID -> (name, international designator)
+        @return number of element sets added
+        '''
+        before = len(self.records)
+        self.info.update(info)
+        self._set_records(np.concatenate([self.records, records]))
+        return len(self.records) - before
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes + self.offsets.nbytes + self.norad_ids.nbytes
+
+    @property
+    def epochs(self):
+        return self.records['jd'] + self.records['jd_fraction']
+
+    def group(self, norad_id):
+        '''
+        @return slice of self.records holding the element sets of one NORAD ID (empty if unknown)
+        '''
+        idx = np.searchsorted(self.norad_ids, norad_id)
+        if idx == len(self.norad_ids) or self.norad_ids[idx] != norad_id:
+            return slice(0, 0)
+        return slice(self.offsets[idx], self.offsets[idx + 1])
+
+    def nearest(self, norad_id, jd):
+        '''
+        @brief Element set with the epoch nearest to every time sample of one satellite
+
+        @param jd   UTC julian dates (N,)
+        @return record indices (N,), -1 for unknown NORAD IDs
+        '''
+        jd = np.atleast_1d(np.asarray(jd, dtype=float))
+        span = self.group(norad_id)
+        if span.start == span.stop:
+            return np.full(len(jd), -1, dtype=np.int64)
+        epochs = self.epochs[span]
+        if len(epochs) == 1:
+            return np.full(len(jd), span.start, dtype=np.int64)
+        after = np.clip(np.searchsorted(epochs, jd), 1, len(epochs) - 1)
+        before = after - 1
+        pick = np.where(np.abs(epochs[after] - jd) < np.abs(jd - epochs[before]), after, before)
+        return span.start + pick
+
+    def epoch_segments(self, norad_id, jd_start, jd_stop):
+        '''
+        @brief Splits [jd_start, jd_stop) where the nearest element set of one satellite changes, i.e. at the
+               midpoints between its epochs, see nearest
+
+        @return list of (record index, segment start, segment stop) UTC julian dates, empty for unknown NORAD IDs
+        '''
+        span = self.group(norad_id)
+        if span.start == span.stop or jd_stop <= jd_start:
+            return []
+        epochs = self.epochs[span]
+        midpoints = (epochs[1:] + epochs[:-1]) / 2
+        edges = np.concatenate(([jd_start], midpoints[(midpoints > jd_start) & (midpoints < jd_stop)], [jd_stop]))
+        # the nearest element set is constant inside a segment, pick it at the segment's middle
+        picked = self.nearest(norad_id, (edges[:-1] + edges[1:]) / 2)
+        return [(int(idx), float(start), float(stop)) for idx, start, stop in zip(picked, edges[:-1], edges[1:])]
+
+    def satrec(self, record_idx):
+        '''
+        @return sgp4 Satrec of one element set, identical to the one parsed from its TLE
+        '''
+        if record_idx not in self._satrecs:
+            rec = self.records[record_idx]
+            self._satrecs[record_idx] = satrec_from_record(rec, self.info.get(int(rec['norad']), ('', ''))[1])
+        return self._satrecs[record_idx]
+
+    def satellite(self, record_idx):
+        '''
+        @return skyfield EarthSatellite of one element set
+        '''
+        norad_id = int(self.records['norad'][record_idx])
+        satellite = EarthSatellite.from_satrec(self.satrec(record_idx), get_timescale())
+        satellite.name = self.info.get(norad_id, (str(norad_id), ''))[0]
+        return satellite
+
+    def satellites_at(self, t, norad_ids=None):
+        '''
+        @return list of EarthSatellite objects, each built from its element set nearest to t (skyfield Time), for a
+                hindcast with the elements that were current at the time
+        '''
+        norad_ids = self.norad_ids if norad_ids is None else norad_ids
+        jd = utc_julian_date(t)
+        satellites = []
+        for norad_id in norad_ids:
+            idx = self.nearest(norad_id, jd)[0]
+            if idx >= 0:
+                satellites.append(self.satellite(idx))
+        return satellites
+
+    def propagate(self, grid, norad_ids, idx=slice(None)):
+        '''
+        @brief Propagates satellites over (a subset of) a TimeGrid, every sample uses the nearest epoch element set,
+               each element set is propagated once over all the samples it was picked for
+
+        @return error codes (n_sat, N), TEME position (n_sat, N, 3) km, TEME velocity (n_sat, N, 3) km/s, same as
+                TimeGrid.sgp4, unknown NORAD IDs get error code UNKNOWN_SATELLITE
+        '''
+        jd_whole, jd_fraction = grid.jd_whole[idx], grid.jd_fraction[idx]
+        errors = np.full((len(norad_ids), len(jd_whole)), UNKNOWN_SATELLITE, dtype=np.uint8)
+        r = np.full((len(norad_ids), len(jd_whole), 3), np.nan)
+        v = np.full((len(norad_ids), len(jd_whole), 3), np.nan)
+        for sat_idx, norad_id in enumerate(norad_ids):
+            picked = self.nearest(norad_id, jd_whole + jd_fraction)
+            for record_idx in np.unique(picked[picked >= 0]):
+                samples = np.flatnonzero(picked == record_idx)
+                e, rr, vv = self.satrec(record_idx).sgp4_array(jd_whole[samples], jd_fraction[samples])
+                errors[sat_idx, samples], r[sat_idx, samples], v[sat_idx, samples] = e, rr, vv
+        return errors, r, v
+
+    def save(self, path):
+        '''
+        Writes the history to a compressed .npz file
+        '''
+        norad = np.array(list(self.info), dtype=np.int64)
+        names = np.array([self.info[key][0] or '' for key in norad], dtype=str)
+        intldesg = np.array([self.info[key][1] or '' for key in norad], dtype=str)
+        np.savez_compressed(path, records=self.records, info_norad=norad, info_name=names, info_intldesg=intldesg)
+        return None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            info = {int(key): (name, intldesg) for key, name, intldesg in
+                    zip(data['info_norad'], data['info_name'], data['info_intldesg'])}
+            history = cls(data['records'], info)
+        if DEBUG:
+            print(f"Loaded {len(history)} element sets of {len(history.norad_ids)} satellites, {history.nbytes} bytes.")
+        return history
@@ -0,0 +1,113 @@
+'''
+Synthetic constellations for load testing: Walker-delta (i: t/p/f) shells, alone or stacked as multi-shell
+constellations, generated as SGP4 mean element records at a common epoch, so 30k-100k satellite runs need no download.
+'''
+import time
+import numpy as np
+from sgp4 import exporter
+from skyfield.constants import DAY_S
+from core.propagation import UNIX_EPOCH_JD
+from core.tle_history import HISTORY_DTYPE, satrec_from_record, mean_elements, XKE, EARTH_RADIUS_KM
+from core.element_store import ElementStore
+
+DEBUG = False
+
+SYNTHETIC_NORAD_START = 200000 # Alpha-5 range, clear of catalogued objects and still writable as a TLE
+ALPHA5_NORAD_LIMIT = 340000 # first NORAD ID a TLE cannot hold
+SYNTHETIC_PREFIX = 'SYN'
+KOZAI_ITERATIONS = 4 # fixed point steps from the wanted mean semi-major axis to the Kozai mean motion SGP4 expects
+
+def apogee_perigee_orbit(apogee_km, perigee_km):
+    '''
+    @return semi-major axis (km) and eccentricity from apogee / perigee altitudes, as the legacy orbit playground
+    '''
+    r_apogee = EARTH_RADIUS_KM + np.asarray(apogee_km, dtype=float)
+    r_perigee = EARTH_RADIUS_KM + np.asarray(perigee_km, dtype=float)
+    return (r_apogee + r_perigee) / 2, (r_apogee - r_perigee) / (r_apogee + r_perigee)
+
+def kozai_mean_motion(sma_km, ecc, inc_rad):
+    '''
+    @return Kozai mean motion (rad/min) whose SGP4 mean semi-major axis (see core.tle_history.mean_elements) is sma_km
+    '''
+    records = np.zeros(np.broadcast(sma_km, ecc, inc_rad).shape, dtype=HISTORY_DTYPE)
+    records['ecco'], records['inclo'] = ecc, inc_rad
+    records['no_kozai'] = XKE / (np.asarray(sma_km) / EARTH_RADIUS_KM) ** 1.5
+    for _ in range(KOZAI_ITERATIONS):
+        sma, _, _ = mean_elements(records)
+        records['no_kozai'] *= (sma / sma_km) ** 1.5
+    return records['no_kozai']
+
+def walker_shell(inclination_deg, planes, per_plane, phasing=1, altitude_km=None, apogee_km=None, perigee_km=None,
+                 arg_perigee_deg=0.0, raan_spread_deg=360.0, raan_offset_deg=0.0):
+    '''
+    @brief Mean elements of one Walker shell, i: t/p/f with t = planes x per_plane
+
+    Planes are spread evenly over raan_spread_deg (360 for Walker-delta, 180 for Walker-star), satellites evenly in
+    mean anomaly within a plane, and neighbouring planes are offset by phasing x 360 / t degrees.
+
+    @param altitude_km  circular orbit altitude, or give apogee_km and perigee_km for an elliptical shell
+    @return (planes x per_plane) HISTORY_DTYPE array ordered plane by plane, norad / epoch left to the caller
+    '''
+    if planes < 1 or per_plane < 1 or not 0 <= phasing < planes:
+        raise ValueError(f"Invalid Walker shell {planes} planes x {per_plane} with phasing {phasing}.")
+    if altitude_km is not None:
+        sma, ecc = EARTH_RADIUS_KM + float(altitude_km), 0.0
+    elif apogee_km is not None and perigee_km is not None:
+        sma, ecc = apogee_perigee_orbit(apogee_km, perigee_km)
+    else:
+        raise ValueError("A Walker shell needs altitude_km or apogee_km and perigee_km.")
+    total = planes * per_plane
+    plane, slot = np.divmod(np.arange(total), per_plane)
+
+    records = np.zeros(total, dtype=HISTORY_DTYPE)
+    records['ecco'] = ecc
+    records['inclo'] = np.radians(inclination_deg)
+    records['argpo'] = np.radians(arg_perigee_deg)
+    records['nodeo'] = np.radians(np.mod(raan_offset_deg + plane * raan_spread_deg / planes, 360.0))
+    records['mo'] = np.radians(np.mod(slot * 360.0 / per_plane + plane * phasing * 360.0 / total, 360.0))
+    records['no_kozai'] = kozai_mean_motion(sma, ecc, records['inclo'])
+    return records
+
+def walker_records(shells, epoch_jd=None, norad_start=SYNTHETIC_NORAD_START, prefix=SYNTHETIC_PREFIX):
+    '''
+    @brief Element records of a multi-shell constellation
+
+    @param shells   list of dicts with walker_shell keyword arguments, e.g. constellation_configs "_SHELLS"
+    @param epoch_jd UTC julian date of every element set (default: today 00:00 UTC, so QA never finds them stale)
+    @return HISTORY_DTYPE array and names (prefix-shell-plane-slot), NORAD IDs counting up from norad_start
+    '''
+    if epoch_jd is None:
+        epoch_jd = UNIX_EPOCH_JD + np.floor(time.time() / DAY_S)
+    chunks, names = [], []
+    for shell_idx, shell in enumerate(shells):
+        records = walker_shell(**shell)
+        plane, slot = np.divmod(np.arange(len(records)), shell['per_plane'])
+        names += [f"{prefix}-{shell_idx + 1}-{p + 1:03d}-{s + 1:03d}" for p, s in zip(plane, slot)]
+        chunks.append(records)
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=HISTORY_DTYPE)
+    if norad_start + len(records) > ALPHA5_NORAD_LIMIT:
+        raise ValueError(f"{len(records)} synthetic satellites do not fit the Alpha-5 NORAD ID range.")
+    records['norad'] = norad_start + np.arange(len(records))
+    # epoch split into whole / fraction like Satrec.jdsatepoch / jdsatepochF
+    records['jd'] = np.floor(epoch_jd - 0.5) + 0.5
+    records['jd_fraction'] = epoch_jd - records['jd']
+    return records, names
+
+def walker_store(shells, epoch_jd=None, norad_start=SYNTHETIC_NORAD_START, prefix=SYNTHETIC_PREFIX):
+    '''
+    @return ElementStore of a synthetic multi-shell constellation, see walker_records
+    '''
+    records, names = walker_records(shells, epoch_jd, norad_start, prefix)
+    if DEBUG:
+        print(f"Generated {len(records)} synthetic satellites in {len(shells)} shell(s).")
+    return ElementStore.from_records(records, names, [''] * len(records))
+
+def write_3le(store, f):
+    '''
+    Writes every record of an ElementStore to a text file object as 3LE (Alpha-5 NORAD IDs above 99999)
+    '''
+    for idx in range(len(store)):
+        record = store.records[idx]
+        line_1, line_2 = exporter.export_tle(satrec_from_record(record, record['intldesg'].decode('ascii')))
+        f.write(f"{store.name(idx)}\n{line_1}\n{line_2}\n")
+    return None
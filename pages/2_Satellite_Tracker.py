@@ -4,6 +4,7 @@ import satellite_utils as st_utils
 from datetime import (datetime as dt, timedelta)
 import constellation_configs as cc
 import location_utils as loc_utils
+from core.element_store import cached_element_store
 from pytz import timezone
 
 # Meta Info
@@ -36,13 +37,14 @@ st.sidebar.write('Begin here 👇')
 satellite_group_type = st.sidebar.selectbox('Select a satellite group:', tuple(cc.TLE_GROUP_URL))
 _URL = 'http://celestrak.com/NORAD/elements/'
 url = f'{_URL}{cc.TLE_GROUP_URL[satellite_group_type]}.txt'
-satellites = load.tle_file(url)
-st.sidebar.success(f"Loaded {len(satellites)} satellites.",icon="✅")
+# memory-mapped element store shared by all sessions / processes, TLE text is only fetched when it is stale
+store = cached_element_store(f"celestrak_{cc.TLE_GROUP_URL[satellite_group_type]}", lambda: load.tle_file(url))
+st.sidebar.success(f"Loaded {len(store)} satellites.",icon="✅")
 
-# 2. Select satellite of interest
-by_name = {f"NORAD ID: {sat.model.satnum:<6} | {sat.name}": sat for sat in satellites}
+# 2. Select satellite of interest, only the selected one is built as a satellite object
+by_name = {label: idx for idx, label in enumerate(store.labels("NORAD ID: {norad:<6} | {name}"))}
 options = st.sidebar.selectbox('Select a satellite:', tuple(by_name))
-satObject = st_utils.Satellite(by_name[str(options)])
+satObject = st_utils.Satellite(store.satellite(by_name[str(options)]))
 
 usrLoc = loc_utils.UserLocation()
 locationChoice = st.sidebar.multiselect('Select locations for transits', list(usrLoc.locations_list), 
@@ -1,8 +1,8 @@
 import streamlit as st
 import plotly.express as px
-import requests
 import pandas as pd
 from satcat_configs import requestDict, statItems, groupbyItems
+from spacetrack_utils import get_omm_from_spacetrack
 
 # Meta Info
 st.set_page_config(page_title="SatCat Visualizer")
@@ -14,34 +14,17 @@ orbital status and classification and see insights come to life.
 
 @st.cache_data(ttl=21600)
 def get_data_from_spacetrack(constSelect, query_limit):
-    
-    def getSiteCred():
-        # use file in .streamlit/secrets.toml when running locally / else deployed streamlit app needs those secrets defined
-        return {'identity': st.secrets.configuration.username, 'password': st.secrets.configuration.password}
-
-    uriBase                = "https://www.space-track.org"
-    requestLogin           = "/ajaxauth/login"
-    requestCmdAction       = "/basicspacedata/query" 
-    requestURL = requestDict[constSelect] + f"/limit/{query_limit}"
-
-    with requests.Session() as session:
-        # need to log in first. note that we get a 200 to say the web site got the data, not that we are logged in
-        siteCred = getSiteCred()
-        resp = session.post(uriBase + requestLogin, data = siteCred)
-        if resp.status_code != 200:
-            st.error("Could not reach Spacetrack!")
-        # make get request from Spacetrack using the URL + auth
-        resp = session.get(uriBase + requestCmdAction + requestURL)  
-        if resp.status_code != 200:
-            st.error("API query failed from Spacetrack!")
-        else:
-            session.close()
-        df = pd.read_json(resp.text)
-        # sanitize data - needs to be in this function for cacheing to work
-        df['LAUNCH_YEAR'] = "'" + df['INTLDES'].str.slice(0,2)
-        df['ALTITUDE'] = df['SEMIMAJOR_AXIS'] - 6378
-        df.loc[df["DECAYED"] == 0, "STATUS"] = "In-orbit"
-        df.loc[df["DECAYED"] == 1, "STATUS"] = "Decayed"
+    # same OMM query the transit page streams into its element store
+    try:
+        df = get_omm_from_spacetrack(requestDict[constSelect], query_limit).copy()
+    except ConnectionError as e:
+        st.error(str(e))
+        st.stop()
+    # sanitize data - needs to be in this function for cacheing to work
+    df['LAUNCH_YEAR'] = "'" + df['INTLDES'].str.slice(0,2)
+    df['ALTITUDE'] = df['SEMIMAJOR_AXIS'] - 6378
+    df.loc[df["DECAYED"] == 0, "STATUS"] = "In-orbit"
+    df.loc[df["DECAYED"] == 1, "STATUS"] = "Decayed"
     return df
 
 # UI Elements
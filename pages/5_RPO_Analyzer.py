@@ -1,6 +1,9 @@
 import streamlit as st
 from skyfield.api import load, wgs84, EarthSatellite
 import satellite_utils as st_utils
+from core.ric import ric_difference
+from core.propagation import get_timescale, DT_FORMAT
+from core.element_store import ElementStore, cached_element_store
 from datetime import (datetime as dt, timedelta)
 from pytz import timezone
 import requests
@@ -9,8 +12,7 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 
-DT_FORMAT = '%b %d, %Y %H:%M:%S'
-ts = load.timescale()
+ts = get_timescale()
 
 sample_tle1 = '''ISS (ZARYA)
 1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927
@@ -24,38 +26,11 @@ sample_tle2 = '''ISS (NAUKA)
 
 def compare_sats(sat1df, sat2df):
 
-    def unit_vector(vec):
-        return vec / np.linalg.norm(vec)
-
-    def r_transform(state):
-        if len(state) == 6:
-            # Inertial to RIC transformation matrix
-            r_vec, v_vec = state[0:3], state[-3:]
-            h_vec = np.cross(r_vec, v_vec)
-            r_hat = unit_vector(r_vec)
-            c_hat = unit_vector(h_vec)
-            i_hat = np.cross(c_hat, r_hat)
-            return np.array([r_hat, i_hat, c_hat])
-        else:
-            raise Exception("Cannot do RIC transform with len(state) is not 6!")
-    
-    def get_ric_vectors():
-        r_list, i_list, c_list = [], [], []
-        for (idxRow, s1), (_, s2) in zip(sat1df.iterrows(), sat2df.iterrows()):
-                state1 = np.array([s1['x'], s1['y'], s1['z'], s1['vx'], s1['vy'], s1['vz']])
-                state2 = np.array([s2['x'], s2['y'], s2['z'], s2['vx'], s2['vy'], s2['vz']])
-                diff =  state2 - state1
-                delta_ric = np.dot(r_transform(state1), diff[:3])
-                r_list.append(delta_ric[0])
-                i_list.append(delta_ric[1])
-                c_list.append(delta_ric[2])
-        return r_list, i_list, c_list
-    
     # # Get RIC state difference w.r.t to primary (model-1) object 
-    r_list, i_list, c_list = get_ric_vectors()
-    st1df['r_miss'], st1df['i_miss'], st1df['c_miss'] = r_list, i_list, c_list
-    miss_mags = [np.linalg.norm(np.array([r_miss, i_miss, c_miss])) for r_miss, i_miss, c_miss in zip(r_list, i_list, c_list)]
-    st1df['miss_mags'] = miss_mags
+    state_cols = ['x', 'y', 'z', 'vx', 'vy', 'vz']
+    delta_ric = ric_difference(sat1df[state_cols].to_numpy(), sat2df[state_cols].to_numpy())
+    st1df['r_miss'], st1df['i_miss'], st1df['c_miss'] = delta_ric[:, 0], delta_ric[:, 1], delta_ric[:, 2]
+    st1df['miss_mags'] = np.linalg.norm(delta_ric, axis=1)
     subtitle_str = f"<br><sup>{satObject2.satrec_object.name} ({satObject2.satrec_object.model.satnum}) w.r.t {satObject1.satrec_object.name} ({satObject1.satrec_object.model.satnum})</sup>"
     
     st.info(f"The RIC differences are with respect to the primary satellite: {option1}", icon="ℹ️")
@@ -128,11 +103,11 @@ def compare_sats(sat1df, sat2df):
 st.sidebar.write('Begin here 👇')
 
 # 1. Select a group of satellites
-@st.cache_resource(ttl=21600)
 def query_sats(sat_group):
     _URL = 'http://celestrak.com/NORAD/elements/'
     url = f'{_URL}{cc.TLE_GROUP_URL[sat_group]}.txt'
-    return load.tle_file(url)
+    # memory-mapped element store shared by all sessions / processes, TLE text is only fetched when it is stale
+    return cached_element_store(f"celestrak_{cc.TLE_GROUP_URL[sat_group]}", lambda: load.tle_file(url))
 
 def get_sat_from_tle(tle_string):
     lines = tle_string.splitlines() # expected 3LE
@@ -151,7 +126,7 @@ def get_satellites(satellite_group_type):
             if tle1 and tle2:
                 sat1 = get_sat_from_tle(tle1)
                 sat2 = get_sat_from_tle(tle2)
-                satellites = [sat1, sat2]
+                satellites = ElementStore.from_satellites([sat1, sat2])
                 st.sidebar.success(f"Loaded {len(satellites)} satellites.",icon="✅")
                 return satellites
             else:
@@ -175,19 +150,19 @@ if satellites:
         format = "MM/DD HH:mm")
 
     # 3. Select satellite of interest
-    by_name = {f"{sat.model.satnum:<6} | {sat.name}": sat for sat in satellites}
+    by_name = {label: idx for idx, label in enumerate(satellites.labels())}
     
     col1, col2 = st.columns([1,1])
     with col1:
         option1 = st.selectbox('Select primary satellite:', tuple(by_name))
-        satObject1 = st_utils.Satellite(by_name[str(option1)])
+        satObject1 = st_utils.Satellite(satellites.satellite(by_name[str(option1)]))
         satObject1.results_for_rpo(dateChoice)
         st1df = satObject1.ephemeris.get_df_with_fields()
         st.caption(f'''{satObject1.tle_epoch_str}  
                     {satObject1.tle_age_str}''')
     with col2:
         option2 = st.selectbox('Select secondary satellite:', tuple(by_name), index=1)
-        satObject2 = st_utils.Satellite(by_name[str(option2)])
+        satObject2 = st_utils.Satellite(satellites.satellite(by_name[str(option2)]))
         satObject2.results_for_rpo(dateChoice)
         st2df = satObject2.ephemeris.get_df_with_fields()
         st.caption(f'''{satObject2.tle_epoch_str}  
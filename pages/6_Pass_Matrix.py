@@ -0,0 +1,81 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+import os
+from datetime import (datetime as dt, timedelta, timezone)
+import constellation_utils as const_utils
+from location_configs import LOCATIONS
+from core.elements import passed_qa
+from core.coverage import pass_matrix, COVERAGE_STEP
+from core.element_store import ELEMENT_STORE_DIR
+
+# stored result next to the element stores, written here or by:
+# python batch_transits.py --pass-matrix ... --out .element_store/pass_matrix.parquet
+PASS_MATRIX_FILE = os.environ.get('PASS_MATRIX_FILE', os.path.join(ELEMENT_STORE_DIR, 'pass_matrix.parquet'))
+METRICS = ['PASSES', 'VISIBLE (min)', 'COVERAGE (%)', 'MAX_GAP (min)']
+
+# Meta Info
+st.set_page_config(page_title="Pass Matrix")
+st.subheader('Pass Matrix 🗺️🛰️')
+st.caption('''Pass counts, total visible minutes and longest coverage gap for every constellation over every catalogued location. 
+Satellites are propagated once per constellation and shared by all locations. The result is stored so it can be displayed instantly on the next visit.
+''')
+
+@st.cache_data(show_spinner="Loading stored pass matrix...")
+def load_pass_matrix(path, modified):
+    # modified time is part of the cache key so a new batch run is picked up
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+def compute_and_store(constellations, min_elevation, days, step_seconds, path):
+    satellites = {}
+    for constellation in constellations:
+        passed, _ = passed_qa(const_utils.get_data_from_spacetrack(constellation))
+        satellites[constellation] = passed
+    start = dt.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    df = pass_matrix(satellites, LOCATIONS, start, start + timedelta(days=days), min_elevation, step_seconds)
+    df.insert(2, 'MIN_ELEVATION', min_elevation)
+    df.insert(3, 'START', start)
+    df.insert(4, 'STOP', start + timedelta(days=days))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_parquet(path, index=False)
+    return df
+
+# ------------------------- Sidebar panel
+st.sidebar.write('Compute a new pass matrix 👇')
+with st.sidebar.form('pass_matrix_form'):
+    constellationChoice = st.multiselect('Constellations', const_utils.CONSTELLATIONS, default=const_utils.CONSTELLATIONS[:2])
+    minElevation = st.slider("Restrict transits above horizon (degrees):", min_value=0, max_value=80, value=30, step=10)
+    numDays = st.slider("Days from now:", min_value=1, max_value=3, value=1)
+    stepSeconds = st.select_slider("Sampling step (sec):", options=[10, 30, 60], value=COVERAGE_STEP)
+    computeNow = st.form_submit_button('Compute and store')
+
+if computeNow:
+    if constellationChoice:
+        with st.spinner("Computing pass matrix..."):
+            compute_and_store(constellationChoice, minElevation, numDays, stepSeconds, PASS_MATRIX_FILE)
+        load_pass_matrix.clear()
+    else:
+        st.sidebar.error('Need at least one constellation to begin!')
+
+if not os.path.exists(PASS_MATRIX_FILE):
+    st.info('No stored pass matrix yet, compute one from the sidebar or with the batch CLI.', icon="ℹ️")
+    st.stop()
+
+df = load_pass_matrix(PASS_MATRIX_FILE, os.path.getmtime(PASS_MATRIX_FILE))
+# batch runs can hold several windows / elevations, show one at a time
+elevations = sorted(df['MIN_ELEVATION'].unique())
+elevationChoice = st.selectbox('Minimum elevation (degrees)', elevations) if len(elevations) > 1 else elevations[0]
+windows = df[['START', 'STOP']].drop_duplicates().astype(str).agg(' → '.join, axis=1).tolist()
+windowChoice = st.selectbox('Time window (UTC)', windows) if len(windows) > 1 else windows[0]
+df = df[(df['MIN_ELEVATION'] == elevationChoice) & (df[['START', 'STOP']].astype(str).agg(' → '.join, axis=1) == windowChoice)]
+st.caption(f"Window {windowChoice} (UTC) | elevation above {elevationChoice}°")
+
+tab1, tab2 = st.tabs(["Heatmap", "Table"])
+with tab1:
+    metric = st.radio('Metric', METRICS, horizontal=True)
+    heatmap = df.pivot(index='CONSTELLATION', columns='LOCATION', values=metric)
+    fig = px.imshow(heatmap, text_auto='.0f', aspect='auto', color_continuous_scale='Viridis_r' if metric == 'MAX_GAP (min)' else 'Viridis')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+    st.plotly_chart(fig, theme="streamlit", use_container_width=True)
+with tab2:
+    st.dataframe(df, hide_index=True, use_container_width=True)
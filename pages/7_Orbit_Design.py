@@ -0,0 +1,88 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+import numpy as np
+from datetime import (datetime as dt, timedelta, timezone)
+from location_configs import LOCATIONS
+from core.orbit_design import (design_grid, orbit_parameters, design_pass_counts, REPEAT_MAX_DAYS, REPEAT_TOLERANCE_KM,
+                               PASS_STEP)
+
+MAX_DESIGNS = 20000 # design points evaluated at once
+METRICS = ['PERIOD (min)', 'REVS_PER_DAY', 'REPEAT_DAYS', 'RAAN_RATE (deg/day)', 'ARGP_RATE (deg/day)',
+           'V_PERIGEE (km/s)', 'APOGEE (km)', 'PERIGEE (km)', 'PASSES (total)']
+
+# Meta Info
+st.set_page_config(page_title="Orbit Design")
+st.subheader('Orbit Design 🪐🛰️')
+st.caption('''Sweep altitude, inclination and eccentricity to compare orbit designs: period, apogee / perigee velocity,
+J2 node and perigee drift, sun-synchronous inclination, ground-track repeat cycle and passes over chosen sites.
+Every design point is evaluated at once, pass counts propagate one satellite per design point with SGP4.
+''')
+
+@st.cache_data(show_spinner="Evaluating design points...")
+def evaluate_designs(altitudes, inclinations, eccentricities, site_names, min_elevation, days, start):
+    params = orbit_parameters(design_grid(altitudes, inclinations, eccentricities))
+    if site_names:
+        sites = {name: LOCATIONS[name] for name in site_names}
+        counts = design_pass_counts(params, sites, start, start + timedelta(days=days), min_elevation)
+        params = pd.concat([params, counts], axis=1)
+        params['PASSES (total)'] = counts.sum(axis=1)
+    return params
+
+# ------------------------- Sidebar panel
+st.sidebar.write('Design space 👇')
+with st.sidebar.form('orbit_design_form'):
+    altRange = st.slider("Mean altitude (km):", min_value=150, max_value=2000, value=(300, 1200), step=50)
+    altStep = st.select_slider("Altitude step (km):", options=[5, 10, 25, 50], value=25)
+    incRange = st.slider("Inclination (degrees):", min_value=0, max_value=180, value=(0, 180), step=5)
+    incStep = st.select_slider("Inclination step (degrees):", options=[0.5, 1, 2, 5], value=2)
+    eccChoice = st.multiselect('Eccentricity', [0.0, 0.001, 0.01, 0.02, 0.05, 0.1], default=[0.0, 0.01])
+    siteChoice = st.multiselect('Sites for pass counts', list(LOCATIONS), default=['BOULDER'])
+    minElevation = st.slider("Restrict passes above horizon (degrees):", min_value=0, max_value=80, value=10, step=5)
+    numDays = st.slider("Days from now:", min_value=1, max_value=3, value=1)
+    st.form_submit_button('Evaluate')
+
+altitudes = np.arange(altRange[0], altRange[1] + altStep / 2, altStep)
+inclinations = np.arange(incRange[0], incRange[1] + incStep / 2, incStep)
+eccentricities = sorted(eccChoice) or [0.0]
+num_designs = len(altitudes) * len(inclinations) * len(eccentricities)
+if num_designs > MAX_DESIGNS:
+    st.error(f"{num_designs} design points, narrow the ranges or use larger steps to stay below {MAX_DESIGNS}.")
+    st.stop()
+
+# hour resolution keeps the cache valid across reruns within the hour
+start = dt.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+df = evaluate_designs(altitudes, inclinations, eccentricities, tuple(siteChoice), minElevation, numDays, start)
+st.sidebar.success(f"Evaluated {len(df)} design points.", icon="✅")
+if df.empty:
+    st.warning('Every design point has a perigee too low to stay in orbit.')
+    st.stop()
+
+tab1, tab2, tab3 = st.tabs(["Trade Space", "Sun-Synchronous / Repeat", "Table"])
+with tab1:
+    metrics = [metric for metric in METRICS if metric in df]
+    metric = st.radio('Metric', metrics, horizontal=True)
+    eccView = st.selectbox('Eccentricity', eccentricities) if len(eccentricities) > 1 else eccentricities[0]
+    view = df[df['ECCENTRICITY'] == eccView]
+    heatmap = view.pivot(index='INCLINATION (deg)', columns='ALTITUDE (km)', values=metric)
+    fig = px.imshow(heatmap, aspect='auto', origin='lower', color_continuous_scale='Viridis',
+                    labels={'color': metric})
+    st.plotly_chart(fig, theme="streamlit", use_container_width=True)
+    if metric == 'REPEAT_DAYS':
+        st.caption(f"Blank cells do not repeat within {REPEAT_MAX_DAYS} days (equator shift above {REPEAT_TOLERANCE_KM:.0f} km).")
+    if metric == 'PASSES (total)':
+        st.caption(f"Passes above {minElevation}° over {', '.join(siteChoice)} in {numDays} day(s), sampled every {PASS_STEP} s.")
+with tab2:
+    circular = df[df['ECCENTRICITY'] == eccentricities[0]].drop_duplicates(subset='ALTITUDE (km)')
+    fig = px.line(circular, x='ALTITUDE (km)', y='SSO_INCLINATION (deg)', title='Sun-synchronous inclination')
+    st.plotly_chart(fig, theme="streamlit", use_container_width=True)
+    repeats = df[df['REPEAT_DAYS'].notna() & df['SUN_SYNC']]
+    if repeats.empty:
+        st.info('No sun-synchronous design point repeats its ground track in the swept range, try smaller steps.', icon="ℹ️")
+    else:
+        fig = px.scatter(repeats, x='ALTITUDE (km)', y='REPEAT_DAYS', color='ECCENTRICITY', hover_data=['INCLINATION (deg)', 'REPEAT_REVS'],
+                         title='Sun-synchronous repeat ground tracks')
+        st.plotly_chart(fig, theme="streamlit", use_container_width=True)
+with tab3:
+    st.dataframe(df, hide_index=True, use_container_width=True)
+    st.download_button("Download design points (CSV)", df.to_csv(index=False).encode('utf-8'), file_name='orbit_designs.csv', mime='text/csv')
@@ -1,3 +1,5 @@
+import constellation_configs as cc
+
 # json response schema definition for tle_latest class
 # ['ORDINAL', 'COMMENT', 'ORIGINATOR', 'NORAD_CAT_ID', 'OBJECT_NAME',
 #  'OBJECT_TYPE', 'CLASSIFICATION_TYPE', 'INTLDES', 'EPOCH',
@@ -8,27 +10,28 @@
 #  'OBJECT_ID', 'OBJECT_NUMBER', 'SEMIMAJOR_AXIS', 'PERIOD', 'APOGEE',
 #  'PERIGEE', 'DECAYED']
 
+# constellations the transit page propagates use its query, so one OMM download serves both pages
 requestDict = {
-    "STARLINK" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/STARLINK~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "ONEWEB" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/ONEWEB~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "SPIRE" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/LEMUR~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "PLANET" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/SKYSAT~~/OBJECT_NAME/FLOCK~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "SWARM" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/SPACEBEE~~/format/json/orderby/NORAD_CAT_ID%20asc",
+    "STARLINK" : cc.CONFIGS["STARLINK"]["_URL"],
+    "ONEWEB" : cc.CONFIGS["ONEWEB"]["_URL"],
+    "SPIRE" : cc.CONFIGS["SPIRE"]["_URL"],
+    "PLANET" : cc.CONFIGS["PLANET"]["_URL"],
+    "SWARM" : cc.CONFIGS["SWARM"]["_URL"],
     "GEO" : "/class/tle_latest/MEAN_MOTION/0.99--1.01/ORDINAL/1/ECCENTRICITY/%3C0.01/format/json/orderby/NORAD_CAT_ID,EPOCH",
     "MEO" : "/class/tle_latest/MEAN_MOTION/1.8--2.39/ORDINAL/1/ECCENTRICITY/<0.25/format/json/orderby/NORAD_CAT_ID,EPOCH",
     "LEO" : "/class/tle_latest/MEAN_MOTION/>11.25/ORDINAL/1/ECCENTRICITY/<0.25/format/json/orderby/NORAD_CAT_ID,EPOCH",
     "HEO" : "/class/tle_latest/ORDINAL/1/ECCENTRICITY/>0.25/format/json/orderby/NORAD_CAT_ID,EPOCH",
-    "GLOBALSTAR" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/GLOBALSTAR~~/format/json/orderby/NORAD_CAT_ID%20asc",
+    "GLOBALSTAR" : cc.CONFIGS["GLOBALSTAR"]["_URL"],
     "INMARSAT" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/INMARSAT~~/format/json/orderby/NORAD_CAT_ID%20asc",
     "INTELSAT" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/INTELSAT~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "IRIDIUM" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/IRIDIUM~~/format/json/orderby/NORAD_CAT_ID%20asc",
-    "ORBCOMM" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/OBJECT_NAME/ORBCOMM~~/format/json/orderby/NORAD_CAT_ID%20asc",
+    "IRIDIUM" : cc.CONFIGS["IRIDIUM"]["_URL"],
+    "ORBCOMM" : cc.CONFIGS["ORBCOMM"]["_URL"],
     "HUMAN_SPACEFLIGHT": "/class/tle_latest/favorites/Human_Spaceflight/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
-    "AMATUER": "/class/tle_latest/favorites/Amateur/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
-    "NAVIGATION": "/class/tle_latest/favorites/Navigation/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
-    "SPECIAL_INTEREST": "/class/tle_latest/favorites/Special_Interest/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
-    "WEATHER": "/class/tle_latest/favorites/Weather/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
-    "VISIBLE": "/class/tle_latest/favorites/Visible/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
+    "AMATUER": cc.CONFIGS["AMATUER"]["_URL"],
+    "NAVIGATION": cc.CONFIGS["NAVSTAR (USA)"]["_URL"],
+    "SPECIAL_INTEREST": cc.CONFIGS["SPECIAL INTEREST"]["_URL"],
+    "WEATHER": cc.CONFIGS["WEATHER"]["_URL"],
+    "VISIBLE": cc.CONFIGS["VISIBLE"]["_URL"],
     "BRIGHT_GEO": "/class/tle_latest/favorites/brightgeo/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc",
     "ALL_OBJECTS" : "/class/tle_latest/NORAD_CAT_ID/>40000/ORDINAL/1/format/json/orderby/NORAD_CAT_ID%20asc"
 }
@@ -1,150 +1,46 @@
 import streamlit as st
-from skyfield.api import load, wgs84, EarthSatellite
+from skyfield.api import wgs84, EarthSatellite
 import pandas as pd
 import numpy as np
 import pydeck as pdk
 from skyfield.api import utc
-from skyfield.positionlib import Geocentric
-from skyfield.timelib import Time as SkyfieldTime
 import constellation_configs as cc
-from constellation_utils import TransitEvent
+from core.propagation import get_timescale, SatelliteEphemeris as CoreEphemeris, EPHEM_POINTS, DT_FORMAT
+from core.events import TransitEvent, compute_event_ephemerides, events_to_schedule, format_schedule_times
+from core.contacts import schedule_contacts, contact_plan_summary, SETUP_SECONDS
+from core.anomalies import TRENDS_URL
 from sgp4 import exporter
-import requests
-import html_to_json
-import json
-import re
 from datetime import datetime as dt
-import plotly.express as px
-import plotly.graph_objects as go
 
 
 
-NUM_TRACK = 500
 NUM_TRACK_ENDPOINTS = 7
 DEBUG = False
 
-DT_FORMAT = '%b %d, %Y %H:%M:%S'
-
-class StateVector(object):
-    '''
-    Stores state geoposition object with times
-    '''
-
-    def __init__(self, time, geoposition):
-
-        self.epoch = None # SkyfieldTime time object
-        self.geoposition = None # Geocentric position object
-
-        if isinstance(time, SkyfieldTime):
-            self.epoch = time
-        else:
-            st.exception(f'State vector needs a SkyfieldTime object, got something else: {type(time)}!')
-            raise TypeError
-        
-        if isinstance(geoposition, Geocentric):
-            self.geoposition = geoposition
-        else:
-            st.exception(f'State vector needs a Geocentric object, got something else: {type(geoposition)}!')
-            raise TypeError
-
-    def latlong(self):
-        lat, lon = wgs84.latlon_of(self.geoposition)
-        return [lat.degrees, lon.degrees]
-
-    def sunlitStatus(self):
-        eph = load('de421.bsp')
-        return self.geoposition.is_sunlit(eph)
-    
-    def gcrsPosition(self):
-        x, y, z = self.geoposition.position.km[0], self.geoposition.position.km[1], self.geoposition.position.km[2]
-        return [x, y, z]
-
-    def gcrsVelocity(self):
-        vx, vy, vz = self.geoposition.velocity.km_per_s[0], self.geoposition.velocity.km_per_s[1], self.geoposition.velocity.km_per_s[2]
-        return [vx, vy, vz]
-
-class SatelliteEphemeris(StateVector):
+class SatelliteEphemeris(CoreEphemeris):
     '''
-    Object that contains positonal information about satellites
+    Ephemeris with point colors for ground track plots
     '''
     def __init__(self, start_time, end_time, satrecObj):
-        self.timerange = [start_time, end_time]
-        self.state_vectors = None # list of State vectors
-        self.ephem_populated = False # to be initialised by init_states()
-        if isinstance(satrecObj, EarthSatellite):
-            self.satrec = satrecObj
-            self.ephem_populated = self.init_states() # bool to indicate if ephem is generated
-        else:
-            st.exception(f'Ephemeris needs a satrec object to compute state vectors, got something else: {type(satrecObj)}!')
-            raise TypeError
-
-    def init_states(self):
-        '''
-        initializes self.state_vectors with a list of StateVector objects within self.timerange
-        '''
-        res = False
-        ts = load.timescale()
-        try:
-            ts_range = ts.linspace(self.timerange[0], self.timerange[1], NUM_TRACK)
-            self.state_vectors = [StateVector(time, self.satrec.at(time)) for time in ts_range]
-            res = True
-        except Exception as e:
-            st.exception(f"Failed to initilize state vectors, got exception: {e}!")
-        finally:
-            return res
+        super().__init__(start_time, end_time, satrecObj, num_points=EPHEM_POINTS)
 
-    def __getTimesList(self, format=DT_FORMAT):
-        '''
-        returns a list of time strings for all state vector epochs
-        '''
-        return [vector.epoch.utc_strftime(format) for vector in self.state_vectors]
-    
-    def __getLatLongList(self):
-        '''
-        returns a tuple of (lat list, lon list) for all state vectors
-        '''
-        lat_lon_list = [vector.latlong() for vector in self.state_vectors]
-        lat, lon = map(list, zip(*lat_lon_list))
-        return tuple([lat, lon])
-
-    def __getSunlitColorList(self):
+    def get_df_with_fields(self):
         '''
-        returns a list of colors for all state vectors, yellow means is sunlit
+        return a df with ephemeris states, colored yellow when sunlit and dark blue in eclipse
         '''
+        df = self.get_df()
         # Color yellow in sunlight and dark_blue in eclipse
         dark_blue = [102, 102, 255]
         yellow = [255, 255, 0]
-        list_lit = [vector.sunlitStatus() for vector in self.state_vectors]
-        color_list = [yellow if is_sunlit else dark_blue for is_sunlit in list_lit]
+        color_list = [yellow if is_sunlit else dark_blue for is_sunlit in df['sunlit']]
 
         # Color starting and ending points differently
         green_for_start = [0, 255, 0]
         red_for_end = [255, 0, 0]
         color_list[:NUM_TRACK_ENDPOINTS] = [green_for_start] * NUM_TRACK_ENDPOINTS
         color_list[-NUM_TRACK_ENDPOINTS:] = [red_for_end] * NUM_TRACK_ENDPOINTS
-        return color_list
-    
-    def __getStateList(self):
-        '''
-        returns a tuple of (x, y, z, vx, vy, vz GCRS pos in km / km/s) for all state vectors
-        '''
-        # get position
-        xyz_list = [vector.gcrsPosition() for vector in self.state_vectors]
-        x_pos, y_pos, z_pos = map(list, zip(*xyz_list))
-        # get velocity
-        v_xyz_list = [vector.gcrsVelocity() for vector in self.state_vectors]
-        x_vel, y_vel, z_vel = map(list, zip(*v_xyz_list))
-        return tuple([x_pos, y_pos, z_pos, x_vel, y_vel, z_vel])
-
-    def get_df_with_fields(self):
-        '''
-        return a df with ephemeris states
-        '''
-        times = self.__getTimesList()
-        latlong = self.__getLatLongList()
-        sunlit_colors = self.__getSunlitColorList()   
-        state_vector = self.__getStateList()
-        return pd.DataFrame({'epoch': times, 'lat': latlong[0], 'lon': latlong[1], 'colors': sunlit_colors, 'x': state_vector[0], 'y': state_vector[1], 'z': state_vector[2], 'vx': state_vector[3], 'vy': state_vector[4], 'vz': state_vector[5]})
+        df.insert(3, 'colors', color_list)
+        return df.drop(columns=['sunlit'])
 
 
 class Satellite(EarthSatellite):
@@ -155,9 +51,10 @@ class Satellite(EarthSatellite):
         self.satrec_object = st_object # see above for attrs
         self.ephemeris = None # SatelliteEphemeris object
         self.events = [] # array of transit events, filled by generatePasses
+        self.schedule = pd.DataFrame() # unformatted schedule of the events, input of the contact plan
         self.min_elevation = 20 # degree above horizon for transits
 
-        ts = load.timescale()
+        ts = get_timescale()
         t_now = ts.now()
         days = t_now - self.satrec_object.epoch
         tle_epoch = self.satrec_object.epoch.utc_strftime(DT_FORMAT)
@@ -181,7 +78,6 @@ class Satellite(EarthSatellite):
             if len(rise_events) == len(culmination_events) == len(setting_events):
                 for i in range(len(rise_events)):
                     event = TransitEvent(rise_events[i], culmination_events[i], setting_events[i], self.satrec_object.name, self.satrec_object, locObj, locName)
-                    event.get_ephem() # populate positional data for transits
                     self.events.append(event) # add event to list of events
                     if DEBUG:
                         print(event)
@@ -191,10 +87,10 @@ class Satellite(EarthSatellite):
             return None
         
         def findTransits():
+            ts = get_timescale()
+            time_range = (ts.from_datetime(usrLocObject.date_range[0]), ts.from_datetime(usrLocObject.date_range[1]))
             for idx, loc in enumerate(usrLocObject.selected_position_array):
                 cityLatLon = wgs84.latlon(loc[0], loc[1])
-                ts = load.timescale()
-                time_range = (ts.from_datetime(usrLocObject.date_range[0]), ts.from_datetime(usrLocObject.date_range[1]))
                 times, events = self.satrec_object.find_events(cityLatLon, time_range[0], time_range[1], self.min_elevation)
                 if len(events) > 0:
                     add_events(self, times, events, cityLatLon, usrLocObject.selected_loc_array[idx])
@@ -206,16 +102,17 @@ class Satellite(EarthSatellite):
                     print(f"Found no transits for these locations: {usrLocObject.selected_loc_array}")
 
         findTransits()
+        # populate positional data for transits of all locations on one shared time grid
+        compute_event_ephemerides(self.events)
     
         df_to_print = pd.DataFrame() # return empty df by default if no events found
 
         if self.events:
-            list_of_recs = [ev.to_dict(usrLocObject.date_range[0].tzinfo) for ev in self.events]
-            df_to_print = pd.DataFrame.from_records(list_of_recs)
+            self.schedule = events_to_schedule(self.events, usrLocObject.date_range[0].tzinfo)
             # df_to_print = df_to_print[['LOCATION', 'RISE', 'SET']] # RISE/SET_AZIMUTH not available since 
-            df_to_print = df_to_print[['LOCATION', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH']]
+            df_to_print = self.schedule[['LOCATION', 'RISE', 'SET', 'RISE_AZIMUTH', 'SET_AZIMUTH']]
+            df_to_print = format_schedule_times(df_to_print.sort_values(by='RISE', ascending=True))
             df_to_print.set_index('LOCATION', inplace=True)
-            df_to_print.sort_values(by='RISE', ascending=True, inplace=True)
         
         return df_to_print
 
@@ -231,6 +128,23 @@ class Satellite(EarthSatellite):
     def drop_events(self):
         # used for callback when location / time range changes, we do not want to remember events
         self.events = []
+        self.schedule = pd.DataFrame()
+
+    def show_contact_plan(self):
+        '''
+        Contact plan over the passes of all selected locations, the satellite talks to one station at a time
+        '''
+        if self.schedule.empty:
+            return None
+        with st.expander("Contact plan"):
+            help_str = "Time an antenna needs to slew and set up between two contacts."
+            setup_seconds = st.number_input("Setup time between contacts (sec):", min_value=0, max_value=1800,
+                                            value=int(SETUP_SECONDS), step=30, help=help_str)
+            plan = schedule_contacts(self.schedule, setup_seconds=setup_seconds)
+            st.dataframe(contact_plan_summary(plan), use_container_width=True)
+            plan = format_schedule_times(plan[plan['SCHEDULED']][['LOCATION', 'RISE', 'SET', 'ANTENNA']])
+            st.dataframe(plan.set_index('LOCATION'), use_container_width=True)
+        return None
 
     def print_summary(self):
         '''
@@ -277,13 +191,19 @@ class Satellite(EarthSatellite):
         return None
     
     def get_orbital_trends(self, use_only_altitude = False):
-        
+        # only needed for the trends tab, imported here to keep module import light
+        import requests
+        import html_to_json
+        import json
+        import re
+        import plotly.graph_objects as go
+
         if use_only_altitude:
             # columns = ['Date', 'Apogee', 'Perigee', 'Eccentricity']
             celes_request = f"http://celestrak.org/NORAD/elements/graph-altitude.php?CATNR={self.satrec_object.model.satnum}"
         else:
             # columns = ['Date', 'RAAN', 'Inclination', 'Arg of Perigee', 'SMA', 'Eccentricity']
-            celes_request = f"http://celestrak.org/NORAD/elements/graph-orbit-data.php?CATNR={self.satrec_object.model.satnum}"
+            celes_request = TRENDS_URL.format(self.satrec_object.model.satnum)
 
         resp = requests.get(celes_request)
         output_json = html_to_json.convert(resp.text)
@@ -377,7 +297,7 @@ class Satellite(EarthSatellite):
             st.error('Please select a different stop time, start time and stop time cannot be same!')
         else:
             with st.spinner("Computing satellite ground tracks..."):
-                ts = load.timescale()
+                ts = get_timescale()
                 start_time = ts.from_datetime(dateChoice[0].replace(tzinfo=utc))
                 end_time = ts.from_datetime(dateChoice[1].replace(tzinfo=utc))
                 if self.__createEphemeris(start_time, end_time):
@@ -400,7 +320,7 @@ class Satellite(EarthSatellite):
         else:
             
             with st.spinner("Computing satellite ground tracks..."):
-                ts = load.timescale()
+                ts = get_timescale()
                 start_time = ts.from_datetime(dateChoice[0].replace(tzinfo=utc))
                 end_time = ts.from_datetime(dateChoice[1].replace(tzinfo=utc))
 
@@ -449,6 +369,7 @@ class Satellite(EarthSatellite):
 
             if not df_transit_schedule_to_print.empty:
                 st.dataframe(df_transit_schedule_to_print, use_container_width=True)
+                self.show_contact_plan()
             else:
                 st.warning('No transists found in the given timeframe.')
                 
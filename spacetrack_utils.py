@@ -0,0 +1,14 @@
+import streamlit as st
+from core.spacetrack import query_spacetrack
+
+def spacetrack_credentials():
+    # use file in .streamlit/secrets.toml when running locally / else deployed streamlit app needs those secrets defined
+    return {'identity': st.secrets.configuration.username, 'password': st.secrets.configuration.password}
+
+@st.cache_data(ttl=21600)
+def get_omm_from_spacetrack(request_url, query_limit=10000):
+    '''
+    Spacetrack JSON (OMM) query as one df for the SatCat statistics, keyed on (request_url, query_limit). The transit
+    page streams the same query into its element store instead, see core.ingest.fetch_spacetrack_elements
+    '''
+    return query_spacetrack(request_url, spacetrack_credentials(), query_limit)
@@ -0,0 +1,64 @@
+'''
+Manoeuvre and decay screening: a quiet satellite, one with a single SMA jump and one losing SMA steadily over the recent
+window, each with a seeded scatter of element set noise.
+'''
+import numpy as np
+import pytest
+from core.tle_history import TLEHistory, HISTORY_DTYPE, EARTH_RADIUS_KM
+from core.walker import kozai_mean_motion
+from core.anomalies import screen_history, FLAG_MANEUVER, FLAG_DECAY, ANOMALY_COLUMNS
+
+NOW_JD = 2460311.5
+STEP_DAYS = 0.5 # between element sets
+QUIET, MANEUVER, DECAY, OLD = 10001, 10002, 10003, 10004
+
+def history_records(norad_id, sma_km, epochs, rng):
+    records = np.zeros(len(epochs), dtype=HISTORY_DTYPE)
+    records['norad'] = norad_id
+    records['jd'] = np.floor(epochs - 0.5) + 0.5
+    records['jd_fraction'] = epochs - records['jd']
+    records['inclo'] = np.radians(53.0 + rng.normal(0.0, 0.0005, len(epochs)))
+    # nodal drift of a 53 deg LEO shell
+    records['nodeo'] = np.radians(np.mod(100.0 - 4.5 * (epochs - NOW_JD) + rng.normal(0.0, 0.002, len(epochs)), 360.0))
+    records['no_kozai'] = kozai_mean_motion(sma_km + rng.normal(0.0, 0.01, len(epochs)), 0.0, records['inclo'])
+    return records
+
+@pytest.fixture(scope='module')
+def history():
+    rng = np.random.default_rng(31)
+    epochs = NOW_JD - np.arange(60.0, -STEP_DAYS / 2, -STEP_DAYS)
+    sma = EARTH_RADIUS_KM + 550.0
+    recent = epochs > NOW_JD - 7.0
+    jump = epochs > NOW_JD - 3.0
+    records = [
+        history_records(QUIET, np.full(len(epochs), sma), epochs, rng),
+        history_records(MANEUVER, np.where(jump, sma + 2.0, sma), epochs, rng),
+        history_records(DECAY, np.where(recent, sma - 1.0 * (epochs - (NOW_JD - 7.0)), sma), epochs, rng),
+        # nothing in the recent window, not screened
+        history_records(OLD, np.full(len(epochs) - 20, sma), epochs[:-20], rng),
+    ]
+    info = {norad_id: (f'SAT {norad_id}', '') for norad_id in [QUIET, MANEUVER, DECAY, OLD]}
+    return TLEHistory(np.concatenate(records), info)
+
+def test_screen_history_flags(history):
+    df = screen_history(history, NOW_JD)
+    assert list(df.columns) == ANOMALY_COLUMNS
+    assert sorted(df['NORAD ID']) == [QUIET, MANEUVER, DECAY]
+    flags = dict(zip(df['NORAD ID'], df['FLAG']))
+    assert flags == {QUIET: '', MANEUVER: FLAG_MANEUVER, DECAY: FLAG_DECAY}
+    # ranked by score, the quiet satellite last
+    assert df['NORAD ID'].iloc[-1] == QUIET
+    assert (np.diff(df['SCORE']) <= 0).all()
+
+def test_screen_history_steps_and_rates(history):
+    df = screen_history(history, NOW_JD).set_index('NORAD ID')
+    assert df.loc[MANEUVER, 'SMA_STEP (km)'] == pytest.approx(2.0, abs=0.1)
+    assert df.loc[DECAY, 'SMA_RATE (km/day)'] == pytest.approx(-1.0, abs=0.05)
+    assert abs(df.loc[QUIET, 'SMA_RATE (km/day)']) < 0.05
+    # the nodal drift is removed before RAAN steps are scored
+    assert abs(df.loc[QUIET, 'RAAN_STEP (deg)']) < 0.05
+    assert df.loc[QUIET, 'SETS'] == 121 and df.loc[QUIET, 'ASSET'] == f'SAT {QUIET}'
+
+def test_screen_empty_history():
+    df = screen_history(TLEHistory(), NOW_JD)
+    assert df.empty and list(df.columns) == ANOMALY_COLUMNS
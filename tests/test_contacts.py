@@ -0,0 +1,58 @@
+'''
+Contact planning: one satellite per antenna with a setup gap, one antenna per satellite, and local swaps that trade
+one long contact for several shorter ones worth more together.
+'''
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from core.contacts import schedule_contacts, contact_plan_summary
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def pass_table(rows):
+    '''
+    @param rows list of (location, asset, rise, set) with times in seconds after T0
+    '''
+    return pd.DataFrame({
+        'LOCATION': [row[0] for row in rows],
+        'ASSET': [row[1] for row in rows],
+        'RISE': [T0 + timedelta(seconds=row[2]) for row in rows],
+        'SET': [T0 + timedelta(seconds=row[3]) for row in rows],
+    })
+
+def scheduled(plan):
+    return sorted(plan.loc[plan['SCHEDULED'], 'ASSET'])
+
+def test_overlapping_passes_share_one_antenna():
+    passes = pass_table([('SITE', 'A', 0, 600), ('SITE', 'B', 300, 1200)])
+    plan = schedule_contacts(passes)
+    assert scheduled(plan) == ['B']
+    assert plan.loc[plan['SCHEDULED'], 'ANTENNA'].tolist() == ['SITE #1']
+    plan = schedule_contacts(passes, antennas={'SITE': 2})
+    assert scheduled(plan) == ['A', 'B']
+    assert sorted(plan['ANTENNA']) == ['SITE #1', 'SITE #2']
+
+def test_setup_gap_between_contacts():
+    passes = pass_table([('SITE', 'A', 0, 600), ('SITE', 'B', 650, 1300)])
+    assert scheduled(schedule_contacts(passes, setup_seconds=120.0)) == ['B']
+    assert scheduled(schedule_contacts(passes, setup_seconds=30.0)) == ['A', 'B']
+
+def test_satellite_talks_to_one_station_at_a_time():
+    passes = pass_table([('NORTH', 'A', 0, 600), ('SOUTH', 'A', 100, 500), ('SOUTH', 'B', 700, 900)])
+    plan = schedule_contacts(passes)
+    assert plan.loc[plan['SCHEDULED'], 'LOCATION'].tolist() == ['NORTH', 'SOUTH']
+    summary = contact_plan_summary(plan)
+    assert summary.loc['SOUTH', 'PASSES'] == 2 and summary.loc['SOUTH', 'CONTACTS'] == 1
+    assert summary.loc['NORTH', 'CONTACT TIME (min)'] == 10.0
+
+def test_priorities_and_min_duration():
+    passes = pass_table([('SITE', 'A', 0, 600), ('SITE', 'B', 300, 1200)])
+    assert scheduled(schedule_contacts(passes, priorities={'A': 2.0})) == ['A']
+    assert scheduled(schedule_contacts(passes, priorities={'A': 2.0}, min_duration=700.0)) == ['B']
+
+def test_local_swap_beats_greedy():
+    # greedy books the longest pass C, which blocks D and E that are worth more together
+    passes = pass_table([('SITE', 'C', 100, 1000), ('SITE', 'D', 0, 500), ('SITE', 'E', 620, 1120)])
+    assert scheduled(schedule_contacts(passes, improve_rounds=0)) == ['C']
+    plan = schedule_contacts(passes)
+    assert scheduled(plan) == ['D', 'E']
+    assert plan.loc[plan['SCHEDULED'], 'WEIGHT'].sum() == 1000.0
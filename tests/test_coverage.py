@@ -0,0 +1,44 @@
+'''
+Coverage statistics: merging overlapping passes into coverage intervals and the gap / revisit figures derived from them.
+'''
+import numpy as np
+import pytest
+from core.coverage import merge_intervals, coverage_timeline, coverage_statistics
+
+def test_merge_intervals():
+    # unsorted, overlapping, touching and contained intervals
+    starts, stops = merge_intervals([50, 10, 0, 30, 20, 70], [60, 25, 12, 40, 22, 80])
+    np.testing.assert_array_equal(starts, [0, 30, 50, 70])
+    np.testing.assert_array_equal(stops, [25, 40, 60, 80])
+    starts, stops = merge_intervals([0, 10], [10, 20])
+    np.testing.assert_array_equal(starts, [0])
+    np.testing.assert_array_equal(stops, [20])
+    starts, stops = merge_intervals([], [])
+    assert len(starts) == 0 and len(stops) == 0
+
+def test_coverage_timeline_clips_to_window():
+    cov_starts, cov_stops, gaps = coverage_timeline([-100, 400, 900], [100, 500, 1200], 0.0, 1000.0)
+    np.testing.assert_array_equal(cov_starts, [0, 400, 900])
+    np.testing.assert_array_equal(cov_stops, [100, 500, 1000])
+    # window edges covered, so only the two inner gaps remain
+    np.testing.assert_array_equal(gaps, [300, 400])
+
+def test_coverage_statistics():
+    # two overlapping passes merge into [600, 1800], the third is on its own
+    stats = coverage_statistics([600, 1200, 3000], [1200, 1800, 3600], 0.0, 6000.0, percentiles=[50])
+    assert stats['PASSES'] == 3
+    assert stats['COVERAGE (%)'] == pytest.approx(30.0)
+    assert stats['MEAN_REVISIT (min)'] == pytest.approx(40.0)
+    assert stats['MAX_REVISIT (min)'] == pytest.approx(40.0)
+    # gaps of 600, 1200 and 2400 s
+    assert stats['MEAN_GAP (min)'] == pytest.approx(1400.0 / 60)
+    assert stats['P50_GAP (min)'] == pytest.approx(20.0)
+    assert stats['MAX_GAP (min)'] == pytest.approx(40.0)
+
+def test_coverage_statistics_without_passes():
+    stats = coverage_statistics([], [], 0.0, 600.0, percentiles=[90])
+    assert stats['PASSES'] == 0 and stats['COVERAGE (%)'] == 0.0
+    assert np.isnan(stats['MEAN_REVISIT (min)'])
+    # the whole window is one gap
+    assert stats['P90_GAP (min)'] == pytest.approx(10.0)
+    assert stats['MAX_GAP (min)'] == pytest.approx(10.0)
@@ -0,0 +1,58 @@
+'''
+Chunked pass search: passes crossing a chunk boundary are found whole in the chunk they rise in and counted once, so
+the chunks together give the same passes as one search over the whole window.
+'''
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, wgs84
+from core.propagation import get_timescale
+from core.events import find_chunk_passes, time_chunks
+
+LINE_1 = '1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005'
+LINE_2 = '2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391 10004'
+SITE = (40.015, -105.27)
+START = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+STOP = START + timedelta(days=1)
+MIN_ELEVATION = 10.0
+EVENT_TOLERANCE = 1.0 / 86400 # days, the event times are refined within the search interval so they differ slightly
+
+@pytest.fixture(scope='module')
+def satellite():
+    return EarthSatellite(LINE_1, LINE_2, 'ISS (ZARYA)', get_timescale())
+
+@pytest.fixture(scope='module')
+def position():
+    return wgs84.latlon(*SITE)
+
+def pass_times(times, starts):
+    '''
+    @return (rise, set) julian dates (TT) of each complete pass
+    '''
+    return [(times[idx].tt, times[idx + 2].tt) for idx in starts]
+
+def chunked_passes(satellite, position, chunks, overlap=timedelta(hours=1)):
+    passes = []
+    for chunk_start, chunk_stop in chunks:
+        times, starts = find_chunk_passes(satellite, position, chunk_start, chunk_stop, STOP, MIN_ELEVATION, overlap)
+        passes += pass_times(times, starts)
+    return passes
+
+def test_pass_across_chunk_boundary_counted_once(satellite, position):
+    whole = pass_times(*find_chunk_passes(satellite, position, START, STOP, STOP, MIN_ELEVATION))
+    assert len(whole) > 2
+    # split the window in the middle of a pass, with an overlap too short for it to set so the search has to grow
+    rise, set_ = whole[1]
+    ts = get_timescale()
+    boundary = ts.tt_jd((rise + set_) / 2).utc_datetime()
+    chunked = chunked_passes(satellite, position, [(START, boundary), (boundary, STOP)], overlap=timedelta(seconds=30))
+    assert len(chunked) == len(whole)
+    np.testing.assert_allclose(chunked, whole, rtol=0, atol=EVENT_TOLERANCE)
+
+def test_many_chunks_match_whole_window(satellite, position):
+    whole = pass_times(*find_chunk_passes(satellite, position, START, STOP, STOP, MIN_ELEVATION))
+    chunks = time_chunks(START, STOP, timedelta(minutes=97))
+    assert chunks[0][0] == START and chunks[-1][1] == STOP
+    chunked = chunked_passes(satellite, position, chunks)
+    assert len(chunked) == len(whole)
+    np.testing.assert_allclose(chunked, whole, rtol=0, atol=EVENT_TOLERANCE)
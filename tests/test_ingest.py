@@ -0,0 +1,84 @@
+'''
+Element set ingestion: validation and de-duplication into a store, and the streamed Spacetrack JSON path against the
+one-shot df path.
+'''
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from sgp4 import exporter
+from sgp4.api import Satrec
+from skyfield.api import EarthSatellite
+from core.tle_history import element_records
+from core.spacetrack import iter_json_array
+from core.ingest import records_from_omm, build_store, stream_store_from_omm
+
+LINE_1 = '1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005'
+LINE_2 = '2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391 10004'
+
+def omm_rows(count):
+    # Spacetrack sends every value as a string, names may carry non ASCII characters
+    template = exporter.export_omm(Satrec.twoline2rv(LINE_1, LINE_2), 'ISS (ZARYA)')
+    rows = []
+    for i in range(count):
+        row = {key: str(value) for key, value in template.items()}
+        row['NORAD_CAT_ID'] = str(40000 + i % (count // 2))
+        row['OBJECT_NAME'] = f'SAT-{i} é'
+        row['MEAN_ANOMALY'] = str(i % 360)
+        rows.append(row)
+    rows[3]['ECCENTRICITY'] = '1.5' # invalid
+    return rows
+
+def satellite_records(epoch_days):
+    '''
+    @param epoch_days   list of (NORAD ID, epoch offset in days, eccentricity)
+    @return HISTORY_DTYPE records copied from the ISS element set, names and international designators
+    '''
+    template, _ = element_records([EarthSatellite(LINE_1, LINE_2, 'ISS (ZARYA)')])
+    records = np.repeat(template, len(epoch_days))
+    for record, (norad_id, days, ecc) in zip(records, epoch_days):
+        record['norad'], record['ecco'] = norad_id, ecc
+        record['jd_fraction'] += days
+    names = [f'SAT {norad_id} +{days}' for norad_id, days, _ in epoch_days]
+    return records, names, ['98067A'] * len(epoch_days)
+
+def test_build_store_keeps_newest_valid_epoch():
+    records, names, intldesg = satellite_records([
+        (101, 0.0, 0.001), (101, 1.0, 0.001), (101, 1.0, 0.001), (101, 0.5, 0.001), # duplicated newest epoch
+        (102, 2.0, 1.5), (102, 0.0, 0.001), # newest one invalid
+        (103, 0.0, -0.1), (104, 0.0, 0.001), # nothing valid
+    ])
+    records['no_kozai'][7] = np.nan
+    store, report = build_store(records, names, intldesg)
+    assert report == {'READ': 8, 'INVALID': 3, 'DUPLICATES': 1, 'SUPERSEDED': 2, 'LOADED': 2}
+    np.testing.assert_array_equal(store.norad_ids, [101, 102])
+    assert [store.name(i) for i in range(len(store))] == ['SAT 101 +1.0', 'SAT 102 +0.0']
+    epochs = store.records['jd'] + store.records['jd_fraction']
+    np.testing.assert_allclose(epochs - records['jd'][0] - records['jd_fraction'][0], [1.0, 0.0], atol=1e-9)
+    assert store.records['intldesg'][0] == b'98067A'
+
+def chunked(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_iter_json_array_across_chunks(size):
+    rows = omm_rows(10) + [12, 'text', None]
+    body = json.dumps(rows, ensure_ascii=False, indent=1).encode('utf-8')
+    assert list(iter_json_array(chunked(body, size))) == rows
+
+def test_iter_json_array_truncated_body():
+    body = json.dumps(omm_rows(4)).encode('utf-8')[:-30]
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(body, 64)))
+
+def test_stream_store_matches_one_shot():
+    rows = omm_rows(50)
+    body = json.dumps(rows).encode('utf-8')
+    seen = []
+    store, report = stream_store_from_omm(iter_json_array(chunked(body, 333)), batch_size=8, progress=seen.append)
+    expected, expected_report = build_store(*records_from_omm(pd.DataFrame(rows)))
+    assert report == expected_report
+    assert report['READ'] == 50 and report['INVALID'] == 1 and report['LOADED'] == 25
+    assert seen == [8, 16, 24, 32, 40, 48, 50]
+    np.testing.assert_array_equal(store.records, expected.records)
+    assert [store.name(i) for i in range(len(store))] == [expected.name(i) for i in range(len(expected))]
@@ -0,0 +1,65 @@
+'''
+Background jobs: a job for new inputs supersedes (cancels) the previous one, queued jobs never start once cancelled
+and running ones stop at their next progress report.
+'''
+import threading
+import pytest
+from core.jobs import JobRunner, JobCancelled, PENDING, DONE, FAILED, CANCELLED
+
+TIMEOUT = 10.0 # seconds, far longer than any of these jobs take
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=1, name='test')
+    yield runner
+    runner.shutdown()
+
+def blocking(job, started, release):
+    '''
+    Reports progress until released or cancelled
+    '''
+    started.set()
+    while not release.wait(0.01):
+        job.report(0.5, 'Waiting...')
+    return 'released'
+
+def test_job_result_and_failure(runner):
+    job = runner.submit('sum', lambda job, values: sum(values), [1, 2, 3])
+    assert job.result(TIMEOUT) == 6
+    assert job.status == DONE and job.progress == 1.0 and job.error is None
+
+    def failing(job):
+        raise RuntimeError('bad input')
+    job = runner.submit('fail', failing)
+    assert job.wait(TIMEOUT)
+    assert job.status == FAILED and isinstance(job.error, RuntimeError)
+
+def test_cancel_running_and_queued_jobs(runner):
+    started, release = threading.Event(), threading.Event()
+    running = runner.submit('running', blocking, started, release)
+    assert started.wait(TIMEOUT)
+    # the only worker is busy, so this one waits in the queue
+    ran = threading.Event()
+    queued = runner.submit('queued', lambda job: ran.set())
+    assert queued.status == PENDING
+    queued.cancel()
+    running.cancel()
+    assert running.wait(TIMEOUT) and queued.wait(TIMEOUT)
+    assert running.status == CANCELLED and queued.status == CANCELLED
+    with pytest.raises(JobCancelled):
+        running.result(TIMEOUT)
+    assert not ran.is_set()
+
+def test_supersede(runner):
+    started, release = threading.Event(), threading.Event()
+    first = runner.supersede(None, ('window', 1), blocking, started, release)
+    assert started.wait(TIMEOUT)
+    # same inputs keep the job, e.g. a page rerun without changes
+    assert runner.supersede(first, ('window', 1), blocking, started, release) is first
+    second = runner.supersede(first, ('window', 2), lambda job: 'second')
+    assert second is not first and first.cancelled
+    assert second.result(TIMEOUT) == 'second'
+    assert first.status == CANCELLED
+    # a cancelled job is resubmitted even for the same inputs
+    third = runner.supersede(first, ('window', 1), lambda job: 'third')
+    assert third is not first and third.result(TIMEOUT) == 'third'
@@ -0,0 +1,33 @@
+'''
+Orbit design trade space: ground-track repeat cycles and the sun-synchronous inclination of a design grid.
+'''
+import numpy as np
+import pytest
+from core.orbit_design import repeat_cycle, design_grid, orbit_parameters, EARTH_RADIUS_KM
+
+def test_repeat_cycle():
+    days, revs = repeat_cycle(np.array([15.0, 14.5, 14.0 + 1.0 / 3.0, 13.0 + 2.0 / 7.0]))
+    np.testing.assert_array_equal(days, [1, 2, 3, 7])
+    np.testing.assert_array_equal(revs, [15, 29, 43, 93])
+
+def test_repeat_cycle_tolerance():
+    # an equator shift of 0.001 revolutions is ~3 km, inside the default 10 km
+    days, revs = repeat_cycle(np.array([15.001]))
+    assert days[0] == 1 and revs[0] == 15
+    spacing_km = 2 * np.pi * EARTH_RADIUS_KM / 15.001
+    days, _ = repeat_cycle(np.array([15.001]), tolerance_km=0.5 * 0.001 * spacing_km)
+    assert days[0] != 1
+
+def test_repeat_cycle_not_found():
+    days, revs = repeat_cycle(np.array([14.123456]), max_days=5)
+    assert np.isnan(days[0]) and np.isnan(revs[0])
+
+def test_sun_synchronous_design():
+    params = orbit_parameters(design_grid([800.0, 60.0], [98.6, 60.0], [0.0]))
+    # the 60 km designs re-enter and are dropped
+    assert len(params) == 2 and (params['ALTITUDE (km)'] == 800.0).all()
+    assert params['SSO_INCLINATION (deg)'].iloc[0] == pytest.approx(98.6, abs=0.1)
+    assert params['SUN_SYNC'].tolist() == [True, False]
+    # a sun-synchronous node precesses ~0.9856 deg/day eastward
+    assert params['RAAN_RATE (deg/day)'].iloc[0] == pytest.approx(0.9856, abs=0.01)
+    assert params['PERIOD (min)'].iloc[0] == pytest.approx(100.9, abs=0.2)
@@ -0,0 +1,89 @@
+'''
+Checks the vectorized propagation paths against skyfield's own EarthSatellite.at(...) for a fixed 3LE: the TimeGrid
+TEME -> ITRS / topocentric series, element records (satrec_from_record, ElementStore round trip) and OMM ingestion.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from sgp4 import exporter
+from skyfield.api import EarthSatellite, wgs84
+from skyfield.framelib import itrs
+from core.propagation import get_timescale
+from core.timegrid import TimeGrid, topocentric
+from core.tle_history import element_records, satrec_from_record
+from core.element_store import ElementStore
+from core.ingest import records_from_omm
+
+NAME = 'ISS (ZARYA)'
+LINE_1 = '1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005'
+LINE_2 = '2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391 10004'
+SITE = (40.015, -105.27, 1655.0) # latitude, longitude, elevation (m)
+
+POSITION_TOLERANCE_KM = 1e-9
+VELOCITY_TOLERANCE_KM_S = 1e-9
+ANGLE_TOLERANCE_DEG = 1e-9
+
+@pytest.fixture(scope='module')
+def ts():
+    return get_timescale()
+
+@pytest.fixture(scope='module')
+def satellite(ts):
+    return EarthSatellite(LINE_1, LINE_2, NAME, ts)
+
+@pytest.fixture(scope='module')
+def grid(ts):
+    # two days around the epoch, one sample every 7 minutes
+    return TimeGrid(ts.tt_jd(2460310.0 + np.arange(0.0, 2.0, 7.0 / 1440.0)))
+
+def sgp4_states(grid, satrecs):
+    errors, r, v = grid.sgp4(satrecs)
+    assert not errors.any()
+    return r, v
+
+def test_itrs_state_matches_skyfield(satellite, grid):
+    r, v = sgp4_states(grid, [satellite.model])
+    r_itrs, v_itrs = grid.itrs_state(r, v)
+    expected_r, expected_v = satellite.at(grid.times).frame_xyz_and_velocity(itrs)
+    np.testing.assert_allclose(r_itrs[0], expected_r.km.T, rtol=0, atol=POSITION_TOLERANCE_KM)
+    np.testing.assert_allclose(v_itrs[0], expected_v.km_per_s.T, rtol=0, atol=VELOCITY_TOLERANCE_KM_S)
+
+def test_topocentric_matches_skyfield(satellite, grid):
+    r, v = sgp4_states(grid, [satellite.model])
+    r_itrs, v_itrs = grid.itrs_state(r, v)
+    el, az, rng, range_rate = topocentric(r_itrs[0], *SITE, v_itrs=v_itrs[0])
+    site = wgs84.latlon(SITE[0], SITE[1], elevation_m=SITE[2])
+    topo = (satellite - site).at(grid.times)
+    expected_el, expected_az, expected_rng = topo.altaz()
+    _, _, _, _, _, expected_rate = topo.frame_latlon_and_rates(site)
+    np.testing.assert_allclose(el, expected_el.degrees, rtol=0, atol=ANGLE_TOLERANCE_DEG)
+    # azimuth wraps at 0 / 360 degrees
+    np.testing.assert_allclose((az - expected_az.degrees + 180.0) % 360.0 - 180.0, 0.0, rtol=0, atol=ANGLE_TOLERANCE_DEG)
+    np.testing.assert_allclose(rng, expected_rng.km, rtol=0, atol=POSITION_TOLERANCE_KM)
+    np.testing.assert_allclose(range_rate, expected_rate.km_per_s, rtol=0, atol=VELOCITY_TOLERANCE_KM_S)
+
+def test_satrec_from_record_matches_twoline2rv(satellite, grid):
+    records, _ = element_records([satellite])
+    rebuilt = satrec_from_record(records[0], satellite.model.intldesg)
+    r, v = sgp4_states(grid, [rebuilt])
+    expected_r, expected_v = sgp4_states(grid, [satellite.model])
+    np.testing.assert_array_equal(r, expected_r)
+    np.testing.assert_array_equal(v, expected_v)
+
+def test_element_store_round_trip(satellite, grid, tmp_path):
+    ElementStore.from_satellites([satellite]).save(str(tmp_path / 'store'))
+    store = ElementStore.open(str(tmp_path / 'store'))
+    assert len(store) == 1 and store.name(0) == NAME and store.index_of(25544) == 0
+    reopened = store.satellite(0)
+    assert reopened.model.intldesg == satellite.model.intldesg
+    np.testing.assert_array_equal(reopened.at(grid.times).position.km, satellite.at(grid.times).position.km)
+
+def test_records_from_omm_matches_skyfield(satellite, grid):
+    df = pd.DataFrame([exporter.export_omm(satellite.model, NAME)])
+    records, names, intldesg = records_from_omm(df)
+    assert list(names) == [NAME] and list(intldesg) == [satellite.model.intldesg]
+    assert records['jd'][0] + records['jd_fraction'][0] == pytest.approx(satellite.model.jdsatepoch + satellite.model.jdsatepochF, abs=1e-9)
+    r, _ = sgp4_states(grid, [satrec_from_record(records[0], intldesg[0])])
+    expected_r, _ = sgp4_states(grid, [satellite.model])
+    # OMM carries the epoch to the microsecond and the TLE's digits, so the orbits agree to well below a meter
+    np.testing.assert_allclose(r, expected_r, rtol=0, atol=1e-4)
@@ -0,0 +1,48 @@
+'''
+Sub-satellite point index: KD-tree radius lookups and lat / lon box lookups against a brute force scan of every satellite.
+'''
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from core.propagation import get_timescale
+from core.element_store import ElementStore
+from core.spatial import SubSatelliteIndex
+from core.walker import walker_records
+
+EPOCH_JD = 2460311.25 # 2024-01-01 18:00 UTC
+T = datetime(2024, 1, 1, 19, tzinfo=timezone.utc)
+SHELL = dict(inclination_deg=53.0, planes=24, per_plane=20, phasing=1, altitude_km=550.0)
+
+@pytest.fixture(scope='module')
+def index():
+    records, names = walker_records([SHELL], EPOCH_JD)
+    store = ElementStore.from_records(records, names, [''] * len(records))
+    return SubSatelliteIndex.at_time(store.satellites(), T)
+
+@pytest.mark.parametrize('lat, lon, radius_km', [(40.0, -105.0, 1500.0), (-10.0, 179.0, 800.0), (0.0, 0.0, 20000.0)])
+def test_within_radius_matches_brute_force(index, lat, lon, radius_km):
+    hits, distance = index.within_radius(lat, lon, radius_km, 0)
+    everyone = index.distance_km(lat, lon, np.arange(len(index.satellites)), 0)
+    expected = np.flatnonzero(everyone <= radius_km)
+    assert len(hits) > 0
+    np.testing.assert_array_equal(np.sort(hits), expected)
+    assert (np.diff(distance) >= 0).all()
+    np.testing.assert_allclose(distance, everyone[hits], rtol=1e-6)
+
+def test_within_bbox(index):
+    lat, lon = index.lat[0], index.lon[0]
+    found = index.within_bbox(20.0, 50.0, -130.0, -60.0, 0)
+    expected = np.flatnonzero((lat >= 20.0) & (lat <= 50.0) & (lon >= -130.0) & (lon <= -60.0))
+    assert len(found) > 0
+    np.testing.assert_array_equal(found, expected)
+
+def test_within_bbox_across_antimeridian(index):
+    lat, lon = index.lat[0], index.lon[0]
+    found = index.within_bbox(-53.0, 53.0, 150.0, -150.0, 0)
+    expected = np.flatnonzero((lat >= -53.0) & (lat <= 53.0) & ((lon >= 150.0) | (lon <= -150.0)))
+    assert len(found) > 0 and (np.abs(lon[found]) >= 150.0).all()
+    np.testing.assert_array_equal(found, expected)
+
+def test_step_of(index):
+    ts = get_timescale()
+    assert index.step_of(T) == 0 and index.step_of(ts.from_datetime(T)) == 0
@@ -0,0 +1,79 @@
+'''
+Nearest-epoch selection of the element history: samples on either side of the midpoint between two epochs propagate
+from different element sets, in TLEHistory.propagate, the coverage grid and the hindcast pass search.
+'''
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, wgs84
+from core.propagation import get_timescale, utc_julian_date, UNIX_EPOCH_JD
+from core.timegrid import TimeGrid
+from core.tle_history import TLEHistory, element_records, satrec_from_record, UNKNOWN_SATELLITE
+from core.coverage import site_elevations
+from core.events import find_chunk_passes, find_history_passes
+
+LINE_1 = '1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005'
+LINE_2 = '2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391 10004'
+SITE = (40.015, -105.27)
+EPOCH_SPACING = 2.0 # days between the two element sets
+
+@pytest.fixture(scope='module')
+def ts():
+    return get_timescale()
+
+@pytest.fixture(scope='module')
+def history(ts):
+    # the same orbit twice, the later element set shifted in epoch and mean anomaly so the two disagree
+    records, info = element_records([EarthSatellite(LINE_1, LINE_2, 'ISS (ZARYA)', ts)])
+    later = records.copy()
+    later['jd'] += EPOCH_SPACING
+    later['mo'] = (later['mo'] + np.radians(90.0)) % (2 * np.pi)
+    return TLEHistory(np.concatenate([later, records]), info)
+
+@pytest.fixture(scope='module')
+def midpoint(history):
+    return float(history.epochs.mean())
+
+def test_epoch_segments_split_at_midpoint(history, midpoint):
+    segments = history.epoch_segments(25544, midpoint - 1.0, midpoint + 1.0)
+    assert segments == [(0, midpoint - 1.0, midpoint), (1, midpoint, midpoint + 1.0)]
+    assert history.epoch_segments(25544, midpoint + 0.1, midpoint + 0.2) == [(1, midpoint + 0.1, midpoint + 0.2)]
+    assert history.epoch_segments(99999, midpoint - 1.0, midpoint + 1.0) == []
+
+def test_propagate_switches_element_sets_at_midpoint(ts, history, midpoint):
+    # TT - UTC is about a minute, far below the 15 minute offsets
+    grid = TimeGrid(ts.tt_jd(midpoint + np.array([-0.01, 0.01])))
+    errors, r, v = history.propagate(grid, [25544, 99999])
+    assert (errors[0] == 0).all() and (errors[1] == UNKNOWN_SATELLITE).all()
+    for sample, record_idx in enumerate([0, 1]):
+        _, expected_r, expected_v = grid.sgp4([satrec_from_record(history.records[record_idx])], [sample])
+        np.testing.assert_array_equal(r[0, sample], expected_r[0, 0])
+        np.testing.assert_array_equal(v[0, sample], expected_v[0, 0])
+    # the two element sets really disagree, so a frozen single element set would be caught
+    _, frozen_r, _ = grid.sgp4([satrec_from_record(history.records[0])])
+    assert np.linalg.norm(frozen_r[0, 1] - r[0, 1]) > 1000.0
+
+def test_site_elevations_use_nearest_epoch(ts, history, midpoint):
+    grid = TimeGrid(ts.tt_jd(midpoint + np.linspace(-0.5, 0.5, 721)))
+    satellite = history.satellite(0)
+    (_, elevations), = site_elevations(grid, [satellite], {'SITE': SITE}, history=history)
+    (_, frozen), = site_elevations(grid, [satellite], {'SITE': SITE})
+    before = utc_julian_date(grid.times) < midpoint
+    np.testing.assert_allclose(elevations['SITE'][0, before], frozen['SITE'][0, before], rtol=0, atol=1e-9)
+    assert np.abs(elevations['SITE'][0, ~before] - frozen['SITE'][0, ~before]).max() > 1.0
+
+def utc_datetime(jd):
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=jd - UNIX_EPOCH_JD)
+
+def test_history_passes_use_element_set_nearest_to_rise(history, midpoint):
+    position = wgs84.latlon(*SITE)
+    start, switch, stop = utc_datetime(midpoint - 1.0), utc_datetime(midpoint), utc_datetime(midpoint + 1.0)
+    found = list(find_history_passes(history, 25544, position, start, stop, stop, 10.0))
+    assert len(found) == 2
+    # each element set gives exactly the passes it finds on its own side of the midpoint
+    for (sat, times, starts), record_idx, (seg_start, seg_stop) in zip(found, [0, 1], [(start, switch), (switch, stop)]):
+        assert sat.model.jdsatepoch + sat.model.jdsatepochF == pytest.approx(history.epochs[record_idx], abs=1e-9)
+        expected_times, expected_starts = find_chunk_passes(history.satellite(record_idx), position, seg_start, seg_stop,
+                                                            stop, 10.0)
+        assert len(starts) > 0
+        np.testing.assert_allclose(times[starts].tt, expected_times[expected_starts].tt, rtol=0, atol=1e-9)
@@ -0,0 +1,45 @@
+'''
+Synthetic Walker constellations: plane / slot layout, NORAD IDs, common epoch and the mean altitude SGP4 sees.
+'''
+import numpy as np
+import pytest
+from core.tle_history import mean_elements, satrec_from_record, EARTH_RADIUS_KM
+from core.walker import walker_records, walker_shell, SYNTHETIC_NORAD_START, ALPHA5_NORAD_LIMIT
+
+EPOCH_JD = 2460311.25 # 2024-01-01 18:00 UTC
+SHELLS = [dict(inclination_deg=53.0, planes=4, per_plane=3, phasing=1, altitude_km=550.0),
+          dict(inclination_deg=97.6, planes=2, per_plane=2, phasing=0, altitude_km=600.0)]
+
+def test_walker_records_layout():
+    records, names = walker_records(SHELLS, EPOCH_JD)
+    assert len(records) == len(names) == 16
+    assert names[:4] == ['SYN-1-001-001', 'SYN-1-001-002', 'SYN-1-001-003', 'SYN-1-002-001']
+    assert names[-1] == 'SYN-2-002-002'
+    np.testing.assert_array_equal(records['norad'], SYNTHETIC_NORAD_START + np.arange(16))
+    np.testing.assert_allclose(records['jd'] + records['jd_fraction'], EPOCH_JD, rtol=0, atol=1e-9)
+    assert (records['jd'] % 1 == 0.5).all()
+
+    shell = records[:12]
+    # planes 90 deg apart in RAAN, slots 120 deg apart in mean anomaly, planes phased by 360 / 12 deg
+    np.testing.assert_allclose(np.degrees(shell['nodeo'][::3]), [0, 90, 180, 270], atol=1e-9)
+    np.testing.assert_allclose(np.degrees(shell['mo'][:3]), [0, 120, 240], atol=1e-9)
+    np.testing.assert_allclose(np.degrees(shell['mo'][3:6]), [30, 150, 270], atol=1e-9)
+    np.testing.assert_allclose(np.degrees(records['inclo']), [53.0] * 12 + [97.6] * 4, atol=1e-9)
+
+def test_walker_records_altitude():
+    records, _ = walker_records(SHELLS, EPOCH_JD)
+    sma, _, _ = mean_elements(records)
+    np.testing.assert_allclose(sma - EARTH_RADIUS_KM, [550.0] * 12 + [600.0] * 4, atol=1e-6)
+    # the osculating radius SGP4 propagates stays within a few km of the mean one
+    satrec = satrec_from_record(records[0])
+    error, r, _ = satrec.sgp4(records['jd'][0], records['jd_fraction'][0])
+    assert error == 0
+    assert np.linalg.norm(r) == pytest.approx(EARTH_RADIUS_KM + 550.0, abs=20.0)
+
+def test_walker_records_invalid():
+    with pytest.raises(ValueError):
+        walker_shell(53.0, 4, 3, phasing=4, altitude_km=550.0)
+    with pytest.raises(ValueError):
+        walker_shell(53.0, 4, 3)
+    with pytest.raises(ValueError):
+        walker_records(SHELLS, EPOCH_JD, norad_start=ALPHA5_NORAD_LIMIT - 10)